@@ -0,0 +1,306 @@
+""" Headless benchmarks for Cyteboard's hot paths, reported as JSON.
+
+Runs offscreen against synthetic sound libraries in a throwaway data directory, with the
+audio engine feeding a null output instead of a device:
+
+    python benchmark.py --slots 1,25,100 --runs 20 --output results.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import struct
+import tempfile
+import argparse
+import platform
+
+# --- ENVIRONMENT ---
+# Everything Cyteboard writes goes to a scratch directory; main.py reads these when imported
+BENCH_DIR = tempfile.mkdtemp(prefix="cyteboard-bench-")
+os.environ["HOME"] = BENCH_DIR
+os.environ["APPDATA"] = BENCH_DIR
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import numpy as np
+from PyQt6.QtWidgets import QApplication
+from PyQt6.QtGui import QImage, QColor, QPixmapCache
+from PyQt6.QtCore import QTimer, QEventLoop, pyqtSlot, PYQT_VERSION_STR, QT_VERSION_STR
+
+import main
+
+# --- CONFIGURATION ---
+# (name, sample rate, channels, sample type), cycled over the slots. WAV only: compressed files would need an encoder
+LIBRARY_FORMATS = (
+    ("wav-48k-int16-stereo", 48000, 2, "int16"), # Played in place from a memory map
+    ("wav-48k-float-stereo", 48000, 2, "float32"), # Mapped and mixed without conversion
+    ("wav-48k-int16-mono", 48000, 1, "int16"),
+    ("wav-44k-int16-stereo", 44100, 2, "int16"), # Goes through the decoder and is resampled
+)
+CLIP_SECONDS = (0.5, 1.0, 2.0)
+ICON_SIZE = 2048 # Large source images, the icon cache scales them down
+ICON_VARIANTS = 4
+NULL_OUTPUT_PERIOD_MS = 5 # How often the null output pulls from the mix
+TRIGGER_SETTLE_MS = 30 # Time given to each trigger to reach the null output
+WAIT_TIMEOUT_S = 60
+
+
+# --- SYNTHETIC LIBRARIES ---
+def write_wav(path, seconds, rate, channels, sample_type):
+    """ Writes a sine sweep as a PCM or float WAV file. """
+    t = np.arange(int(seconds * rate)) / rate
+    signal = 0.5 * np.sin(2 * np.pi * (220.0 + 440.0 * t) * t)
+    frames = np.repeat(signal[:, None], channels, axis=1)
+    if sample_type == "float32":
+        data, tag, bits = frames.astype("<f4").tobytes(), 3, 32
+    else:
+        data, tag, bits = (frames * 32767).astype("<i2").tobytes(), 1, 16
+    block_align = channels * bits // 8
+    header = b"RIFF" + struct.pack("<I", 36 + len(data)) + b"WAVE"
+    header += b"fmt " + struct.pack("<IHHIIHH", 16, tag, channels, rate, rate * block_align, block_align, bits)
+    header += b"data" + struct.pack("<I", len(data))
+    with open(path, "wb") as f:
+        f.write(header + data)
+
+
+def write_icon(path, variant):
+    image = QImage(ICON_SIZE, ICON_SIZE, QImage.Format.Format_RGB32)
+    image.fill(QColor.fromHsv(variant * 360 // ICON_VARIANTS, 200, 220))
+    image.save(path, "PNG")
+
+
+def build_library(slots):
+    """ Creates sounds and icons for `slots` pads and returns the data file contents that use them. """
+    library_dir = os.path.join(BENCH_DIR, f"library-{slots}")
+    os.makedirs(library_dir, exist_ok=True)
+    icons = []
+    for variant in range(ICON_VARIANTS):
+        icon_path = os.path.join(library_dir, f"icon-{variant}.png")
+        write_icon(icon_path, variant)
+        icons.append(icon_path)
+
+    audio_files = {}
+    for index in range(slots):
+        name, rate, channels, sample_type = LIBRARY_FORMATS[index % len(LIBRARY_FORMATS)]
+        path = os.path.join(library_dir, f"pad-{index:03}-{name}.wav")
+        write_wav(path, CLIP_SECONDS[index % len(CLIP_SECONDS)], rate, channels, sample_type)
+        audio_files[str(index)] = {
+            "path": path,
+            "nickname": f"Pad {index + 1}",
+            "icon": icons[index % len(icons)] if index % 2 == 0 else "", # Half of the pads have an icon
+        }
+    rows = -(-slots // main.BUTTONS_PER_ROW)
+    return {
+        "audio_files": audio_files,
+        "ui_state": {
+            "num_rows": max(main.MIN_ROWS, min(rows, main.MAX_ROWS)),
+            "theme": "Cyber Green",
+            "global_hotkeys": False, # Nothing system-wide is hooked during a benchmark
+            "midi_input": False,
+        },
+    }
+
+
+def reset_data(data):
+    """ Starts every run from the same profile. """
+    os.makedirs(main.DATA_DIR, exist_ok=True)
+    store = main.DataStore()
+    store.import_data(data)
+    store.close()
+
+
+# --- MEASUREMENT ---
+def summarize(samples):
+    """ Percentiles (nearest rank) of a list of timings. """
+    if not samples:
+        return None
+    ordered = sorted(samples)
+
+    def rank(percent):
+        return ordered[min(len(ordered) - 1, max(0, -(-len(ordered) * percent // 100) - 1))]
+
+    return {
+        "runs": len(ordered),
+        "min": ordered[0],
+        "p50": rank(50),
+        "p90": rank(90),
+        "p99": rank(99),
+        "max": ordered[-1],
+        "mean": sum(ordered) / len(ordered),
+    }
+
+
+def pump(ms):
+    loop = QEventLoop()
+    QTimer.singleShot(ms, loop.quit)
+    loop.exec()
+
+
+class BenchmarkTimeout(RuntimeError):
+    """ Something measured never finished, so its timings would be meaningless. """
+
+
+def wait_until(condition, what):
+    """ Runs the event loop until condition() holds; raises BenchmarkTimeout after WAIT_TIMEOUT_S. """
+    deadline = time.perf_counter() + WAIT_TIMEOUT_S
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise BenchmarkTimeout(f"Gave up after {WAIT_TIMEOUT_S} s waiting for {what}")
+        QApplication.processEvents(QEventLoop.ProcessEventsFlag.AllEvents, 5)
+
+
+def timed_ms(function, *args):
+    started = time.perf_counter()
+    function(*args)
+    return (time.perf_counter() - started) * 1000.0
+
+
+class NullOutput(main.AudioOutputStream):
+    """ Stands in for an audio device: pulls the mix on a timer and throws it away.
+
+    Installed as main.AudioOutputStream before any window exists, so every output the engine
+    opens is one of these and no device is ever touched.
+    """
+    def __init__(self, ring, parent=None):
+        super().__init__(ring, parent)
+        self.chunk_bytes = self.sink_format.bytesForDuration(NULL_OUTPUT_PERIOD_MS * 1000)
+        self.timer = QTimer(self) # Moves to the audio thread with the stream
+        self.timer.setInterval(NULL_OUTPUT_PERIOD_MS)
+        self.timer.timeout.connect(self.pull)
+
+    @pyqtSlot(object, float)
+    def set_device(self, device, volume):
+        # Runs on the audio thread like the real one; the timer has to be started there
+        self.device = device
+        self.timer.start()
+
+    def pull(self):
+        self.readData(self.chunk_bytes)
+
+
+def reload_slots(window):
+    """ Reads every slot again, as starting the audio does after load_data() read the first page. """
+    window.slots_complete = False
+    window.load_remaining_slots()
+
+
+def startup_done(window):
+    return window.startup_complete
+
+
+def benchmark_library(slots, runs):
+    data = build_library(slots)
+    result = {"slots": slots}
+
+    # Startup, from constructing the window until the deferred work is finished
+    startup = []
+    for run in range(runs + 1):
+        reset_data(data)
+        started = time.perf_counter()
+        window = main.Cyteboard()
+        window.show()
+        wait_until(lambda: startup_done(window), "the startup to finish")
+        elapsed = (time.perf_counter() - started) * 1000.0
+        if run == 0:
+            result["first_startup_ms"] = elapsed # Thumbnails and waveforms are created on this run
+        else:
+            startup.append(elapsed)
+        window.close()
+        window.deleteLater()
+        pump(0)
+    result["startup_ms"] = summarize(startup)
+
+    reset_data(data)
+    window = main.Cyteboard()
+    window.show()
+    wait_until(lambda: startup_done(window), "the startup to finish")
+
+    result["load_data_ms"] = summarize([timed_ms(window.load_data) for _ in range(runs)])
+    result["load_remaining_slots_ms"] = summarize([timed_ms(reload_slots, window) for _ in range(runs)])
+
+    result["grid_rebuild_ms"] = summarize([timed_ms(window.rebuild_button_grid) for _ in range(runs)])
+    pump(0) # Let the old buttons be deleted
+
+    themes = list(main.THEMES)
+    result["theme_switch_ms"] = summarize([
+        timed_ms(window.apply_theme, themes[(run + 1) % len(themes)]) for run in range(runs)
+    ])
+    window.apply_theme("Cyber Green")
+
+    # Icons: cold loads the on-disk thumbnails back into memory, warm hits QPixmapCache
+    iconic = [button for button in window.buttons if button.icon_path]
+    icon_cold = []
+    icon_warm = []
+    for _ in range(runs if iconic else 0):
+        QPixmapCache.clear()
+        window.icon_cache.keys.clear()
+        for button in iconic:
+            button.shown_icon_path = ""
+        started = time.perf_counter()
+        for button in iconic:
+            button.update_icon()
+        wait_until(lambda: all(button.shown_icon_path == button.icon_path for button in iconic), "the icons to load")
+        icon_cold.append((time.perf_counter() - started) * 1000.0)
+
+        for button in iconic:
+            button.shown_icon_path = ""
+        icon_warm.append(timed_ms(lambda: [button.update_icon() for button in iconic]) / len(iconic))
+    result["icon_load_all_cold_ms"] = summarize(icon_cold)
+    result["icon_update_warm_ms"] = summarize(icon_warm)
+
+    # Triggers: time spent in the call, and from the call until the first buffer reaches the output
+    table = window.audio_engine.slots
+    wait_until(lambda: all(table.samples[index] is not None for index in range(slots)), "every pad to be decoded")
+    meter = window.audio_engine.ring.latency
+    meter.latencies_ms.clear()
+    trigger_call = []
+    for run in range(max(runs, slots)): # Every pad at least once
+        trigger_call.append(timed_ms(window.trigger_pad, run % slots))
+        pump(TRIGGER_SETTLE_MS)
+        window.audio_engine.stop_all()
+    result["trigger_call_ms"] = summarize(trigger_call)
+    result["trigger_to_first_buffer_ms"] = summarize(list(meter.latencies_ms))
+    result["sample_cache"] = window.sample_cache.stats()
+
+    window.close()
+    window.deleteLater()
+    pump(0)
+    return result
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="Benchmark Cyteboard's hot paths headlessly and report JSON.")
+    parser.add_argument("--slots", default="1,25,100", help="Comma-separated library sizes (1-100 pads)")
+    parser.add_argument("--runs", type=int, default=20, help="Repetitions per measurement")
+    parser.add_argument("--output", help="Write the JSON here instead of printing it")
+    args = parser.parse_args()
+    sizes = [max(1, min(int(size), main.MAX_SOUNDS)) for size in args.slots.split(",")]
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    main.import_multimedia()
+    main.AudioOutputStream = NullOutput # Before the first window starts its audio
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "qt": QT_VERSION_STR,
+            "pyqt": PYQT_VERSION_STR,
+            "qpa_platform": app.platformName(),
+            "runs": args.runs,
+        },
+        "libraries": [benchmark_library(size, args.runs) for size in sizes],
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    try:
+        main_benchmark()
+    finally:
+        shutil.rmtree(BENCH_DIR, ignore_errors=True)
@@ -1,15 +1,33 @@
+import time
+STARTUP_STARTED = time.perf_counter() # Reported by --profile-startup
+
 import sys
 import os
+import re
 import json
+import sqlite3
+import hashlib
+import shutil
+import struct
+import mmap
+import numpy as np
+from array import array
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache, wraps
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QPushButton, QVBoxLayout, QSlider,
     QFileDialog, QMenu, QInputDialog, QLabel, QComboBox, QMessageBox,
-    QGridLayout, QFrame, QHBoxLayout, QColorDialog, QTabWidget, QLineEdit
+    QGridLayout, QFrame, QHBoxLayout, QColorDialog, QTabWidget, QTabBar, QLineEdit,
+    QDialog, QDialogButtonBox, QKeySequenceEdit, QListView, QDockWidget
 )
-from PyQt6.QtGui import QAction, QDragEnterEvent, QDropEvent, QPixmap, QIcon, QColor
-from PyQt6.QtCore import Qt, QUrl, QSize, QTime # Import QTime for formatting
+from PyQt6.QtGui import QAction, QDragEnterEvent, QDropEvent, QPixmap, QPixmapCache, QImage, QIcon, QColor, QGuiApplication, QPainter, QPalette, QKeySequence, QShortcut
+from PyQt6.QtCore import Qt, QUrl, QSize, QLineF, QTime, QObject, QTimer, QIODevice, QThread, QThreadPool, QMetaObject, pyqtSignal, pyqtSlot, QAbstractListModel, QFileSystemWatcher, QModelIndex, QMimeData # Import QTime for formatting
 
-from PyQt6.QtMultimedia import QMediaPlayer, QAudioOutput, QMediaDevices
+# QtMultimedia loads the platform audio backend, so it is only imported once the window is up, see import_multimedia()
+QMediaDevices = QAudioDecoder = QAudioSink = QAudioFormat = QAudio = None
 
 
 # --- CONFIGURATION ---
@@ -22,12 +40,57 @@ elif sys.platform.startswith('darwin'):
 else:
     DATA_DIR = os.path.join(os.getenv('HOME'), '.local', 'share', APP_NAME)
 
-DATA_FILE = os.path.join(DATA_DIR, "cyteboard_data.json")
-MAX_SOUNDS = 100
+PROFILE_FILE = os.path.join(DATA_DIR, "cyteboard_profile.db") # Settings, sound assignments and analysis (SQLite)
+PROFILE_VERSION = 1 # Schema version of PROFILE_FILE, kept in its user_version
+DATA_FILE = os.path.join(DATA_DIR, "cyteboard_data.json") # JSON data file of older versions, imported once
+JOURNAL_FILE = os.path.join(DATA_DIR, "cyteboard_data.journal") # Edits made since DATA_FILE was last written
+MAX_SOUNDS = 100 # Pads on one page
 BUTTONS_PER_ROW = 4
 MAX_ROWS = MAX_SOUNDS // BUTTONS_PER_ROW
 MIN_ROWS = 1
 DEFAULT_ROWS = 4
+PAGES_PER_BANK = 8
+BANK_COUNT = 8 # Banks A to H
+PAGE_COUNT = PAGES_PER_BANK * BANK_COUNT
+SLOTS_PER_BANK = MAX_SOUNDS * PAGES_PER_BANK
+TOTAL_SLOTS = SLOTS_PER_BANK * BANK_COUNT # Slot index = page * MAX_SOUNDS + position on the page
+SAMPLE_CACHE_BUDGET_MB = 256 # Memory budget for decoded (PCM) sounds, oldest-used are evicted first
+SAMPLE_CACHE_MAX_MAPS = 128 # WAV files played in place at once, each mapping holds a file open (macOS allows 256)
+STREAM_MIN_DURATION_S = 60 # Longer sounds are streamed from disk instead of decoded into memory
+STREAM_MIN_FILE_MB = 50 # Streaming threshold for files whose duration can't be read from the headers
+STREAM_BUFFER_MS = 10000 # Read-ahead of a streamed sound, the memory it uses is fixed by this
+STREAM_REFILL_MS = 20 # How often a stream tops up its buffer
+STREAM_IDLE_S = 2 # A stream nothing reads for this long is closed
+ENGINE_SAMPLE_RATE = 48000 # All sounds are decoded and mixed at this rate
+ENGINE_CHANNELS = 2
+VOICE_COUNT = 16 # Sounds that can play at the same time
+VOICE_STEAL_POLICY = "oldest" # Which voice a new sound replaces when all are busy: "oldest", "quietest" or "retrigger"
+SINK_BUFFER_MS = 40 # Audio device buffer, lower means less latency but more risk of dropouts
+MIX_RING_MS = 500 # How far one output may lag behind another before it skips ahead
+LATENCY_HISTORY = 256 # Trigger latencies kept for --profile-latency and the HUD
+TRACE_BUFFER_EVENTS = 100000 # Newest trace events kept in memory for --trace
+HUD_REFRESH_MS = 250 # How often the performance overlay updates
+THEME_PREVIEW_SETTLE_MS = 300 # Theme Factory edits restyle the whole window once they pause this long
+MIDI_BASE_NOTE = 36 # Note that plays the first pad, C1 is where most pad controllers start
+MIDI_VELOCITY_CURVE = 2.0 # Exponent from velocity to gain, 1.0 would be linear
+MIDI_VIRTUAL_PORT = "Cyteboard" # Virtual MIDI input other software can send triggers to
+PROBE_THREADS = 4 # Background threads checking files and preparing icons
+LOUDNESS_TARGET_LUFS = -16.0 # Every pad is played at this integrated loudness when normalization is on
+LOUDNESS_MAX_BOOST_DB = 12.0 # Quiet sounds are never raised by more than this
+TRUE_PEAK_CEILING_DBTP = -1.0 # Normalization never pushes a sound's true peak above this
+ICON_CACHE_MB = 16 # Memory limit for scaled icons shared by all buttons
+THUMBNAIL_DIR = os.path.join(DATA_DIR, "thumbnails") # Icons scaled once are kept here across runs
+WAVEFORM_DIR = os.path.join(DATA_DIR, "waveforms") # Peak pyramids, computed once per sound file
+WAVEFORM_BASE_FRAMES = 256 # Frames summarized by one peak at the most detailed zoom level
+WAVEFORM_MIN_PEAKS = 64 # Zoom levels are halved until they are this small
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".ogg")
+LIBRARY_INDEX_FILE = os.path.join(DATA_DIR, "library_index.json") # Every sound found in the library folders
+LIBRARY_PROGRESS_FILES = 500 # Scan progress is reported after this many files
+FINGERPRINT_BYTES = 64 * 1024 # Hashed from the start and the end of a sound to recognize it after a move
+WATCH_SETTLE_MS = 300 # Folder changes are collected this long, a copy or move fires many at once
+MEDIA_DIR = os.path.join(DATA_DIR, "media") # Managed copies of assigned sounds and images, named by content hash
+MEDIA_PCM_SUFFIX = ".pcm.wav" # Decoded copy of a compressed sound, played in place like any 48 kHz WAV
+MEDIA_GC_GRACE_S = 600 # Unreferenced copies younger than this are kept, they may be an import in progress
 
 # --- THEMES ---
 THEMES = {
@@ -484,357 +547,3584 @@ THEMES = {
 }
 
 
-class SoundButton(QPushButton):
-    """ A custom button that can play a sound, with drag/drop and context menu. """
-    def __init__(self, label, index, parent):
-        super().__init__(label)
-        self.index = index
-        self.parent = parent
-        self.setAcceptDrops(True)
-        self.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
-        self.customContextMenuRequested.connect(self.show_context_menu)
-        self.clicked.connect(self.handle_click)
-        self.setProperty("broken", False)
-        self.icon_path = ""
-        self.update_icon() # Initialize with a potential icon
+@lru_cache(maxsize=32)
+def compile_stylesheet(theme_items):
+    """ Builds the application stylesheet for a theme given as sorted (key, color) pairs; cached per theme. """
+    theme = dict(theme_items)
+    return f"""
+        QMainWindow, QWidget {{
+            background-color: {theme["bg_color"]};
+            color: {theme["text_color"]};
+            font-family: "Lucida Console", "Courier New", monospace;
+        }}
+        QPushButton {{
+            background-color: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1, stop: 0 {theme["button_bg_gradient_stop0"]}, stop: 1 {theme["button_bg_gradient_stop1"]});
+            border: 1px solid {theme["button_border"]};
+            border-radius: 8px;
+            color: {theme["text_color"]};
+            font-size: 12px;
+            font-weight: bold;
+            padding: 5px;
+            min-width: 70px;
+            max-width: 100px;
+            min-height: 30px;
+            max-height: 50px;
+            text-align: center;
+        }}
+        QPushButton:hover {{
+            background-color: {theme["button_hover_bg"]};
+            color: {theme["button_hover_text"]};
+            border: 1px solid {theme["button_border"]};
+        }}
+        QPushButton:pressed {{
+            background-color: {theme["button_pressed_bg"]};
+            border-color: {theme["button_pressed_bg"]};
+            color: {theme["button_hover_text"]};
+        }}
+        QPushButton[broken="true"] {{
+            border: 1px solid {theme["broken_button_border"]};
+            color: {theme["broken_button_text"]};
+            background-color: {theme["broken_button_bg"]};
+        }}
+        QPushButton[broken="true"]:hover {{
+            border-color: {theme["broken_button_hover_border"]};
+            color: {theme["button_hover_text"]};
+            background-color: {theme["broken_button_hover_bg"]};
+        }}
+        QLabel {{
+            color: {theme["text_color"]};
+            font-size: 12px;
+            font-weight: bold;
+            letter-spacing: 2px;
+            text-transform: uppercase;
+        }}
+        QSlider::groove:horizontal {{ background: {theme["slider_groove_bg"]}; border: 1px solid #3a3a3a; height: 4px; border-radius: 2px; }}
+        QSlider::handle:horizontal {{ background: {theme["slider_handle_bg"]}; border: 2px solid {theme["slider_handle_border"]}; width: 16px; height: 16px; margin: -8px 0; border-radius: 8px; }}
+        QSlider::handle:horizontal:hover {{ background: {theme["button_hover_bg"]}; }}
+        QComboBox {{ background-color: {theme["combo_bg"]}; border: 1px solid {theme["combo_border"]}; border-radius: 5px; padding: 5px 10px; color: {theme["text_color"]}; font-weight: bold; }}
+        QComboBox:hover {{ border: 1px solid {theme["button_hover_bg"]}; }}
+        QComboBox::drop-down {{ subcontrol-origin: padding; subcontrol-position: top right; width: 25px; border-left-width: 1px; border-left-color: {theme["combo_border"]}; border-left-style: solid; border-top-right-radius: 5px; border-bottom-right-radius: 5px; }}
+        QComboBox QAbstractItemView {{ background-color: {theme["bg_color"]}; border: 1px solid {theme["combo_border"]}; selection-background-color: {theme["button_hover_bg"]}; selection-color: {theme["button_hover_text"]}; color: {theme["text_color"]}; outline: 0px; padding: 5px; }}
+        QMenu {{ background-color: {theme["menu_bg"]}; border: 1px solid {theme["menu_border"]}; color: {theme["text_color"]}; padding: 5px; }}
+        QMenu::item {{ padding: 8px 25px; border-radius: 4px; }}
+        QMenu::item:selected {{ background-color: {theme["button_hover_bg"]}; color: {theme["button_hover_text"]}; }}
+        QMenu::item:disabled {{ color: #555; }}
+        QMenu::separator {{ height: 1px; background: {theme["separator_border"]}; margin: 5px 5px; }}
+        #SeparatorFrame {{ border: 1px solid {theme["separator_border"]}; }}
+        QDialog, QMessageBox, QInputDialog {{ background-color: {theme["bg_color"]}; }}
+        QLineEdit {{ background-color: {theme["input_bg"]}; border: 1px solid {theme["input_border"]}; border-radius: 5px; color: {theme["text_color"]}; padding: 5px; font-size: 14px; }}
+        QLineEdit:focus {{ border: 1px solid {theme["button_hover_bg"]}; }}
+        QPushButton {{
+            /* Apply border-radius to the icon as well, if supported, otherwise it's just the button */
+            border-image: url(none); /* Prevents default image styling interfering */
+            qproperty-iconSize: 32px 32px; /* Set desired icon size to be smaller */
+        }}
+        QPushButton::hover {{
+            border-image: url(none);
+        }}
+        QPushButton::pressed {{
+            border-image: url(none);
+        }}
+        QTabWidget::pane {{ /* The tab widget frame */
+            border: 1px solid {theme["separator_border"]};
+            background-color: {theme["bg_color"]};
+        }}
+        QTabWidget::tab-bar {{
+            left: 5px; /* move to the right */
+        }}
+        QTabBar::tab {{
+            background: {theme["combo_bg"]};
+            border: 1px solid {theme["combo_border"]};
+            border-bottom-color: {theme["combo_border"]}; /* same as pane color */
+            border-top-left-radius: 4px;
+            border-top-right-radius: 4px;
+            min-width: 8ex;
+            padding: 5px 10px;
+            color: {theme["text_color"]};
+            font-weight: bold;
+        }}
+        QTabBar::tab:selected, QTabBar::tab:hover {{
+            background: {theme["button_hover_bg"]};
+            color: {theme["button_hover_text"]};
+        }}
+        QTabBar::tab:selected {{
+            border-color: {theme["button_hover_bg"]};
+            border-bottom-color: {theme["bg_color"]}; /* make selected tab appear connected to the pane */
+        }}
+        #StreamButton {{ /* Default style for the Stream button (inactive) */
+            background-color: #dc3545; /* Red color */
+            border: 1px solid #dc3545;
+            color: white;
+        }}
+        #StreamButton:hover {{
+            background-color: #c82333; /* Darker red on hover */
+            border: 1px solid #c82333;
+        }}
+        #StreamButton:pressed {{
+            background-color: #bd2130; /* Even darker red when pressed */
+            border: 1px solid #bd2130;
+        }}
+        #StreamButton[active="true"] {{ /* Style when streaming is active */
+            background-color: #28a745; /* Green color */
+            border: 1px solid #28a745;
+            color: white;
+        }}
+        #StreamButton[active="true"]:hover {{
+            background-color: #218838; /* Darker green on hover */
+            border: 1px solid #218838;
+        }}
+        #StreamButton[active="true"]:pressed {{
+            background-color: #1e7e34; /* Even darker green when pressed */
+            border: 1px solid #1e7e34;
+        }}
+    """
 
-        # Ensure text is visible even with an icon
-        self.setText(label)
-        self.setIconSize(QSize(32, 32)) # Smaller default icon size
 
-    def update_style(self):
-        """ Forces a re-evaluation of the stylesheet for this widget. """
-        self.style().unpolish(self)
-        self.style().polish(self)
-        self.update_icon() # Also update icon when style updates
+STYLE_RULE = re.compile(r"([^{}]+)\{([^{}]*)\}") # selector, declarations; the stylesheet has no nested blocks
+PREVIEW_SCOPES = ("QPushButton", "QSlider", "QComboBox", "QLineEdit", "QTabBar", "QMenu") # Widget types a colour preview can restyle alone
 
-    def update_icon(self):
-        """ Sets or clears the button's icon based on self.icon_path. """
-        if self.icon_path and os.path.exists(self.icon_path):
-            pixmap = QPixmap(self.icon_path)
-            # Scale pixmap to fit a reasonable size for the button
-            scaled_pixmap = pixmap.scaled(self.iconSize(), Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
-            self.setIcon(QIcon(scaled_pixmap))
-            self.setText(self.text()) # Ensure text is still set
-        else:
-            self.setIcon(QIcon()) # Clear the icon
 
-    def handle_click(self):
-        """ Plays the sound, opens a file dialog, or prompts to relocate a missing file. """
-        is_broken = self.property("broken")
-        
-        if self.text().startswith("Empty") or is_broken:
-            self.load_new_sound()
-        else:
-            data = self.parent.audio_files.get(str(self.index))
-            if data and os.path.exists(data["path"]):
-                url = QUrl.fromLocalFile(data["path"])
-                self.parent.play_on_all_outputs(url)
-            elif data:
-                self.setProperty("broken", True)
-                self.setToolTip(f"FILE NOT FOUND. Click to relocate.\nOriginal path: {data['path']}")
-                self.update_style()
+def selector_scopes(selectors):
+    """ Widget type or #name each selector in a comma-separated group starts with. """
+    return {re.match(r"\s*(#?\w+)", selector).group(1) for selector in selectors.split(",")}
 
-    def load_new_sound(self):
-        """ Opens a file dialog to select a new audio file. """
-        file_path, _ = QFileDialog.getOpenFileName(self, "Select Audio File", "", "Audio Files (*.mp3 *.wav *.ogg)")
-        if file_path:
-            self.assign_file(file_path)
 
-    def assign_file(self, file_path, icon_path=""):
-        """ Assigns a new audio file to this button and updates its state. """
-        filename = os.path.basename(file_path)
-        nickname = os.path.splitext(filename)[0]
-        self.setText(nickname)
-        self.icon_path = icon_path # Store icon path
-        self.parent.audio_files[str(self.index)] = {
-            "path": file_path,
-            "nickname": nickname,
-            "icon": icon_path # Save icon path in data
-        }
-        self.setProperty("broken", False)
-        self.setToolTip(f"Path: {file_path}")
-        self.update_style()
+@lru_cache(maxsize=None)
+def theme_key_scopes(key):
+    """ Widget types whose rules use a theme colour, found by compiling the stylesheet with that colour changed. """
+    probe = dict(THEMES["Cyber Green"])
+    probe[key] = "#010203"
+    scopes = set()
+    for selectors, declarations in STYLE_RULE.findall(compile_stylesheet(tuple(sorted(probe.items())))):
+        if "#010203" in declarations:
+            scopes |= selector_scopes(selectors)
+    return frozenset(scopes)
 
-    def show_context_menu(self, pos):
-        """ Shows a right-click context menu for the button. """
-        if self.text().startswith("Empty") and not self.property("broken"):
-            return # No menu for truly empty slots
 
-        menu = QMenu(self)
-        
-        load_sound_action = QAction("Load Sound", self)
-        load_sound_action.triggered.connect(self.load_new_sound)
-        menu.addAction(load_sound_action)
+@lru_cache(maxsize=32)
+def scoped_stylesheet(style, scope):
+    """ The rules of a compiled stylesheet that style one widget type. """
+    return "\n".join(f"{selectors}{{{declarations}}}" for selectors, declarations in STYLE_RULE.findall(style)
+                     if scope in selector_scopes(selectors))
 
-        if not self.text().startswith("Empty") and not self.property("broken"):
-            change_nickname_action = QAction("Change Nickname", self)
-            change_nickname_action.triggered.connect(self.change_nickname)
-            menu.addAction(change_nickname_action)
-            
-            set_image_action = QAction("Set Image", self)
-            set_image_action.triggered.connect(self.set_image)
-            menu.addAction(set_image_action)
 
-            if self.icon_path:
-                clear_image_action = QAction("Clear Image", self)
-                clear_image_action.triggered.connect(self.clear_image)
-                menu.addAction(clear_image_action)
+# --- INSTRUMENTATION ---
+NULL_SPAN = nullcontext() # What Tracer.span() returns while tracing is off
 
-        if not self.text().startswith("Empty") or self.property("broken"):
-            menu.addSeparator()
-            remove_action = QAction("Remove Sound", self)
-            remove_action.triggered.connect(self.remove_file)
-            menu.addAction(remove_action)
-            
-        menu.exec(self.mapToGlobal(pos))
 
-    def remove_file(self):
-        """ Removes the sound and image from the button and data. """
-        self.setText(f"Empty {self.index + 1}")
-        self.icon_path = "" # Clear icon path
-        self.parent.audio_files.pop(str(self.index), None)
-        self.setProperty("broken", False)
-        self.setToolTip("")
-        self.update_style()
+class Tracer:
+    """ Records timed spans into a bounded buffer and exports them as Chrome trace-event JSON.
 
-    def change_nickname(self):
-        """ Opens a dialog to change the button's display text (nickname). """
-        current_nickname = self.parent.audio_files.get(str(self.index), {}).get("nickname", "")
-        text, ok = QInputDialog.getText(self, "Set Nickname", "Enter nickname:", text=current_nickname)
-        if ok and text:
-            self.setText(text)
-            if str(self.index) in self.parent.audio_files:
-                self.parent.audio_files[str(self.index)]["nickname"] = text
+    Disabled unless started with --trace, in which case a span costs two clock reads and an append.
+    """
+    def __init__(self, capacity=TRACE_BUFFER_EVENTS):
+        self.enabled = False
+        self.events = deque(maxlen=capacity) # (phase, name, start ns, duration ns, thread id, args)
 
-    def set_image(self):
-        """ Opens a file dialog to select an image for the button. """
-        image_path, _ = QFileDialog.getOpenFileName(self, "Select Image", "", "Image Files (*.png *.jpg *.jpeg *.gif *.bmp)")
-        if image_path:
-            self.icon_path = image_path
-            if str(self.index) in self.parent.audio_files:
-                self.parent.audio_files[str(self.index)]["icon"] = image_path
-            self.update_icon()
+    def span(self, name, **args):
+        if not self.enabled:
+            return NULL_SPAN
+        return self._span(name, args)
 
-    def clear_image(self):
-        """ Clears the image associated with the button. """
-        self.icon_path = ""
-        if str(self.index) in self.parent.audio_files:
-            self.parent.audio_files[str(self.index)]["icon"] = ""
-        self.update_icon()
+    @contextmanager
+    def _span(self, name, args):
+        started = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.events.append(("X", name, started, time.perf_counter_ns() - started, threading.get_ident(), args))
 
-    def dragEnterEvent(self, event: QDragEnterEvent):
-        if event.mimeData().hasUrls():
-            event.acceptProposedAction()
+    def counter(self, name, **values):
+        """ Records values that Chrome's trace viewer plots over time. """
+        if self.enabled:
+            self.events.append(("C", name, time.perf_counter_ns(), 0, threading.get_ident(), values))
 
-    def dropEvent(self, event: QDropEvent):
-        for url in event.mimeData().urls():
-            file_path = url.toLocalFile()
-            if file_path.lower().endswith(('.mp3', '.wav', '.ogg')):
-                self.assign_file(file_path)
-                break
-            elif file_path.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp')):
-                self.icon_path = file_path
-                if str(self.index) in self.parent.audio_files:
-                    self.parent.audio_files[str(self.index)]["icon"] = file_path
-                self.update_icon()
-                break
+    def export_chrome(self, path):
+        """ Writes the recorded events in the format chrome://tracing and Perfetto open. """
+        pid = os.getpid()
+        events = list(self.events)
+        origin = events[0][2] if events else 0
+        # Labels for the threads in the viewer; Qt's own threads and finished workers are only known by id
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for event in events:
+            names.setdefault(event[4], f"Thread {event[4]}")
+        trace_events = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": thread_id, "args": {"name": name}}
+            for thread_id, name in names.items()
+        ]
+        for phase, name, started, duration, thread_id, args in events:
+            event = {"name": name, "ph": phase, "ts": (started - origin) / 1000.0, "pid": pid, "tid": thread_id}
+            if phase == "X":
+                event["dur"] = duration / 1000.0
+            if args:
+                event["args"] = args
+            trace_events.append(event)
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+        except OSError as e:
+            print(f"Warning: Could not write trace to {path}: {e}")
 
-class ThemeFactory(QWidget):
-    """ A widget for creating and customizing themes. """
-    def __init__(self, parent_app):
-        super().__init__()
-        self.parent_app = parent_app
-        self.current_custom_theme = parent_app.custom_theme.copy() if parent_app.custom_theme else self._get_default_custom_theme()
-        self.init_ui()
-        self.update_color_buttons()
 
-    def _get_default_custom_theme(self):
-        # A default set of colors for the custom theme
-        return {
-            "bg_color": "#202020",
-            "text_color": "#00ff7f",
-            "button_bg_gradient_stop0": "#303030",
-            "button_bg_gradient_stop1": "#202020",
-            "button_border": "#00ff7f",
-            "button_hover_bg": "#00ff7f",
-            "button_hover_text": "#202020",
-            "button_pressed_bg": "#00aa55",
-            "broken_button_border": "#ff4747",
-            "broken_button_text": "#ff4747",
-            "broken_button_bg": "#4d1a1a",
-            "broken_button_hover_bg": "#ff4747",
-            "broken_button_hover_border": "#ff8a8a",
-            "slider_groove_bg": "#303030",
-            "slider_handle_bg": "#00ff7f",
-            "slider_handle_border": "#202020",
-            "combo_bg": "#303030",
-            "combo_border": "#00ff7f",
-            "menu_bg": "#303030",
-            "menu_border": "#00ff7f",
-            "separator_border": "#00ff7f",
-            "input_bg": "#303030",
-            "input_border": "#00ff7f",
-        }
+TRACER = Tracer()
 
-    def init_ui(self):
-        layout = QGridLayout(self)
-        layout.setSpacing(10)
-        layout.setContentsMargins(20, 20, 20, 20)
 
-        color_options = [
-            ("Background Color", "bg_color"),
-            ("Text Color", "text_color"),
-            ("Button Gradient Start", "button_bg_gradient_stop0"),
-            ("Button Gradient End", "button_bg_gradient_stop1"),
-            ("Button Border", "button_border"),
-            ("Button Hover BG", "button_hover_bg"),
-            ("Button Hover Text", "button_hover_text"),
-            ("Button Pressed BG", "button_pressed_bg"),
-            ("Broken Button Border", "broken_button_border"),
-            ("Broken Button Text", "broken_button_text"),
-            ("Broken Button BG", "broken_button_bg"),
-            ("Broken Button Hover BG", "broken_button_hover_bg"),
-            ("Broken Button Hover Border", "broken_button_hover_border"),
-            ("Slider Groove BG", "slider_groove_bg"),
-            ("Slider Handle BG", "slider_handle_bg"),
-            ("Slider Handle Border", "slider_handle_border"),
-            ("Combo Box BG", "combo_bg"),
-            ("Combo Box Border", "combo_border"),
-            ("Menu BG", "menu_bg"),
-            ("Menu Border", "menu_border"),
-            ("Separator Border", "separator_border"),
-            ("Input BG", "input_bg"),
-            ("Input Border", "input_border"),
-        ]
+def traced(name):
+    """ Decorator that wraps a function in a TRACER span. """
+    def decorate(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not TRACER.enabled:
+                return function(*args, **kwargs)
+            with TRACER._span(name, None):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
 
-        self.color_buttons = {}
-        for i, (label_text, key) in enumerate(color_options):
-            # Corrected logic for row and column
-            row = i // 2
-            col = (i % 2) * 2 # For label
-            
-            label = QLabel(label_text)
-            label.setAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
-            layout.addWidget(label, row, col)
 
-            color_button = QPushButton("")
-            color_button.setFixedSize(QSize(30, 25))
-            color_button.clicked.connect(lambda checked, k=key: self.pick_color(k))
-            layout.addWidget(color_button, row, col + 1) # For button
-            self.color_buttons[key] = color_button
-        
-        # Adjust row calculation for the buttons below
-        num_color_options_rows = (len(color_options) + 1) // 2 
-        
-        apply_button = QPushButton("Apply Custom Theme")
-        apply_button.clicked.connect(self.apply_custom_theme)
-        layout.addWidget(apply_button, num_color_options_rows, 0, 1, 2) # Span across two columns
+# --- AUDIO ENGINE ---
+def import_multimedia():
+    """ Imports QtMultimedia on first use. """
+    global QMediaDevices, QAudioDecoder, QAudioSink, QAudioFormat, QAudio
+    if QMediaDevices is None:
+        from PyQt6.QtMultimedia import QMediaDevices, QAudioDecoder, QAudioSink, QAudioFormat, QAudio
 
-        save_button = QPushButton("Save Custom Theme")
-        save_button.clicked.connect(self.save_custom_theme)
-        layout.addWidget(save_button, num_color_options_rows + 1, 0, 1, 2)
 
-        reset_button = QPushButton("Reset to Default Custom")
-        reset_button.clicked.connect(self.reset_custom_theme)
-        layout.addWidget(reset_button, num_color_options_rows + 2, 0, 1, 2)
+def engine_audio_format(sample_format=None):
+    """ The fixed format every sound is decoded to and mixed in (32-bit float unless given). """
+    audio_format = QAudioFormat()
+    audio_format.setSampleRate(ENGINE_SAMPLE_RATE)
+    audio_format.setChannelCount(ENGINE_CHANNELS)
+    audio_format.setSampleFormat(sample_format or QAudioFormat.SampleFormat.Float)
+    return audio_format
 
-    def pick_color(self, key):
-        initial_color = QColor(self.current_custom_theme.get(key, "#000000"))
-        color = QColorDialog.getColor(initial_color, self, f"Select {key.replace('_', ' ').title()} Color")
-        if color.isValid():
-            self.current_custom_theme[key] = color.name()
-            self.update_color_buttons()
-            self.apply_custom_theme() # Apply immediately for preview
 
-    def update_color_buttons(self):
-        for key, button in self.color_buttons.items():
-            color_hex = self.current_custom_theme.get(key, "#000000")
-            button.setStyleSheet(f"background-color: {color_hex}; border: 1px solid #555; border-radius: 5px;")
-            button.setToolTip(color_hex)
+def pcm_to_engine_frames(raw, audio_format):
+    """ Converts raw decoder output to float32 frames at the engine's rate and channel count. """
+    sample_format = audio_format.sampleFormat()
+    if sample_format == QAudioFormat.SampleFormat.Float:
+        samples = np.frombuffer(raw, dtype=np.float32)
+    elif sample_format == QAudioFormat.SampleFormat.Int16:
+        samples = np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+    elif sample_format == QAudioFormat.SampleFormat.Int32:
+        samples = np.frombuffer(raw, dtype=np.int32).astype(np.float32) / 2147483648.0
+    elif sample_format == QAudioFormat.SampleFormat.UInt8:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    else:
+        return np.zeros((0, ENGINE_CHANNELS), dtype=np.float32)
 
-    def apply_custom_theme(self):
-        self.parent_app.custom_theme = self.current_custom_theme.copy()
-        self.parent_app.apply_theme("Custom")
+    channels = max(1, audio_format.channelCount())
+    frames = samples[:len(samples) - len(samples) % channels].reshape(-1, channels)
+    if channels == 1:
+        frames = np.repeat(frames, ENGINE_CHANNELS, axis=1)
+    elif channels > ENGINE_CHANNELS:
+        frames = frames[:, :ENGINE_CHANNELS]
 
-    def save_custom_theme(self):
-        self.parent_app.custom_theme = self.current_custom_theme.copy()
-        QMessageBox.information(self, "Theme Saved", "Custom theme settings saved!")
-        # The theme will be saved automatically when the app closes via closeEvent
+    rate = audio_format.sampleRate()
+    if rate and rate != ENGINE_SAMPLE_RATE and len(frames):
+        # Linear resampling; decoders normally honour the requested rate so this is rare
+        target = np.arange(int(len(frames) * ENGINE_SAMPLE_RATE / rate)) * (rate / ENGINE_SAMPLE_RATE)
+        source = np.arange(len(frames))
+        frames = np.column_stack([np.interp(target, source, frames[:, c]) for c in range(ENGINE_CHANNELS)])
+    return np.ascontiguousarray(frames, dtype=np.float32)
 
-    def reset_custom_theme(self):
-        self.current_custom_theme = self._get_default_custom_theme()
-        self.update_color_buttons()
-        self.apply_custom_theme()
-        QMessageBox.information(self, "Theme Reset", "Custom theme reset to default settings.")
 
+class DecodedSample:
+    """ PCM frames of one fully decoded audio file, in the engine format. """
+    def __init__(self, path, frames):
+        self.path = path
+        self.frames = frames # float32 array of shape (frame_count, ENGINE_CHANNELS)
+        self.frame_count = len(frames)
+        self.nbytes = frames.nbytes
+        self.peak = float(np.abs(frames).max()) if self.frame_count else 0.0
+        self.last_used = time.perf_counter_ns() # Stamped on every use, the oldest is evicted first
 
-class Cyteboard(QMainWindow):
-    """ The main application window with dynamic button grid. """
-    def __init__(self):
-        super().__init__()
-        self.setWindowTitle(APP_NAME)
-        self.setGeometry(100, 100, 800, 600)
+    def duration_ms(self):
+        return self.frame_count * 1000 // ENGINE_SAMPLE_RATE
 
-        # Ensure the data directory exists
-        os.makedirs(DATA_DIR, exist_ok=True)
+    def chunk(self, start, end):
+        return self.frames[start:end]
 
-        self.audio_files = {}
-        self.buttons = []
-        self.num_rows = DEFAULT_ROWS
-        self.current_theme_name = "Cyber Green" # Default theme
-        self.custom_theme = None # To store the user's custom theme
-        self.is_streaming_active = False # New state for the stream button
 
-        self.player_output = QMediaPlayer(self)
-        self.audio_output_device = QAudioOutput()
-        self.player_output.setAudioOutput(self.audio_output_device)
-        self.player_virtual = QMediaPlayer(self)
-        self.audio_virtual_device = QAudioOutput()
-        self.player_virtual.setAudioOutput(self.audio_virtual_device)
+WAV_DTYPES = {(1, 8): "u1", (1, 16): "<i2", (1, 32): "<i4", (3, 32): "<f4", (3, 64): "<f8"} # (format tag, bits) -> sample type
 
-        # Initialize timeline slider and labels
-        self.position_slider = QSlider(Qt.Orientation.Horizontal)
-        self.current_time_label = QLabel("00:00")
-        self.total_time_label = QLabel("00:00")
 
-        # Connect player signals to timeline
-        self.player_output.durationChanged.connect(self.duration_changed)
-        self.player_output.positionChanged.connect(self.position_changed)
-        # Use sliderReleased to prevent constant updates while dragging
-        self.position_slider.sliderReleased.connect(self.set_position_from_slider)
+def read_wav_layout(path):
+    """ Walks a WAV file's RIFF chunks: (format tag, channels, rate, bits, data offset, data size), or None. """
+    with open(path, "rb") as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+            return None
+        wav_format = None
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                return None
+            chunk_id, size = struct.unpack("<4sI", chunk)
+            if chunk_id == b"fmt ":
+                body = f.read(size + size % 2)
+                tag, channels, rate, _, _, bits = struct.unpack_from("<HHIIHH", body)
+                if tag == 0xFFFE and size >= 26: # WAVE_FORMAT_EXTENSIBLE, the real tag starts the SubFormat GUID
+                    tag = struct.unpack_from("<H", body, 24)[0]
+                wav_format = (tag, channels, rate, bits)
+            elif chunk_id == b"data":
+                if wav_format is None:
+                    return None
+                offset = f.tell()
+                # Writers that never finalized the header leave 0 or 0xFFFFFFFF here
+                f.seek(0, os.SEEK_END)
+                available = f.tell() - offset
+                return wav_format + (offset, min(size, available) if size else available)
+            else:
+                f.seek(size + size % 2, os.SEEK_CUR) # Chunks are padded to an even size
 
 
-        self.load_data()
-        self.init_ui()
-        self.apply_theme(self.current_theme_name) # Apply initial theme
-        self.rebuild_button_grid()
-        
-        self.audio_output_device.setVolume(self.volume_slider.value() / 100.0)
-        self.audio_virtual_device.setVolume(self.volume_slider.value() / 100.0)
+def wav_layout_mappable(layout):
+    """ Whether a WAV layout can be played in place: a sample type numpy reads and the engine's rate. """
+    return layout is not None and (layout[0], layout[3]) in WAV_DTYPES and layout[1] > 0 and layout[2] == ENGINE_SAMPLE_RATE
 
-    def init_ui(self):
-        """ Initializes the main window layout and control panel. """
-        self.tab_widget = QTabWidget()
-        self.setCentralWidget(self.tab_widget)
 
-        # Main Soundboard Tab
-        self.main_soundboard_widget = QWidget()
-        main_layout = QVBoxLayout(self.main_soundboard_widget)
-        main_layout.setSpacing(20)
-        main_layout.setContentsMargins(20, 20, 20, 20)
-        
-        self.grid_container = QWidget()
-        self.grid_container.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
-        self.grid_container.customContextMenuRequested.connect(self.show_background_context_menu)
-        self.button_layout = QGridLayout(self.grid_container)
-        self.button_layout.setSpacing(10)
-        main_layout.addWidget(self.grid_container)
+class MappedSample:
+    """ A PCM WAV file played in place: its sample data is memory-mapped, not decoded or copied.
 
-        separator = QFrame()
-        separator.setFrameShape(QFrame.Shape.HLine)
-        separator.setFrameShadow(QFrame.Shadow.Sunken)
-        separator.setObjectName("SeparatorFrame")
+    The OS page cache keeps often used files resident. Float32 stereo is mixed straight from the
+    mapping; other sample types are converted one mixed block at a time. The file stays open until
+    the last reference is dropped, voices still playing it keep it alive after an eviction.
+    """
+    def __init__(self, path, layout):
+        tag, channels, _, bits, offset, size = layout
+        dtype = np.dtype(WAV_DTYPES[(tag, bits)])
+        with open(path, "rb") as f:
+            self.mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        count = size // (dtype.itemsize * channels) * channels
+        self.path = path
+        self.data = np.frombuffer(self.mapping, dtype=dtype, count=count, offset=offset).reshape(-1, channels)
+        self.frame_count = len(self.data)
+        self.nbytes = 0 # Lives in the page cache, it doesn't count against the cache budget
+        self.peak = 1.0 # Not known without reading the whole file
+        self.last_used = time.perf_counter_ns()
+        self.direct = dtype == np.float32 and channels == ENGINE_CHANNELS
+        if dtype.kind == "u":
+            self.offset, self.scale = 128.0, 1.0 / 128.0
+        elif dtype.kind == "i":
+            self.offset, self.scale = 0.0, 1.0 / (1 << (bits - 1))
+        else:
+            self.offset, self.scale = 0.0, 1.0
+
+    def duration_ms(self):
+        return self.frame_count * 1000 // ENGINE_SAMPLE_RATE
+
+    def chunk(self, start, end):
+        raw = self.data[start:end]
+        if self.direct:
+            return raw
+        frames = raw.astype(np.float32)
+        if self.offset:
+            frames -= self.offset
+        if self.scale != 1.0:
+            frames *= self.scale
+        if frames.shape[1] == 1:
+            return np.repeat(frames, ENGINE_CHANNELS, axis=1)
+        return frames[:, :ENGINE_CHANNELS]
+
+
+def map_wav(path):
+    """ Maps path as a MappedSample if it is a WAV the engine can play in place, else None. """
+    try:
+        layout = read_wav_layout(path)
+        if not wav_layout_mappable(layout):
+            return None
+        return MappedSample(path, layout)
+    except (OSError, ValueError, struct.error) as e:
+        print(f"Warning: Could not map {path}, decoding it instead: {e}")
+        return None
+
+
+def write_engine_wav(path, frames):
+    """ Writes engine frames as a 32-bit float WAV, in the layout map_wav() plays in place. """
+    data = np.ascontiguousarray(frames, dtype="<f4")
+    channels = data.shape[1]
+    block_align = channels * 4
+    header = b"RIFF" + struct.pack("<I", 36 + data.nbytes) + b"WAVE"
+    header += b"fmt " + struct.pack("<IHHIIHH", 16, 3, channels, ENGINE_SAMPLE_RATE, ENGINE_SAMPLE_RATE * block_align, block_align, 32)
+    header += b"data" + struct.pack("<I", data.nbytes)
+    temp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(header)
+        f.write(data.tobytes())
+    os.replace(temp_path, path)
+
+
+class SampleCache(QObject):
+    """ Decodes audio files to PCM once and serves them from memory, evicting the least recently used. """
+    sample_ready = pyqtSignal(str)
+    sample_evicted = pyqtSignal(str)
+    sample_too_large = pyqtSignal(str, int) # path, duration in ms (0 if unknown); it has to be streamed
+
+    def __init__(self, budget_mb=SAMPLE_CACHE_BUDGET_MB, parent=None):
+        super().__init__(parent)
+        self.budget_bytes = budget_mb * 1024 * 1024
+        self.samples = {} # path -> DecodedSample
+        self.total_bytes = 0
+        self.priority = frozenset() # Paths evicted only once nothing else is left, the bank on screen
+        self.max_maps = SAMPLE_CACHE_MAX_MAPS
+        self.mapped = 0 # MappedSamples in samples
+        self.too_large = {} # path -> duration in ms of files that don't fit the budget, never decoded again
+        self.hits = 0
+        self.misses = 0
+
+        # Files are decoded one after the other by a single decoder
+        self.pending = deque()
+        self.current_path = None
+        self.current_chunks = []
+        self.current_format = None
+        self.current_bytes = 0 # Size the chunks so far will have in the engine format
+        self.decoder = QAudioDecoder(self)
+        self.decoder.setAudioFormat(engine_audio_format())
+        self.decoder.bufferReady.connect(self._read_buffer)
+        self.decoder.finished.connect(self._finish_decode)
+        self.decoder.error.connect(self._decode_failed)
+
+    def set_budget(self, budget_mb):
+        self.budget_bytes = budget_mb * 1024 * 1024
+        self._evict()
+
+    def get(self, path):
+        """ Returns the decoded sample for path, or None (and queues a decode) on a miss. """
+        sample = self.samples.get(path)
+        if sample is not None:
+            sample.last_used = time.perf_counter_ns()
+            self.hits += 1
+            return sample
+        self.misses += 1
+        self.request(path)
+        return self.samples.get(path) # WAV files are mapped right away
+
+    def request(self, path):
+        """ Maps path if it is a plain PCM WAV, otherwise queues it for decoding, unless cached or queued. """
+        if not path or path in self.samples or path in self.too_large or path == self.current_path or path in self.pending:
+            return
+        if path.lower().endswith(".wav"):
+            sample = map_wav(path)
+            if sample is not None:
+                self.samples[path] = sample
+                self.mapped += 1
+                self._evict_maps()
+                self.sample_ready.emit(path)
+                return
+        self.pending.append(path)
+        if self.current_path is None:
+            self._start_next()
+
+    def preload(self, paths):
+        for path in paths:
+            self.request(path)
+
+    def set_priority(self, paths):
+        """ Makes paths the last to be evicted, and closes the mapped files of everything else. """
+        self.priority = frozenset(paths)
+        for path in [path for path, sample in self.samples.items() if not sample.nbytes and path not in self.priority]:
+            self._drop(path)
+
+    def release(self, path):
+        """ Closes path if it is mapped, so it can be moved or deleted; Windows refuses while it is open. """
+        sample = self.samples.get(path)
+        if sample is not None and not sample.nbytes:
+            self._drop(path)
+
+    def peek(self, path):
+        """ Returns the sample if cached, without counting a lookup or queuing a decode. """
+        return self.samples.get(path)
+
+    def stats(self):
+        """ Hit/miss counters and memory occupancy of the cache. """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "samples": len(self.samples),
+            "mapped": self.mapped,
+            "bytes": self.total_bytes,
+            "budget_bytes": self.budget_bytes,
+        }
+
+    def _start_next(self):
+        self.current_path = None
+        while self.pending:
+            path = self.pending.popleft()
+            if path in self.samples:
+                continue
+            self.current_path = path
+            self.current_chunks = []
+            self.current_format = None
+            self.current_bytes = 0
+            self.decoder.setSource(QUrl.fromLocalFile(path))
+            self.decoder.start()
+            return
+
+    def _read_buffer(self):
+        buffer = self.decoder.read()
+        if not buffer.isValid() or buffer.byteCount() == 0:
+            return
+        self.current_format = buffer.format()
+        self.current_chunks.append(buffer.constData().asstring(buffer.byteCount()))
+        rate = self.current_format.sampleRate() or ENGINE_SAMPLE_RATE
+        self.current_bytes += buffer.frameCount() * ENGINE_SAMPLE_RATE // rate * ENGINE_CHANNELS * 4
+        if self.current_bytes > self.budget_bytes:
+            # Would evict everything else; give up now instead of decoding the rest into memory
+            duration_ms = self.decoder.duration()
+            self._give_up(self.current_path, max(0, duration_ms))
+
+    @traced("decode")
+    def _finish_decode(self):
+        path = self.current_path
+        if path is not None and self.current_format is not None:
+            frames = pcm_to_engine_frames(b"".join(self.current_chunks), self.current_format)
+            # A file bigger than the whole budget would just evict everything else
+            if frames.nbytes > self.budget_bytes:
+                self._give_up(path, len(frames) * 1000 // ENGINE_SAMPLE_RATE)
+                return
+            self.samples[path] = DecodedSample(path, frames)
+            self.total_bytes += frames.nbytes
+            self._evict()
+        self.current_chunks = []
+        self.decoder.stop()
+        self._start_next()
+        if path in self.samples:
+            self.sample_ready.emit(path)
+
+    def _give_up(self, path, duration_ms):
+        print(f"Warning: {path} is larger than the sound cache ({self.budget_bytes // (1024 * 1024)} MB), it is streamed instead.")
+        self.too_large[path] = duration_ms
+        self.current_path = None
+        self.current_format = None
+        self.current_chunks = []
+        self.decoder.stop()
+        # Resumed once out of the decoder's handlers; a finished signal the stop causes may beat it to it
+        QTimer.singleShot(0, self._resume)
+        self.sample_too_large.emit(path, duration_ms)
+
+    def _resume(self):
+        if self.current_path is None:
+            self._start_next()
+
+    def _decode_failed(self, error):
+        print(f"Warning: Could not decode {self.current_path}: {self.decoder.errorString()}")
+        self.current_chunks = []
+        self.decoder.stop()
+        self._start_next()
+
+    def _evict(self):
+        while self.total_bytes > self.budget_bytes:
+            # Mapped files take no budget, only decoded ones are evicted
+            path = min(
+                (path for path, sample in self.samples.items() if sample.nbytes),
+                key=lambda path: (path in self.priority, self.samples[path].last_used),
+            )
+            self._drop(path)
+
+    def _evict_maps(self):
+        while self.mapped > self.max_maps:
+            path = min(
+                (path for path, sample in self.samples.items() if not sample.nbytes),
+                key=lambda path: (path in self.priority, self.samples[path].last_used),
+            )
+            self._drop(path)
+
+    def _drop(self, path):
+        sample = self.samples.pop(path)
+        if sample.nbytes:
+            self.total_bytes -= sample.nbytes
+        else:
+            self.mapped -= 1 # The file is closed once no voice is playing it either
+        self.sample_evicted.emit(path)
+
+
+class StreamedSample(QObject):
+    """ A long sound decoded in chunks into a bounded ring just ahead of where it plays.
+
+    One is created per trigger and used by a single voice, so memory stays at the ring's size
+    however long the file is. It stops decoding and deletes itself once nothing reads it anymore.
+    """
+    EMPTY = np.zeros((0, ENGINE_CHANNELS), dtype=np.float32)
+
+    def __init__(self, path, duration_ms=None, lock=None, parent=None):
+        super().__init__(parent)
+        self.path = path
+        # The engine's mixing lock: chunk() runs under it on the audio thread, a restart takes it to reset the ring
+        self.lock = lock if lock is not None else threading.RLock()
+        self.estimated_ms = duration_ms or 0 # From the file's headers, exact once decoding reached the end
+        self.frame_count = sys.maxsize # Unknown until decoding reached the end
+        self.capacity = ENGINE_SAMPLE_RATE * STREAM_BUFFER_MS // 1000
+        self.ring = np.zeros((self.capacity, ENGINE_CHANNELS), dtype=np.float32)
+        self.nbytes = self.ring.nbytes
+        self.peak = 1.0 # Not known without decoding everything
+        self.last_used = time.perf_counter_ns()
+        self.read_position = 0 # Where the voice reads, decoding never runs more than the ring ahead of it
+        self.decoded_until = 0 # Frames up to here are in the ring
+        self.source_frame = 0 # Next frame the decoder delivers
+        self.held = None # Decoded frames waiting for space in the ring
+        self.restart_at = None # Set by a seek outside the buffered range
+        self.last_read = time.perf_counter()
+
+        self.decoder = QAudioDecoder(self)
+        self.decoder.setAudioFormat(engine_audio_format())
+        self.decoder.setSource(QUrl.fromLocalFile(path))
+        self.decoder.bufferReady.connect(self._fill)
+        self.decoder.finished.connect(self._finish)
+        self.decoder.error.connect(self._decode_failed)
+        self.decoding = True
+        # Picks up decoded buffers again once the voice has made room, and notices when it is gone
+        self.refill_timer = QTimer(self)
+        self.refill_timer.setInterval(STREAM_REFILL_MS)
+        self.refill_timer.timeout.connect(self._fill)
+        self.refill_timer.start()
+        self.decoder.start()
+
+    def duration_ms(self):
+        if self.frame_count != sys.maxsize:
+            return self.frame_count * 1000 // ENGINE_SAMPLE_RATE
+        return self.estimated_ms
+
+    def chunk(self, start, end):
+        """ Frames start .. end as far as they are decoded; shorter (or empty) while decoding catches up. """
+        self.last_read = time.perf_counter()
+        self.read_position = start
+        decoded_until = self.decoded_until # Only grows while the GUI thread fills, read it once
+        if start < decoded_until - self.capacity or start > decoded_until:
+            self.restart_at = start # Seeked outside what is buffered
+            return self.EMPTY
+        end = min(end, decoded_until)
+        if end <= start:
+            return self.EMPTY # Underrun: the voice waits here instead of skipping ahead
+        index = start % self.capacity
+        if index + end - start <= self.capacity:
+            return self.ring[index:index + end - start]
+        return np.concatenate((self.ring[index:], self.ring[:index + end - start - self.capacity]))
+
+    def _fill(self):
+        if time.perf_counter() - self.last_read > STREAM_IDLE_S:
+            self.close() # The voice finished or was stolen
+            return
+        if self.restart_at is not None:
+            self._restart()
+        while True:
+            if self.held is None:
+                if self.decoder.bufferAvailable():
+                    self._take_buffer()
+                    continue
+                if not self.decoding and self.restart_at is None:
+                    self.frame_count = self.source_frame # Everything is decoded, the end is known
+                return
+            space = self.capacity - (self.decoded_until - self.read_position)
+            if len(self.held) > space:
+                return # Ring full, the refill timer tries again
+            index = self.decoded_until % self.capacity
+            first = min(len(self.held), self.capacity - index)
+            self.ring[index:index + first] = self.held[:first]
+            self.ring[:len(self.held) - first] = self.held[first:]
+            self.decoded_until += len(self.held)
+            self.held = None
+
+    def _take_buffer(self):
+        buffer = self.decoder.read()
+        if not buffer.isValid() or buffer.byteCount() == 0:
+            return
+        frames = pcm_to_engine_frames(buffer.constData().asstring(buffer.byteCount()), buffer.format())
+        first = self.source_frame
+        self.source_frame += len(frames)
+        if self.source_frame > self.decoded_until:
+            # After a restart, frames before the seek target are decoded and dropped
+            self.held = frames[max(0, self.decoded_until - first):]
+
+    def _restart(self):
+        # QAudioDecoder can't seek, so decoding starts over and skips ahead
+        self.decoder.stop()
+        with self.lock: # Not while a block is mixed, chunk() would see the ring half reset
+            frame, self.restart_at = self.restart_at, None
+            self.held = None
+            self.source_frame = 0
+            self.decoded_until = self.read_position = frame
+        self.decoding = True
+        self.decoder.start()
+
+    def _finish(self):
+        self.decoding = False
+        self._fill()
+
+    def _decode_failed(self, error):
+        print(f"Warning: Could not stream {self.path}: {self.decoder.errorString()}")
+        self.decoding = False
+        self.frame_count = self.decoded_until
+
+    def close(self):
+        self.refill_timer.stop()
+        self.decoder.stop()
+        self.decoding = False
+        self.frame_count = self.read_position # A voice that still holds it finishes on its next read
+        self.deleteLater()
+
+
+class Voice:
+    """ One preallocated playback slot of the mixer, reused for every trigger. """
+    __slots__ = ("sample", "slot", "position", "gain", "serial")
+
+    def __init__(self):
+        self.sample = None # None while the voice is free
+        self.slot = None
+        self.position = 0
+        self.gain = 1.0
+        self.serial = 0 # Increases on every start, so stolen voices can be told apart
+
+    def level(self):
+        return self.gain * self.sample.peak if self.sample is not None else 0.0
+
+
+class VoicePool:
+    """ A fixed set of voices with a policy for which one to steal when all are busy. """
+    STEAL_POLICIES = ("oldest", "quietest", "retrigger")
+
+    def __init__(self, size, steal_policy="oldest"):
+        self.voices = [Voice() for _ in range(size)]
+        self.steal_policy = steal_policy if steal_policy in self.STEAL_POLICIES else "oldest"
+        self.serial = 0
+
+    def start(self, sample, slot, gain=1.0):
+        """ Starts sample on a free (or stolen) voice and returns that voice. """
+        voice = self._allocate(slot)
+        self.serial += 1
+        voice.sample = sample
+        voice.slot = slot
+        voice.position = 0
+        voice.gain = gain
+        voice.serial = self.serial
+        return voice
+
+    def stop_all(self):
+        for voice in self.voices:
+            voice.sample = None
+
+    def active_count(self):
+        return sum(1 for voice in self.voices if voice.sample is not None)
+
+    def _allocate(self, slot):
+        if self.steal_policy == "retrigger" and slot is not None:
+            # Re-pressing a pad restarts its own voice instead of layering a second copy
+            for voice in self.voices:
+                if voice.sample is not None and voice.slot == slot:
+                    return voice
+        for voice in self.voices:
+            if voice.sample is None:
+                return voice
+        if self.steal_policy == "quietest":
+            return min(self.voices, key=Voice.level)
+        return min(self.voices, key=lambda voice: voice.serial)
+
+    def mix(self, out):
+        """ Sums every active voice into out (zeroed first) and advances them. """
+        out.fill(0.0)
+        frames = len(out)
+        for voice in self.voices:
+            sample = voice.sample
+            if sample is None:
+                continue
+            start = voice.position
+            data = sample.chunk(start, min(start + frames, sample.frame_count))
+            count = len(data) # Shorter than asked only while a stream is catching up
+            if count:
+                if voice.gain == 1.0:
+                    out[:count] += data
+                else:
+                    out[:count] += data * voice.gain
+            voice.position = start + count
+            if voice.position >= sample.frame_count:
+                voice.sample = None
+
+
+class MixRingBuffer:
+    """ Mixed engine frames shared by every output, each output reads it at its own cursor. """
+    def __init__(self, pool, capacity_frames):
+        self.pool = pool
+        self.capacity = capacity_frames
+        self.frames = np.zeros((capacity_frames, ENGINE_CHANNELS), dtype=np.float32)
+        self.write_frame = 0 # Absolute number of frames mixed so far
+        self.overruns = 0 # Reads that fell so far behind that the data was already overwritten
+        self.latency = LatencyMeter()
+        self.before_render = None # Called before mixing, the engine starts queued triggers there
+        # Held while mixing and while the GUI thread changes voices; mixing runs on the audio thread
+        self.lock = threading.RLock()
+
+    def render_until(self, frame):
+        """ Mixes the voices forward until frame has been written. """
+        with self.lock:
+            if self.before_render is not None and self.write_frame < frame:
+                self.before_render()
+            while self.write_frame < frame:
+                index = self.write_frame % self.capacity
+                count = min(frame - self.write_frame, self.capacity - index)
+                block = self.frames[index:index + count]
+                self.pool.mix(block)
+                np.clip(block, -1.0, 1.0, out=block)
+                self.write_frame += count
+
+    def read(self, cursor, out):
+        """ Copies len(out) frames starting at cursor into out and returns the new cursor. """
+        count = len(out)
+        with self.lock:
+            if self.write_frame - cursor > self.capacity:
+                # This reader stalled for longer than the ring holds, skip to the oldest frame still there
+                cursor = self.write_frame - self.capacity
+                self.overruns += 1
+            self.render_until(cursor + count)
+            index = cursor % self.capacity
+            first = min(count, self.capacity - index)
+            out[:first] = self.frames[index:index + first]
+            if first < count:
+                out[first:] = self.frames[:count - first]
+        return cursor + count
+
+
+class AudioOutputStream(QIODevice):
+    """ Feeds one output device's QAudioSink from the shared mix.
+
+    The engine moves its streams to the audio thread; the sink is only touched there, the
+    GUI thread asks for changes through the *_requested signals.
+    """
+    device_requested = pyqtSignal(object, float) # device, volume
+    volume_requested = pyqtSignal(float)
+
+    def __init__(self, ring, parent=None):
+        super().__init__(parent)
+        self.ring = ring
+        self.cursor = ring.write_frame # Join the mix at its current position
+        self.sink = None
+        self.device = None
+        self.underruns = 0 # Times the device ran dry because the mix wasn't read in time
+        self.sink_format = engine_audio_format()
+        self.read_buffer = np.zeros((4096, ENGINE_CHANNELS), dtype=np.float32)
+        # What the sink held after the last read and when that was, to tell the playing frame from any thread
+        self.queued_frames = 0
+        self.read_ns = time.perf_counter_ns()
+        self.device_requested.connect(self.set_device)
+        self.volume_requested.connect(self.set_volume)
+        self.open(QIODevice.OpenModeFlag.ReadOnly)
+
+    def request_device(self, device, volume):
+        """ set_device() on the stream's own thread. """
+        self.device = device
+        self.device_requested.emit(device, volume)
+
+    @pyqtSlot(float)
+    def set_volume(self, volume):
+        if self.sink is not None:
+            self.sink.setVolume(volume)
+
+    @pyqtSlot()
+    def release(self):
+        """ Stops the sink and deletes the stream; runs on the stream's thread. """
+        if self.sink is not None:
+            self.sink.stop()
+        self.deleteLater()
+
+    @pyqtSlot(object, float)
+    def set_device(self, device, volume):
+        """ (Re)opens the sink on device; the mix keeps playing from where it is. """
+        if self.sink is not None:
+            self.sink.stop()
+            self.sink.deleteLater()
+        self.device = device
+        # Mix in float, fall back to 16-bit output for devices that can't take it
+        self.sink_format = engine_audio_format()
+        if not device.isNull() and not device.isFormatSupported(self.sink_format):
+            self.sink_format = engine_audio_format(QAudioFormat.SampleFormat.Int16)
+        self.sink = QAudioSink(device, self.sink_format, self)
+        self.sink.setBufferSize(self.sink_format.bytesForDuration(SINK_BUFFER_MS * 1000))
+        self.sink.setVolume(volume)
+        self.sink.stateChanged.connect(self._state_changed)
+        self.sink.start(self)
+
+    def _state_changed(self, state):
+        if state == QAudio.State.IdleState and self.sink.error() == QAudio.Error.UnderrunError:
+            self.underruns += 1
+            TRACER.counter("underruns", count=self.underruns)
+
+    def played_frame(self):
+        """ Mix frame this device is playing now: the read cursor minus what still waits in the sink's buffer. """
+        # The sink has played on since the last read
+        elapsed = (time.perf_counter_ns() - self.read_ns) * ENGINE_SAMPLE_RATE // 1_000_000_000
+        return self.cursor - max(0, self.queued_frames - elapsed)
+
+    def isSequential(self):
+        return True
+
+    def bytesAvailable(self):
+        # An endless stream: silence is produced while no voice is playing
+        return self.sink_format.bytesForDuration(SINK_BUFFER_MS * 1000) + super().bytesAvailable()
+
+    @traced("mix")
+    def readData(self, maxlen):
+        frames = min(maxlen // self.sink_format.bytesPerFrame(), self.ring.capacity)
+        if frames <= 0:
+            return b""
+        if frames > len(self.read_buffer):
+            self.read_buffer = np.zeros((frames, ENGINE_CHANNELS), dtype=np.float32)
+        out = self.read_buffer[:frames]
+        start = self.cursor
+        self.cursor = self.ring.read(self.cursor, out)
+        queued = self.sink.bufferSize() - self.sink.bytesFree() if self.sink is not None else 0
+        queued = max(0, queued) // self.sink_format.bytesPerFrame()
+        self.queued_frames = queued + frames if self.sink is not None else 0 # This read is queued next
+        self.read_ns = time.perf_counter_ns()
+        if self.ring.latency.marks:
+            self.ring.latency.reached(start, self.cursor, queued)
+        if self.sink_format.sampleFormat() == QAudioFormat.SampleFormat.Int16:
+            return (out * 32767.0).astype(np.int16).tobytes()
+        return out.tobytes()
+
+    def writeData(self, data):
+        return -1
+
+
+class TriggerTable:
+    """ What every slot plays, precomputed by slot index so triggering a pad needs no lookups by path. """
+    def __init__(self, size):
+        self.paths = [None] * size
+        self.gains = [1.0] * size
+        self.samples = [None] * size # Decoded sample of the slot, None until decoded or after eviction
+        self.streams = [None] * size # Estimated duration in ms of slots that are streamed, else None
+
+    def set_slot(self, index, path, gain, sample=None, stream_ms=None):
+        self.paths[index] = path
+        self.gains[index] = gain
+        self.samples[index] = sample
+        self.streams[index] = stream_ms
+
+    def clear_slot(self, index):
+        self.set_slot(index, None, 1.0)
+
+    def set_sample(self, path, sample):
+        for index, slot_path in enumerate(self.paths):
+            if slot_path == path:
+                self.samples[index] = sample
+
+    def set_stream(self, path, duration_ms):
+        for index, slot_path in enumerate(self.paths):
+            if slot_path == path:
+                self.samples[index] = None
+                self.streams[index] = duration_ms
+
+
+class LatencyMeter:
+    """ Time from a key press or click to the first sample of its sound leaving for an output device. """
+    def __init__(self, history=LATENCY_HISTORY):
+        self.marks = deque() # (mix frame, press time in perf_counter_ns) not yet read by any output
+        self.latencies_ms = deque(maxlen=history)
+
+    def mark(self, frame, pressed_ns):
+        self.marks.append((frame, pressed_ns))
+
+    def reached(self, start_frame, end_frame, queued_frames):
+        """ Called by an output after reading start_frame .. end_frame with queued_frames still ahead in its sink. """
+        now = time.perf_counter_ns()
+        while self.marks and self.marks[0][0] < end_frame:
+            frame, pressed_ns = self.marks.popleft()
+            # The frame is heard after what the sink already holds and the frames before it in this read
+            delay_frames = queued_frames + max(0, frame - start_frame)
+            self.latencies_ms.append((now - pressed_ns) / 1e6 + delay_frames * 1000.0 / ENGINE_SAMPLE_RATE)
+            TRACER.counter("trigger_latency", ms=self.latencies_ms[-1])
+
+    def stats(self):
+        if not self.latencies_ms:
+            return None
+        ordered = sorted(self.latencies_ms)
+        return {
+            "count": len(ordered),
+            "last_ms": self.latencies_ms[-1],
+            "median_ms": ordered[len(ordered) // 2],
+            "p95_ms": ordered[min(len(ordered) - 1, len(ordered) * 95 // 100)],
+            "max_ms": ordered[-1],
+        }
+
+
+class AudioEngine(QObject):
+    """ Mixes decoded samples once through a fixed pool of voices and fans the mix out to every output device. """
+    playback_started = pyqtSignal(int, str) # Duration in ms and path of the newest voice
+    trigger_deferred = pyqtSignal(int, float, object) # Queued trigger that has to wait for a decode: slot, gain, press time
+
+    def __init__(self, sample_cache, voice_count=VOICE_COUNT, steal_policy=VOICE_STEAL_POLICY, parent=None):
+        super().__init__(parent)
+        self.sample_cache = sample_cache
+        self.sample_cache.sample_ready.connect(self._play_pending)
+        self.sample_cache.sample_evicted.connect(self._drop_sample)
+        self.sample_cache.sample_too_large.connect(self._stream_pending)
+        self.pool = VoicePool(voice_count, steal_policy)
+        self.ring = MixRingBuffer(self.pool, ENGINE_SAMPLE_RATE * MIX_RING_MS // 1000)
+        self.lock = self.ring.lock
+        # Outputs pull the mix on their own thread, so a busy GUI thread holds back neither sound nor queued triggers
+        self.audio_thread = QThread(self)
+        self.audio_thread.start(QThread.Priority.TimeCriticalPriority)
+        self.outputs = {} # name -> AudioOutputStream, living on audio_thread
+        self.volume = 1.0
+        self.pending = {} # path -> (slot, gain, press time), triggered before its first decode finished
+        self.slots = TriggerTable(TOTAL_SLOTS)
+        # Triggers from input threads: deque appends and pops are atomic, so no lock is needed
+        self.trigger_queue = deque()
+        self.ring.before_render = self._start_queued
+        self.trigger_deferred.connect(self._trigger_deferred)
+        self.timeline = None # (voice, serial, sample, mix frame, sample frame) anchoring the newest trigger's clock
+
+    @traced("set_output_device")
+    def set_output_device(self, name, device):
+        """ Routes the named output to device, creating its stream on first use. """
+        output = self.outputs.get(name)
+        if output is None:
+            output = AudioOutputStream(self.ring)
+            output.moveToThread(self.audio_thread)
+            self.outputs[name] = output
+        output.request_device(device, self.volume)
+
+    def remove_output(self, name):
+        output = self.outputs.pop(name, None)
+        if output is None:
+            return
+        if output.thread() is QThread.currentThread():
+            output.release()
+        else:
+            # Waits for the audio thread, so the device is free once this returns
+            QMetaObject.invokeMethod(output, "release", Qt.ConnectionType.BlockingQueuedConnection)
+
+    def set_volume(self, volume):
+        self.volume = volume
+        for output in self.outputs.values():
+            output.volume_requested.emit(volume)
+
+    def shutdown(self):
+        """ Closes every output and stops the audio thread, before the application quits. """
+        for name in list(self.outputs):
+            self.remove_output(name)
+        self.audio_thread.quit()
+        self.audio_thread.wait()
+
+    def set_steal_policy(self, steal_policy):
+        if steal_policy not in VoicePool.STEAL_POLICIES:
+            steal_policy = "oldest"
+        self.pool.steal_policy = steal_policy
+
+    def trigger(self, slot, path, gain=1.0, pressed_ns=None):
+        """ Starts path on every output; returns False if it has to wait for its decode. """
+        sample = self.sample_cache.get(path)
+        if sample is None:
+            self.pending[path] = (slot, gain, pressed_ns)
+            return False
+        self._start(sample, slot, gain, pressed_ns)
+        return True
+
+    def trigger_slot(self, slot, pressed_ns=None):
+        """ Hot path for pads and hotkeys: plays the slot's precomputed sample, falling back to trigger(). """
+        sample = self.slots.samples[slot]
+        if sample is not None:
+            sample.last_used = pressed_ns or time.perf_counter_ns()
+            self._start(sample, slot, self.slots.gains[slot], pressed_ns)
+            return True
+        path = self.slots.paths[slot]
+        if path is None:
+            return False
+        if self.slots.streams[slot] is not None:
+            return self.stream(slot, path, self.slots.gains[slot], self.slots.streams[slot], pressed_ns)
+        return self.trigger(slot, path, self.slots.gains[slot], pressed_ns)
+
+    def stream(self, slot, path, gain=1.0, duration_ms=None, pressed_ns=None):
+        """ Plays a long sound straight from disk; it starts as soon as its first chunk is decoded. """
+        self._start(StreamedSample(path, duration_ms, self.lock, self), slot, gain, pressed_ns)
+        return True
+
+    def stop_all(self):
+        with self.lock:
+            self.pool.stop_all()
+            self.timeline = None
+
+    def active_voices(self):
+        return self.pool.active_count()
+
+    def clock_frame(self):
+        """ The mix frame being heard now, taken from the output that is furthest behind. """
+        if not self.outputs:
+            return self.ring.write_frame
+        return min(output.played_frame() for output in self.outputs.values())
+
+    def timeline_position_ms(self):
+        """ Audible position of the newest sound, or None once it has finished or its voice was stolen. """
+        if self.timeline is None:
+            return None
+        voice, serial, sample, mix_frame, sample_frame = self.timeline
+        position = sample_frame + max(0, self.clock_frame() - mix_frame)
+        if voice.serial != serial or position >= sample.frame_count:
+            self.timeline = None
+            return None
+        return position * 1000 // ENGINE_SAMPLE_RATE
+
+    def seek(self, position_ms):
+        """ Moves the newest sound to position_ms.
+
+        The jump lands on the next frame mixed, and since every output reads the same mix it
+        takes effect at the same sample everywhere.
+        """
+        if self.timeline is None:
+            return
+        voice, serial, sample, _, _ = self.timeline
+        if voice.serial != serial:
+            return
+        frame = max(0, min(position_ms * ENGINE_SAMPLE_RATE // 1000, sample.frame_count))
+        with self.lock:
+            voice.sample = sample # Revives a voice that finished mixing but is still being heard
+            voice.position = frame
+            self.timeline = (voice, serial, sample, self.ring.write_frame, frame)
+
+    def push_trigger(self, slot, velocity_gain, pressed_ns):
+        """ Queues a slot from any thread; it starts when the next block is mixed. """
+        sample = self.slots.samples[slot]
+        gain = self.slots.gains[slot] * velocity_gain
+        if sample is not None:
+            self.trigger_queue.append((sample, slot, gain, pressed_ns))
+        elif self.slots.paths[slot] is not None:
+            self.trigger_deferred.emit(slot, gain, pressed_ns)
+
+    def _start_queued(self):
+        while self.trigger_queue:
+            sample, slot, gain, pressed_ns = self.trigger_queue.popleft()
+            sample.last_used = pressed_ns
+            self._start(sample, slot, gain, pressed_ns)
+
+    def _trigger_deferred(self, slot, gain, pressed_ns):
+        path = self.slots.paths[slot]
+        if path is None:
+            return
+        if self.slots.streams[slot] is not None:
+            self.stream(slot, path, gain, self.slots.streams[slot], pressed_ns)
+        else:
+            self.trigger(slot, path, gain, pressed_ns)
+
+    def _start(self, sample, slot, gain, pressed_ns=None):
+        # From the GUI thread, or from the audio thread when queued triggers are started
+        with self.lock:
+            if pressed_ns is not None:
+                self.ring.latency.mark(self.ring.write_frame, pressed_ns)
+            voice = self.pool.start(sample, slot, gain)
+            # Its first frame is mixed at the ring's write position
+            self.timeline = (voice, voice.serial, sample, self.ring.write_frame, 0)
+        self.playback_started.emit(sample.duration_ms(), sample.path)
+
+    def _play_pending(self, path):
+        sample = self.sample_cache.peek(path)
+        if sample is not None:
+            self.slots.set_sample(path, sample)
+        pending = self.pending.pop(path, None)
+        if pending is not None and sample is not None:
+            self._start(sample, *pending)
+
+    def _drop_sample(self, path):
+        self.slots.set_sample(path, None)
+
+    def _stream_pending(self, path, duration_ms):
+        self.slots.set_stream(path, duration_ms)
+        pending = self.pending.pop(path, None)
+        if pending is not None:
+            slot, gain, pressed_ns = pending
+            self.stream(slot, path, gain, duration_ms, pressed_ns)
+
+
+def device_key(device):
+    """ Identifier of an audio device that stays the same across restarts, as kept in the data file. """
+    return bytes(device.id()).decode("utf-8", "backslashreplace")
+
+
+def is_virtual_device(device):
+    description = device.description().lower()
+    return "virtual" in description or "cable" in description
+
+
+class AudioDeviceManager(QObject):
+    """ Keeps track of the system's audio outputs and reports devices that are plugged in or removed. """
+    devices_changed = pyqtSignal(list, list) # Descriptions of the added and the removed devices
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.devices = {} # key -> QAudioDevice, in the order the system lists them
+        self.default_key = None
+        self.scan()
+        # The signal is only delivered to an instance
+        self.media_devices = QMediaDevices(self)
+        self.media_devices.audioOutputsChanged.connect(self._outputs_changed)
+
+    def scan(self):
+        self.devices = {device_key(device): device for device in QMediaDevices.audioOutputs()}
+        default = QMediaDevices.defaultAudioOutput()
+        self.default_key = None if default.isNull() else device_key(default)
+
+    def outputs(self, virtual):
+        return [device for device in self.devices.values() if is_virtual_device(device) == virtual]
+
+    def choose(self, preferred_key, virtual):
+        """ The preferred device if it is connected, otherwise a fallback.
+
+        Regular outputs fall back to the system default, virtual ones to the first virtual
+        device; None means there is no virtual device to use.
+        """
+        candidates = self.outputs(virtual)
+        for key in (preferred_key, None if virtual else self.default_key):
+            for device in candidates:
+                if device_key(device) == key:
+                    return device
+        if candidates:
+            return candidates[0]
+        return None if virtual else QMediaDevices.defaultAudioOutput()
+
+    def _outputs_changed(self):
+        before = self.devices
+        self.scan()
+        added = [device.description() for key, device in self.devices.items() if key not in before]
+        removed = [device.description() for key, device in before.items() if key not in self.devices]
+        self.devices_changed.emit(added, removed) # Also sent when only the default device changed
+
+
+# --- ANALYSIS ---
+# ITU-R BS.1770 K-weighting at 48 kHz: a high-shelf pre-filter followed by the RLB high-pass
+K_WEIGHTING_BIQUADS = (
+    ((1.53512485958697, -2.69169618940638, 1.19839281085285), (1.0, -1.69065929318241, 0.73248077421585)),
+    ((1.0, -2.0, 1.0), (1.0, -1.99004745483398, 0.99007225036621)),
+)
+ANALYSIS_CHUNK_FRAMES = 1 << 20 # Long files are filtered in chunks to bound memory
+ANALYSIS_WARMUP_FRAMES = 1 << 14 # Overlap that lets the filter settle at each chunk boundary
+
+
+def _biquad_response(coefficients, n):
+    """ Complex frequency response of a biquad at the n // 2 + 1 bins of an n-point real FFT. """
+    (b0, b1, b2), (a0, a1, a2) = coefficients
+    z = np.exp(-1j * np.pi * np.arange(n // 2 + 1) / (n // 2))
+    return (b0 + b1 * z + b2 * z * z) / (a0 + a1 * z + a2 * z * z)
+
+
+def k_weight(frames, start, end):
+    """ K-weights frames[start:end] of float frames at ENGINE_SAMPLE_RATE, via FFT so no per-sample loop is needed.
+
+    frames starts at most ANALYSIS_WARMUP_FRAMES before start, the filter settles over what comes before it.
+    """
+    # Pad so the circular convolution of the FFT doesn't wrap the filter tail onto the start
+    n = 1 << int(np.ceil(np.log2(len(frames) + ANALYSIS_WARMUP_FRAMES)))
+    response = _biquad_response(K_WEIGHTING_BIQUADS[0], n) * _biquad_response(K_WEIGHTING_BIQUADS[1], n)
+    spectrum = np.fft.rfft(frames, n=n, axis=0) * response[:, None]
+    return np.fft.irfft(spectrum, n=n, axis=0)[start:end]
+
+
+def _peak_with_intersamples(frames):
+    """ Largest absolute sample value, including the 4x oversampled points between samples (BS.1770 Annex 2). """
+    peak = float(np.abs(frames).max()) if len(frames) else 0.0
+    offsets = np.arange(6, -6, -1) # Neighbours x[n + 6] .. x[n - 5], in np.convolve's kernel order
+    for phase in range(1, 4):
+        # Windowed sinc that interpolates halfway points between x[n] and x[n + 1] at phase / 4
+        distance = offsets - phase / 4.0
+        kernel = np.sinc(distance) * (0.5 + 0.5 * np.cos(np.pi * distance / 6.5))
+        kernel /= kernel.sum()
+        for channel in range(frames.shape[1]):
+            interpolated = np.convolve(frames[:, channel], kernel, mode="valid")
+            peak = max(peak, float(np.abs(interpolated).max()) if len(interpolated) else 0.0)
+    return peak
+
+
+def measure_loudness(chunk, frame_count):
+    """ Integrated loudness in LUFS and true peak in dBTP of frame_count frames, each None for silence.
+
+    Frames are read through chunk(start, end) ANALYSIS_CHUNK_FRAMES at a time, so a sound played in
+    place is converted piece by piece and memory stays bounded however long it is.
+    """
+    block = ENGINE_SAMPLE_RATE * 400 // 1000
+    step = block // 4 # 75% overlap
+    span = ANALYSIS_CHUNK_FRAMES // step * step # Whole steps per chunk, a block is then the sum of 4 steps
+    step_energy = []
+    peak = 0.0
+    for start in range(0, frame_count, span):
+        head = max(0, start - ANALYSIS_WARMUP_FRAMES) # Also covers the interpolator's 11 frames of history
+        end = min(frame_count, start + span)
+        frames = chunk(head, end)
+        peak = max(peak, _peak_with_intersamples(frames))
+        # Energy of every step summed over channels (all weighted 1.0); a trailing partial step ends no block
+        energy = np.square(k_weight(frames, start - head, end - head).astype(np.float64)).sum(axis=1)
+        whole = len(energy) // step * step
+        step_energy.append(energy[:whole].reshape(-1, step).sum(axis=1))
+    true_peak = float(20.0 * np.log10(peak)) if peak > 0 else None
+    if frame_count < block:
+        return None, true_peak
+
+    # Mean square of every 400 ms block from a running sum of the steps
+    energy = np.concatenate(([0.0], np.cumsum(np.concatenate(step_energy))))
+    block_power = (energy[4:] - energy[:-4]) / block
+    with np.errstate(divide="ignore"):
+        block_loudness = -0.691 + 10.0 * np.log10(block_power)
+
+    gated = block_power[block_loudness > -70.0] # Absolute gate
+    if not len(gated):
+        return None, true_peak
+    relative_gate = -0.691 + 10.0 * np.log10(gated.mean()) - 10.0
+    gated = block_power[(block_loudness > -70.0) & (block_loudness > relative_gate)]
+    return float(-0.691 + 10.0 * np.log10(gated.mean())), true_peak
+
+
+def integrated_loudness(frames):
+    """ EBU R128 / BS.1770 gated integrated loudness of float frames in LUFS, or None for silence. """
+    return measure_loudness(lambda start, end: frames[start:end], len(frames))[0]
+
+
+def true_peak_dbtp(frames):
+    """ True peak of float frames in dBTP, estimated by 4x oversampling with a 48-tap interpolator; None for silence. """
+    if not len(frames):
+        return None
+    peak = _peak_with_intersamples(frames)
+    return float(20.0 * np.log10(peak)) if peak > 0 else None
+
+
+def normalization_gain(analysis):
+    """ Linear gain that brings a sound to LOUDNESS_TARGET_LUFS without pushing its true peak over the ceiling. """
+    if not analysis or analysis.get("integrated_lufs") is None:
+        return 1.0
+    gain_db = min(LOUDNESS_TARGET_LUFS - analysis["integrated_lufs"], LOUDNESS_MAX_BOOST_DB)
+    if analysis.get("true_peak_dbtp") is not None:
+        gain_db = min(gain_db, TRUE_PEAK_CEILING_DBTP - analysis["true_peak_dbtp"])
+    return 10.0 ** (gain_db / 20.0)
+
+
+class LoudnessAnalyzer(QObject):
+    """ Measures loudness and true peak of cached samples on a thread pool. """
+    analyzed = pyqtSignal(str, object) # path, analysis dict
+
+    def __init__(self, pool, parent=None):
+        super().__init__(parent)
+        self.pool = pool
+        self.in_flight = set()
+
+    def analyze(self, path, open_sample, size, mtime):
+        """ Queues a measurement of the sample open_sample() returns on the worker, see Cyteboard.sample_opener(). """
+        if path in self.in_flight:
+            return
+        self.in_flight.add(path)
+        self.pool.start(lambda: self._analyze(path, open_sample, size, mtime))
+
+    def _analyze(self, path, open_sample, size, mtime):
+        # Runs on a worker thread; numpy releases the GIL for the heavy lifting
+        analysis = {"size": size, "mtime": mtime, "integrated_lufs": None, "true_peak_dbtp": None}
+        try:
+            sample = open_sample()
+            if sample is None:
+                raise OSError("it can no longer be read")
+            analysis["integrated_lufs"], analysis["true_peak_dbtp"] = measure_loudness(sample.chunk, sample.frame_count)
+        except Exception as e:
+            # Reported anyway, so the path leaves in_flight and this version of the file plays unadjusted
+            print(f"Warning: Could not measure the loudness of {path}: {e}")
+        finally:
+            self.analyzed.emit(path, analysis)
+
+
+WAVEFORM_MAGIC = b"CYPK"
+WAVEFORM_HEADER = struct.Struct("<4sIII") # Magic, frame count, frames per peak at the finest level, level count
+
+
+class PeakPyramid:
+    """ Min/max peaks of a sound at several zoom levels, each level half as detailed as the one before. """
+    def __init__(self, frame_count, base_frames, levels):
+        self.frame_count = frame_count
+        self.base_frames = base_frames
+        self.levels = levels # int8 arrays of shape (peaks, 2) holding min and max, finest first
+
+    @classmethod
+    def build(cls, frames, base_frames=WAVEFORM_BASE_FRAMES):
+        return cls.build_from(lambda start, end: frames[start:end], len(frames), base_frames)
+
+    @classmethod
+    def build_from(cls, chunk, frame_count, base_frames=WAVEFORM_BASE_FRAMES):
+        """ Builds the pyramid of frame_count frames read through chunk(start, end) a bounded piece at a time. """
+        span = max(1, ANALYSIS_CHUNK_FRAMES // base_frames) * base_frames # Whole peaks per chunk
+        parts = []
+        for start in range(0, frame_count, span):
+            frames = chunk(start, min(frame_count, start + span))
+            mono = frames.mean(axis=1) if frames.ndim > 1 else frames
+            count = -(-len(mono) // base_frames)
+            padded = np.zeros(count * base_frames, dtype=np.float32)
+            padded[:len(mono)] = mono
+            bins = padded.reshape(count, base_frames)
+            parts.append(np.stack((bins.min(axis=1), bins.max(axis=1)), axis=1))
+        level = np.concatenate(parts) if parts else np.zeros((0, 2), dtype=np.float32)
+        level = np.clip(np.round(level * 127.0), -127, 127).astype(np.int8)
+        levels = [level]
+        while len(level) > WAVEFORM_MIN_PEAKS:
+            if len(level) % 2:
+                level = np.concatenate((level, level[-1:]))
+            pairs = level.reshape(-1, 2, 2)
+            level = np.stack((pairs[:, :, 0].min(axis=1), pairs[:, :, 1].max(axis=1)), axis=1)
+            levels.append(level)
+        return cls(frame_count, base_frames, levels)
+
+    @classmethod
+    def load(cls, path):
+        """ Reads a pyramid written by save(); None if the file is missing or damaged. """
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            magic, frame_count, base_frames, level_count = WAVEFORM_HEADER.unpack_from(data)
+            if magic != WAVEFORM_MAGIC:
+                return None
+            offset = WAVEFORM_HEADER.size
+            levels = []
+            for _ in range(level_count):
+                count = struct.unpack_from("<I", data, offset)[0]
+                offset += 4
+                level = np.frombuffer(data, dtype=np.int8, count=count * 2, offset=offset).reshape(count, 2)
+                levels.append(level)
+                offset += count * 2
+        except (OSError, struct.error, ValueError):
+            return None
+        return cls(frame_count, base_frames, levels) if levels else None
+
+    def save(self, path):
+        parts = [WAVEFORM_HEADER.pack(WAVEFORM_MAGIC, self.frame_count, self.base_frames, len(self.levels))]
+        for level in self.levels:
+            parts.append(struct.pack("<I", len(level)))
+            parts.append(level.tobytes())
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(b"".join(parts))
+        os.replace(temp_path, path)
+
+    def columns(self, width):
+        """ Min and max per pixel column for a strip width pixels wide, scaled to -1.0 .. 1.0; none for an empty sound. """
+        if width <= 0 or not len(self.levels[0]):
+            return np.zeros(0), np.zeros(0)
+        # The coarsest level that still has at least one peak per column
+        level = self.levels[0]
+        for candidate in self.levels:
+            if len(candidate) < width:
+                break
+            level = candidate
+        edges = np.linspace(0, len(level), width + 1).astype(np.int64)
+        edges[1:] = np.maximum(edges[1:], edges[:-1] + 1) # Every column covers at least one peak
+        edges = np.minimum(edges, len(level))
+        starts = np.minimum(edges[:-1], len(level) - 1)
+        mins = np.minimum.reduceat(level[:, 0], starts)
+        maxs = np.maximum.reduceat(level[:, 1], starts)
+        return mins / 127.0, maxs / 127.0
+
+
+class WaveformStore(QObject):
+    """ Builds peak pyramids in the background and keeps them in memory and next to the data file. """
+    pyramid_ready = pyqtSignal(str, object) # sound path, PeakPyramid
+    _loaded = pyqtSignal(str, str, object, bool) # emitted from the workers: sound path, key, PeakPyramid or None, built
+
+    def __init__(self, pool, parent=None):
+        super().__init__(parent)
+        self.pool = pool
+        self.pyramids = {} # sound path -> (key, PeakPyramid)
+        self.in_flight = {} # key -> whether the request can build from the sound itself
+        self._loaded.connect(self._store)
+
+    def lookup(self, path):
+        entry = self.pyramids.get(path)
+        return entry[1] if entry is not None else None
+
+    def request(self, path, size, mtime, open_sample=None):
+        """ Loads the pyramid of this version of path from disk, or builds it from the sample open_sample() returns. """
+        key = f"{path}|{mtime}|{size}"
+        entry = self.pyramids.get(path)
+        if entry is not None and entry[0] == key:
+            self.pyramid_ready.emit(path, entry[1])
+            return
+        if key in self.in_flight and (self.in_flight[key] or open_sample is None):
+            return
+        self.in_flight[key] = open_sample is not None
+        self.pool.start(lambda: self._load(path, key, open_sample))
+
+    def _load(self, path, key, open_sample):
+        # Runs on a worker thread
+        peaks_path = os.path.join(WAVEFORM_DIR, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".peaks")
+        pyramid = PeakPyramid.load(peaks_path)
+        sample = open_sample() if pyramid is None and open_sample is not None else None
+        if sample is not None:
+            pyramid = PeakPyramid.build_from(sample.chunk, sample.frame_count)
+            try:
+                os.makedirs(WAVEFORM_DIR, exist_ok=True)
+                pyramid.save(peaks_path)
+            except OSError as e:
+                print(f"Warning: Could not store waveform for {path}: {e}")
+        self._loaded.emit(path, key, pyramid, open_sample is not None)
+
+    def _store(self, path, key, pyramid, built):
+        # Without a pyramid from disk, a request that can build from the sound may still be queued
+        if built or pyramid is not None or not self.in_flight.get(key):
+            self.in_flight.pop(key, None)
+        if pyramid is None:
+            return
+        self.pyramids[path] = (key, pyramid)
+        self.pyramid_ready.emit(path, pyramid)
+
+
+# --- BACKGROUND WORK ---
+MP3_BITRATES_KBPS = {
+    "mpeg1": (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    "mpeg2": (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def probe_duration_ms(path):
+    """ Reads a sound's duration from its headers without decoding it; None if it can't be determined. """
+    extension = os.path.splitext(path)[1].lower()
+    try:
+        if extension == ".wav":
+            layout = read_wav_layout(path)
+            if layout is None:
+                return None
+            _, channels, rate, bits, _, size = layout
+            return size // max(1, channels * bits // 8) * 1000 // rate
+        if extension == ".ogg":
+            return _probe_ogg_duration_ms(path)
+        if extension == ".mp3":
+            return _probe_mp3_duration_ms(path)
+    except (OSError, EOFError, struct.error, ValueError, IndexError, ZeroDivisionError):
+        return None
+    return None
+
+
+def _probe_ogg_duration_ms(path):
+    # The granule position of the last page is the total sample count
+    with open(path, "rb") as f:
+        head = f.read(4096)
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - 65536))
+        tail = f.read()
+    if not head.startswith(b"OggS"):
+        return None
+    packet = head[27 + head[26]:]
+    if packet.startswith(b"\x01vorbis"):
+        sample_rate = struct.unpack_from("<I", packet, 12)[0]
+    elif packet.startswith(b"OpusHead"):
+        sample_rate = 48000 # Opus granule positions always count 48 kHz samples
+    else:
+        return None
+    last_page = tail.rfind(b"OggS")
+    if last_page < 0:
+        return None
+    granule = struct.unpack_from("<q", tail, last_page + 6)[0]
+    return granule * 1000 // sample_rate
+
+
+def _probe_mp3_duration_ms(path):
+    with open(path, "rb") as f:
+        data = f.read(16384)
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+    offset = 0
+    if data.startswith(b"ID3"):
+        # Skip the ID3v2 tag, its size is stored as a 28-bit synchsafe integer
+        offset = 10 + ((data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9])
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read(16384)
+        size -= offset
+        offset = 0
+    # The first sync word followed by a valid Layer III header; corrupt data can fake a sync word
+    while offset + 4 <= len(data):
+        if data[offset] == 0xFF and (data[offset + 1] & 0xE0) == 0xE0:
+            b1, b2, b3 = data[offset + 1], data[offset + 2], data[offset + 3]
+            version = (b1 >> 3) & 3
+            # Not a reserved version, Layer III, and neither the bitrate nor the sample rate index is reserved
+            if version != 1 and (b1 >> 1) & 3 == 1 and b2 >> 4 != 15 and (b2 >> 2) & 3 != 3:
+                break
+        offset += 1
+    else:
+        return None
+    bitrate = MP3_BITRATES_KBPS["mpeg1" if version == 3 else "mpeg2"][b2 >> 4]
+    sample_rate = MP3_SAMPLE_RATES[version][(b2 >> 2) & 3]
+    samples_per_frame = 1152 if version == 3 else 576
+    mono = (b3 >> 6) == 3
+
+    # A Xing/Info header holds the exact frame count, needed for VBR files
+    side_info = (17 if mono else 32) if version == 3 else (9 if mono else 17)
+    xing = offset + 4 + side_info
+    if data[xing:xing + 4] in (b"Xing", b"Info"):
+        flags = struct.unpack_from(">I", data, xing + 4)[0]
+        if flags & 1:
+            frames = struct.unpack_from(">I", data, xing + 8)[0]
+            return frames * samples_per_frame * 1000 // sample_rate
+    if not bitrate:
+        return None
+    return (size - offset) * 8 // bitrate
+
+
+class MediaProbe(QObject):
+    """ Checks sound paths and probes durations on a thread pool, off the GUI thread. """
+    slot_probed = pyqtSignal(int, str, object) # slot index, path, info dict
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(PROBE_THREADS)
+
+    def probe_slot(self, index, path):
+        self.pool.start(lambda: self._probe_slot(index, path))
+
+    def _probe_slot(self, index, path):
+        # Runs on a worker thread; results reach the GUI through a queued signal
+        try:
+            stat = os.stat(path)
+        except OSError:
+            stat = None
+        info = {
+            "exists": stat is not None,
+            "size": stat.st_size if stat else None,
+            "mtime": stat.st_mtime_ns if stat else None,
+            "duration_ms": None,
+            "mappable": False,
+        }
+        try:
+            if stat is not None:
+                info["duration_ms"] = probe_duration_ms(path)
+                info["mappable"] = path.lower().endswith(".wav") and self._wav_mappable(path)
+        except Exception as e:
+            # The slot is still reported, a file that can't be read is decoded (or fails to) like any other
+            print(f"Warning: Could not probe {path}: {e}")
+        self.slot_probed.emit(index, path, info)
+
+    def _wav_mappable(self, path):
+        try:
+            return wav_layout_mappable(read_wav_layout(path))
+        except (OSError, struct.error):
+            return False
+
+
+def content_hash(path):
+    """ Hash of a file's first and last FINGERPRINT_BYTES; with the size, enough to recognize a moved sound. """
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        digest.update(f.read(FINGERPRINT_BYTES))
+        size = os.fstat(f.fileno()).st_size
+        if size > FINGERPRINT_BYTES:
+            f.seek(max(FINGERPRINT_BYTES, size - FINGERPRINT_BYTES))
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class PathWatcher(QObject):
+    """ Watches the folders of every assigned sound and reports the sounds whose folder changed. """
+    paths_changed = pyqtSignal(list) # Assigned paths that may have been removed, renamed or restored
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.paths_by_folder = {}
+        self.watch_targets = {} # folder -> the folder itself, or its nearest existing parent while it is gone
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self._directory_changed)
+        self.changed_folders = set()
+        self.settle_timer = QTimer(self)
+        self.settle_timer.setSingleShot(True)
+        self.settle_timer.setInterval(WATCH_SETTLE_MS)
+        self.settle_timer.timeout.connect(self._report)
+
+    def set_paths(self, paths):
+        folders = {}
+        for path in paths:
+            folders.setdefault(os.path.dirname(path), set()).add(path)
+        self.paths_by_folder = folders
+        self._rewatch()
+
+    def _rewatch(self):
+        # A folder that is gone can't be watched, its parent is, so the folder is noticed when it comes back
+        targets = {}
+        for folder in self.paths_by_folder:
+            target = folder
+            while target and not os.path.isdir(target):
+                parent = os.path.dirname(target)
+                target = parent if parent != target else None
+            if target:
+                targets[folder] = target
+        self.watch_targets = targets
+        watched = set(self.watcher.directories())
+        wanted = set(targets.values())
+        if watched - wanted:
+            self.watcher.removePaths(list(watched - wanted))
+        if wanted - watched:
+            self.watcher.addPaths(list(wanted - watched))
+
+    def _directory_changed(self, directory):
+        previous = self.watch_targets
+        self._rewatch() # The folder may be gone (Qt stops watching it) or back
+        for folder, target in previous.items():
+            if target == directory or self.watch_targets.get(folder) != target:
+                self.changed_folders.add(folder)
+        self.settle_timer.start()
+
+    def _report(self):
+        paths = [path for folder in self.changed_folders for path in self.paths_by_folder.get(folder, ())]
+        self.changed_folders.clear()
+        if paths:
+            self.paths_changed.emit(paths)
+
+
+class MediaStore(QObject):
+    """ Keeps copies of assigned sounds and images in MEDIA_DIR, named by the SHA-256 of their content.
+
+    Identical files share one copy, so slots using them share one decode and one cache entry, and
+    pads keep working when the originals are moved or deleted. Compressed sounds also get a PCM
+    copy once decoded, which later loads are mapped from instead of being decoded again.
+    """
+    imported = pyqtSignal(str, str) # original path, managed copy ("" if it couldn't be imported)
+    transcoded = pyqtSignal(str, str) # managed copy, its PCM copy
+
+    def __init__(self, pool, parent=None):
+        super().__init__(parent)
+        self.pool = pool
+        self.in_flight = set()
+
+    @staticmethod
+    def is_managed(path):
+        return os.path.dirname(os.path.abspath(path)) == os.path.abspath(MEDIA_DIR)
+
+    def import_file(self, path):
+        if not path or self.is_managed(path) or ("import", path) in self.in_flight:
+            return
+        self.in_flight.add(("import", path))
+        self.pool.start(lambda: self._import(path))
+
+    def transcode(self, path, frames):
+        if path.endswith(MEDIA_PCM_SUFFIX) or ("transcode", path) in self.in_flight:
+            return
+        self.in_flight.add(("transcode", path))
+        self.pool.start(lambda: self._transcode(path, frames))
+
+    def collect_garbage(self, referenced):
+        """ Deletes the copies not in referenced, on a worker thread. """
+        referenced = {os.path.abspath(path) for path in referenced}
+        self.pool.start(lambda: self._collect_garbage(referenced))
+
+    def _import(self, path):
+        # Runs on a worker thread
+        try:
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(block)
+            content_id = digest.hexdigest()
+            managed = os.path.join(MEDIA_DIR, content_id + MEDIA_PCM_SUFFIX) # Already imported and decoded
+            if not os.path.exists(managed):
+                managed = os.path.join(MEDIA_DIR, content_id + os.path.splitext(path)[1].lower())
+            if not os.path.exists(managed):
+                os.makedirs(MEDIA_DIR, exist_ok=True)
+                temp_path = f"{managed}.{threading.get_ident()}.tmp"
+                shutil.copyfile(path, temp_path)
+                os.replace(temp_path, managed)
+        except OSError as e:
+            print(f"Warning: Could not copy {path} to the media store: {e}")
+            managed = ""
+        self.imported.emit(path, managed)
+
+    def _transcode(self, path, frames):
+        # Runs on a worker thread
+        target = os.path.splitext(path)[0] + MEDIA_PCM_SUFFIX
+        try:
+            if not os.path.exists(target):
+                write_engine_wav(target, frames)
+        except OSError as e:
+            print(f"Warning: Could not store a decoded copy of {path}: {e}")
+            target = ""
+        self.transcoded.emit(path, target)
+
+    def _collect_garbage(self, referenced):
+        # Runs on a worker thread
+        try:
+            names = os.listdir(MEDIA_DIR)
+        except OSError:
+            return # Nothing was ever imported
+        cutoff = time.time() - MEDIA_GC_GRACE_S
+        for name in names:
+            path = os.path.abspath(os.path.join(MEDIA_DIR, name))
+            try:
+                if path not in referenced and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError as e:
+                print(f"Warning: Could not remove {path} from the media store: {e}")
+
+
+class Relocator(QObject):
+    """ Fingerprints assigned sounds and finds missing ones under a new name or folder, on a thread pool.
+
+    A fingerprint is the file's size and content_hash(). Only candidates of the same size are hashed.
+    """
+    fingerprinted = pyqtSignal(str, object) # path, fingerprint dict
+    found = pyqtSignal(str, str) # missing path, where the same file is now
+    not_found = pyqtSignal(str)
+
+    def __init__(self, pool, parent=None):
+        super().__init__(parent)
+        self.pool = pool
+        self.in_flight = set()
+
+    def fingerprint(self, path, size, mtime):
+        if ("fingerprint", path) in self.in_flight:
+            return
+        self.in_flight.add(("fingerprint", path))
+        self.pool.start(lambda: self._fingerprint(path, size, mtime))
+
+    def find(self, path, fingerprint, candidates):
+        """ Looks for fingerprint next to path, where renamed files end up, then among candidates. """
+        if ("find", path) in self.in_flight:
+            return
+        self.in_flight.add(("find", path))
+        candidates = list(candidates)
+        self.pool.start(lambda: self._find(path, fingerprint, candidates))
+
+    def _fingerprint(self, path, size, mtime):
+        # Runs on a worker thread
+        try:
+            fingerprint = {"size": size, "mtime": mtime, "hash": content_hash(path)}
+        except OSError:
+            fingerprint = None
+        self.fingerprinted.emit(path, fingerprint)
+
+    def _find(self, path, fingerprint, candidates):
+        # Runs on a worker thread
+        folder = os.path.dirname(path)
+        try:
+            siblings = [os.path.join(folder, name) for name in os.listdir(folder)]
+        except OSError:
+            siblings = []
+        for candidate in siblings + candidates:
+            try:
+                if candidate != path and os.path.getsize(candidate) == fingerprint["size"]:
+                    if content_hash(candidate) == fingerprint["hash"]:
+                        self.found.emit(path, candidate)
+                        return
+            except OSError:
+                continue
+        self.not_found.emit(path)
+
+
+
+def thumbnail_prefix(icon_path):
+    """ Start of the names of an image's thumbnails, they are told apart by the image's version and size. """
+    return hashlib.sha1(icon_path.encode("utf-8")).hexdigest()[:20]
+
+
+class IconCache(QObject):
+    """ Process-wide cache of scaled button icons: QPixmapCache in memory, PNG thumbnails on disk. """
+    icon_ready = pyqtSignal(str, QPixmap) # icon path, scaled pixmap (null if unreadable)
+    _loaded = pyqtSignal(str, str, QImage) # emitted from the workers: icon path, cache key, image
+
+    def __init__(self, pool, limit_mb=ICON_CACHE_MB, parent=None):
+        super().__init__(parent)
+        self.pool = pool
+        self.keys = {} # (icon path, width, height) -> cache key of its last load
+        self.in_flight = set()
+        self.set_limit(limit_mb)
+        self._loaded.connect(self._store)
+
+    def set_limit(self, limit_mb):
+        QPixmapCache.setCacheLimit(limit_mb * 1024)
+
+    def lookup(self, icon_path, size):
+        """ Returns the cached pixmap without touching the disk, or None. """
+        key = self.keys.get((icon_path, size.width(), size.height()))
+        if key is None:
+            return None
+        pixmap = QPixmapCache.find(key)
+        return pixmap if pixmap is not None and not pixmap.isNull() else None
+
+    def request(self, icon_path, size):
+        """ Loads icon_path scaled to size in the background; icon_ready fires when done. """
+        request = (icon_path, size.width(), size.height())
+        if request in self.in_flight:
+            return
+        self.in_flight.add(request)
+        self.pool.start(lambda: self._load(*request))
+
+    def collect_garbage(self, icon_paths):
+        """ Deletes the thumbnails of images no longer used, or since edited, on a worker thread. """
+        icon_paths = set(icon_paths)
+        self.pool.start(lambda: self._collect_garbage(icon_paths))
+
+    @traced("load_icon")
+    def _load(self, icon_path, width, height):
+        # Runs on a worker thread. Keyed by path, mtime and file size, so edited images are scaled again
+        key = f"||{width}x{height}"
+        image = QImage()
+        try:
+            stat = os.stat(icon_path)
+            key = f"{icon_path}|{stat.st_mtime_ns}|{stat.st_size}|{width}x{height}"
+            thumbnail_path = os.path.join(THUMBNAIL_DIR, f"{thumbnail_prefix(icon_path)}-{stat.st_mtime_ns}-{stat.st_size}-{width}x{height}.png")
+            image = QImage(thumbnail_path) if os.path.exists(thumbnail_path) else QImage()
+            if image.isNull():
+                # QImage, unlike QPixmap, may be loaded and scaled outside the GUI thread
+                image = QImage(icon_path)
+                if not image.isNull():
+                    image = image.scaled(width, height, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+                    try:
+                        os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+                        if not image.save(thumbnail_path, "PNG"):
+                            raise OSError("the file could not be written")
+                    except OSError as e:
+                        # The scaled image is still shown, it is only scaled again next time
+                        print(f"Warning: Could not save a thumbnail of {icon_path}: {e}")
+        except OSError:
+            pass # Missing or unreadable, delivered as a null image
+        finally:
+            self._loaded.emit(icon_path, key, image)
+
+    def _collect_garbage(self, icon_paths):
+        # Runs on a worker thread
+        versions = {} # thumbnail prefix -> "mtime-size" of the image now, None if it can't be read
+        for path in icon_paths:
+            try:
+                stat = os.stat(path)
+                versions[thumbnail_prefix(path)] = f"{stat.st_mtime_ns}-{stat.st_size}"
+            except OSError:
+                versions[thumbnail_prefix(path)] = None # Maybe moved, and found again later
+        try:
+            names = os.listdir(THUMBNAIL_DIR)
+        except OSError:
+            return
+        cutoff = time.time() - MEDIA_GC_GRACE_S
+        for name in names:
+            prefix, _, rest = name.partition("-")
+            version = rest.rsplit("-", 1)[0]
+            if prefix in versions and versions[prefix] in (None, version):
+                continue
+            path = os.path.join(THUMBNAIL_DIR, name)
+            try:
+                if os.path.getmtime(path) < cutoff: # Younger ones may belong to an image assigned meanwhile
+                    os.remove(path)
+            except OSError as e:
+                print(f"Warning: Could not delete {path}: {e}")
+
+    def _store(self, icon_path, key, image):
+        width, height = key.rsplit("|", 1)[1].split("x")
+        self.in_flight.discard((icon_path, int(width), int(height)))
+        pixmap = QPixmap.fromImage(image)
+        if not pixmap.isNull():
+            QPixmapCache.insert(key, pixmap)
+            self.keys[(icon_path, int(width), int(height))] = key
+        self.icon_ready.emit(icon_path, pixmap)
+
+
+PYNPUT_KEY_NAMES = {
+    "Return": "enter", "Enter": "enter", "Esc": "esc", "Del": "delete", "Ins": "insert",
+    "PgUp": "page_up", "PgDown": "page_down", "Backspace": "backspace", "Tab": "tab", "Space": "space",
+    "Home": "home", "End": "end", "Up": "up", "Down": "down", "Left": "left", "Right": "right",
+}
+PYNPUT_MODIFIERS = {"Ctrl": "<ctrl>", "Shift": "<shift>", "Alt": "<alt>", "Meta": "<cmd>"}
+
+
+def pynput_hotkey(sequence):
+    """ Converts a QKeySequence in portable text, e.g. "Ctrl+Shift+F1", to pynput's "<ctrl>+<shift>+<f1>". """
+    parts = sequence.split("+")
+    if len(parts) > 1 and parts[-1] == "":
+        parts = parts[:-2] + ["+"] # The plus key itself, as in "Ctrl++"
+    keys = [PYNPUT_MODIFIERS.get(part) for part in parts[:-1]]
+    if None in keys or not parts[-1]:
+        return None
+    key = parts[-1]
+    if len(key) == 1:
+        keys.append(key.lower())
+    else:
+        keys.append(f"<{PYNPUT_KEY_NAMES.get(key, key.lower())}>")
+    return "+".join(keys)
+
+
+class GlobalHotkeys(QObject):
+    """ System-wide hotkeys through the optional pynput package, heard even while Cyteboard isn't focused. """
+    activated = pyqtSignal(int, object) # slot index, press time in perf_counter_ns
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.listener = None
+        try:
+            from pynput import keyboard
+        except ImportError:
+            keyboard = None # Hotkeys then only work inside the window
+        self.keyboard = keyboard
+
+    def available(self):
+        return self.keyboard is not None
+
+    def bind(self, hotkeys):
+        """ Replaces all bindings with hotkeys, a dict of slot index -> QKeySequence portable text.
+
+        Returns the hotkeys that couldn't be registered globally, in the same form, for the window to bind.
+        """
+        self.stop()
+        mapping = {}
+        unbound = {}
+        for index, sequence in hotkeys.items():
+            combination = pynput_hotkey(sequence)
+            if combination is None:
+                print(f"Warning: {sequence} can't be a global hotkey, it only works while {APP_NAME} is focused.")
+                unbound[index] = sequence
+                continue
+            # The listener thread only timestamps and hands over, the queued signal does the rest
+            mapping[combination] = lambda index=index: self.activated.emit(index, time.perf_counter_ns())
+        if not mapping:
+            return unbound
+        try:
+            self.listener = self.keyboard.GlobalHotKeys(mapping)
+            self.listener.start()
+        except Exception as e: # Backend specific, e.g. no X server or missing accessibility permission
+            print(f"Warning: Could not register global hotkeys, they only work while {APP_NAME} is focused: {e}")
+            self.listener = None
+            return dict(hotkeys)
+        return unbound
+
+    def stop(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+
+def midi_velocity_gain(velocity):
+    """ Maps a MIDI velocity (1-127) to a linear gain; the curve makes soft hits drop off like on a drum pad. """
+    return (velocity / 127.0) ** MIDI_VELOCITY_CURVE
+
+
+def parse_midi_binding(binding):
+    """ Splits a stored binding such as "note:36" or "cc:20" into ("note", 36); None if malformed. """
+    kind, _, number = (binding or "").partition(":")
+    if kind not in ("note", "cc") or not number.isdigit() or int(number) > 127:
+        return None
+    return kind, int(number)
+
+
+class MidiInput(QObject):
+    """ Triggers pads from MIDI note-on and CC messages through the optional mido package.
+
+    Messages arrive on the MIDI backend's own input thread and go straight into the audio
+    engine's trigger queue, which the audio thread drains as it mixes, so a busy GUI thread
+    can't hold a hit back.
+    """
+    learned = pyqtSignal(int, str) # slot index, binding such as "note:36"
+
+    def __init__(self, engine, parent=None):
+        super().__init__(parent)
+        self.engine = engine
+        self.ports = []
+        self.learn_slot = None # Slot that takes the next note or CC instead of playing it
+        self.note_slots = [-1] * 128 # MIDI number -> slot index, -1 if unbound; rebuilt by set_bindings()
+        self.cc_slots = [-1] * 128
+        try:
+            import mido
+        except ImportError:
+            mido = None # No MIDI input without it
+        self.mido = mido
+
+    def available(self):
+        return self.mido is not None
+
+    def set_bindings(self, bindings, first_slot=0):
+        """ Rebuilds the lookup tables from a dict of slot index -> binding.
+
+        Notes from MIDI_BASE_NOTE up map to the slots of the page starting at first_slot in order,
+        explicit bindings take precedence.
+        """
+        note_slots = [-1] * 128
+        cc_slots = [-1] * 128
+        for position in range(min(MAX_SOUNDS, 128 - MIDI_BASE_NOTE)):
+            note_slots[MIDI_BASE_NOTE + position] = first_slot + position
+        for slot, binding in bindings.items():
+            parsed = parse_midi_binding(binding)
+            if parsed is not None:
+                kind, number = parsed
+                (note_slots if kind == "note" else cc_slots)[number] = slot
+        # Swapped in whole, the input thread never sees a half-built table
+        self.note_slots, self.cc_slots = note_slots, cc_slots
+
+    def open(self):
+        """ Listens on every MIDI input plus a virtual "Cyteboard" port other software can send to. """
+        if self.mido is None:
+            return
+        try:
+            names = self.mido.get_input_names()
+        except Exception as e: # Backend specific, e.g. python-rtmidi not installed
+            print(f"Warning: Could not list MIDI inputs: {e}")
+            return
+        for name in names:
+            self._open_port(name)
+        self._open_port(MIDI_VIRTUAL_PORT, virtual=True)
+
+    def _open_port(self, name, virtual=False):
+        try:
+            self.ports.append(self.mido.open_input(name, virtual=virtual, callback=self._on_message))
+        except Exception as e: # Virtual ports aren't supported by every backend, e.g. on Windows
+            print(f"Warning: Could not open MIDI input {name}: {e}")
+
+    def close(self):
+        for port in self.ports:
+            port.close()
+        self.ports = []
+
+    def _on_message(self, message):
+        # Runs on the MIDI input thread
+        self.handle_bytes(message.bytes(), time.perf_counter_ns())
+
+    def handle_bytes(self, data, pressed_ns=None):
+        """ Handles one raw MIDI message; any thread may call this. """
+        if len(data) < 3:
+            return
+        status, number, value = data[0] & 0xF0, data[1] & 0x7F, data[2] & 0x7F
+        if status == 0x90 and value > 0: # A note-on with velocity 0 is a note-off
+            kind, slot = "note", self.note_slots[number]
+        elif status == 0xB0 and value > 0: # Pads sending CCs go to 0 again on release
+            kind, slot = "cc", self.cc_slots[number]
+        else:
+            return
+        learn_slot = self.learn_slot
+        if learn_slot is not None:
+            self.learn_slot = None
+            self.learned.emit(learn_slot, f"{kind}:{number}") # Queued to the GUI thread
+            return
+        if slot >= 0:
+            self.engine.push_trigger(slot, midi_velocity_gain(value), pressed_ns or time.perf_counter_ns())
+
+
+# --- LIBRARY ---
+LibraryEntry = namedtuple("LibraryEntry", "path name size mtime duration_ms format lufs tags")
+
+
+class TrigramIndex:
+    """ Substring search over many short texts: every sequence of up to three letters maps to the texts containing it.
+
+    A query only looks at the texts listed under its rarest trigram, so a search over 100k file
+    names checks a handful of candidates instead of every name. Queries of one or two letters are
+    answered straight from their own list.
+    """
+    def __init__(self, texts):
+        self.texts = texts # Lowercase search text per entry
+        postings = {}
+        for number, text in enumerate(texts):
+            grams = {text[i:i + size] for size in (1, 2, 3) for i in range(len(text) - size + 1)}
+            for gram in grams:
+                posting = postings.get(gram)
+                if posting is None:
+                    posting = postings[gram] = array("I") # 4 bytes per entry instead of an int object
+                posting.append(number)
+        self.postings = postings
+
+    def search(self, query):
+        """ Numbers of the texts containing every word of query, in order. """
+        words = query.lower().split()
+        if not words:
+            return range(len(self.texts))
+        # The rarest gram of each word, a word of up to three letters is its own gram
+        postings = sorted((
+            min((self.postings.get(word[i:i + 3], ()) for i in range(max(1, len(word) - 2))), key=len)
+            for word in words
+        ), key=len)
+        if len(postings) == 1:
+            candidates = postings[0]
+        else:
+            matches = set(postings[0])
+            for posting in postings[1:]:
+                matches.intersection_update(posting)
+            candidates = sorted(matches)
+        long_words = [word for word in words if len(word) > 3] # Shorter ones are matched exactly by their lists
+        if not long_words:
+            return candidates
+        texts = self.texts
+        return [number for number in candidates if all(word in texts[number] for word in long_words)]
+
+
+def library_entry(path, root, stat, lufs):
+    """ Indexes one sound file; tags are the names of the folders between the library folder and the file. """
+    folder = os.path.relpath(os.path.dirname(path), root)
+    tags = [] if folder == os.curdir else folder.replace("\\", "/").split("/")
+    name, extension = os.path.splitext(os.path.basename(path))
+    return LibraryEntry(
+        path, name, stat.st_size, stat.st_mtime_ns, probe_duration_ms(path), extension[1:].upper(), lufs, tags
+    )
+
+
+def library_search_text(entry):
+    return " ".join([entry.name] + entry.tags).lower()
+
+
+class LibraryScanner(QObject):
+    """ Keeps the library index up to date on a background thread.
+
+    Files are only probed when they are new or changed since the last scan, everything else is
+    taken from the index file. Each published index comes with its trigram index already built.
+    """
+    index_ready = pyqtSignal(object, object) # list of LibraryEntry, TrigramIndex
+    progress = pyqtSignal(int) # Files looked at so far
+    scan_finished = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1) # A walk over a big library must not hold up file checks and icons
+        self.scanning = False
+        self.queued = None # Scan asked for while one was running
+        self.published = False
+        self.scan_finished.connect(self._scan_finished) # Connected first, so scanning is already False for others
+
+    def scan(self, folders, loudness):
+        """ Rescans folders; loudness maps paths to their measured integrated loudness. """
+        if self.scanning:
+            self.queued = (folders, loudness)
+            return
+        self.scanning = True
+        publish_cached = not self.published
+        self.published = True
+        folders, loudness = list(folders), dict(loudness)
+        self.pool.start(lambda: self._scan(folders, loudness, publish_cached))
+
+    def _scan(self, folders, loudness, publish_cached):
+        # Runs on a worker thread; always reports back, or scanning would stay set and later scans queue forever
+        try:
+            self._index(folders, loudness, publish_cached)
+        except Exception as e:
+            print(f"Warning: Could not scan the library: {e}")
+        finally:
+            self.scan_finished.emit()
+
+    def _index(self, folders, loudness, publish_cached):
+        cached = self._load()
+        if publish_cached and cached:
+            entries = list(cached.values())
+            self.index_ready.emit(entries, TrigramIndex([library_search_text(entry) for entry in entries]))
+        entries = []
+        seen = set()
+        for root in folders:
+            for folder, _, files in os.walk(root):
+                for file_name in files:
+                    path = os.path.join(folder, file_name)
+                    if not file_name.lower().endswith(AUDIO_EXTENSIONS) or path in seen:
+                        continue
+                    seen.add(path)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    entry = cached.get(path)
+                    try:
+                        if entry is None or entry.size != stat.st_size or entry.mtime != stat.st_mtime_ns:
+                            entry = library_entry(path, root, stat, loudness.get(path))
+                        elif loudness.get(path) is not None:
+                            entry = entry._replace(lufs=loudness[path])
+                    except Exception as e:
+                        print(f"Warning: Could not index {path}, skipping it: {e}")
+                        continue
+                    entries.append(entry)
+                    if len(entries) % LIBRARY_PROGRESS_FILES == 0:
+                        self.progress.emit(len(entries))
+        entries.sort(key=lambda entry: entry.name.lower())
+        self._save(entries)
+        self.index_ready.emit(entries, TrigramIndex([library_search_text(entry) for entry in entries]))
+
+    def _load(self):
+        try:
+            with open(LIBRARY_INDEX_FILE, "r", encoding="utf-8") as f:
+                rows = json.load(f)["entries"]
+            return {row[0]: LibraryEntry(*row) for row in rows}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Warning: Could not read {LIBRARY_INDEX_FILE}, rebuilding it: {e}")
+            return {}
+
+    def _save(self, entries):
+        temp_file = LIBRARY_INDEX_FILE + ".tmp"
+        try:
+            os.makedirs(DATA_DIR, exist_ok=True)
+            with open(temp_file, "w", encoding="utf-8") as f:
+                json.dump({"version": 1, "entries": [list(entry) for entry in entries]}, f)
+            os.replace(temp_file, LIBRARY_INDEX_FILE)
+        except OSError as e:
+            print(f"Warning: Could not save {LIBRARY_INDEX_FILE}: {e}")
+
+    def _scan_finished(self):
+        self.scanning = False
+        if self.queued is not None:
+            folders, loudness = self.queued
+            self.queued = None
+            self.scan(folders, loudness)
+
+
+class LibraryModel(QAbstractListModel):
+    """ The library entries matching the search, as rows a QListView draws on demand. """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.entries = []
+        self.trigrams = TrigramIndex([])
+        self.query = ""
+        self.rows = range(0) # Entry numbers matching the query
+        self.last_search_ms = 0.0
+
+    def set_index(self, entries, trigrams):
+        self.entries = entries
+        self.trigrams = trigrams
+        self.set_query(self.query)
+
+    def set_query(self, query):
+        started = time.perf_counter()
+        self.beginResetModel()
+        self.query = query
+        self.rows = self.trigrams.search(query)
+        self.endResetModel()
+        self.last_search_ms = (time.perf_counter() - started) * 1000.0
+
+    def entry(self, index):
+        return self.entries[self.rows[index.row()]]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        entry = self.entry(index)
+        if role == Qt.ItemDataRole.DisplayRole:
+            if entry.duration_ms is None:
+                return entry.name
+            seconds = entry.duration_ms // 1000
+            return f"{entry.name}  ({seconds // 60:02}:{seconds % 60:02})"
+        if role == Qt.ItemDataRole.ToolTipRole:
+            lines = [entry.path, entry.format]
+            if entry.lufs is not None:
+                lines.append(f"Loudness: {entry.lufs:.1f} LUFS")
+            if entry.tags:
+                lines.append("Tags: " + ", ".join(entry.tags))
+            return "\n".join(lines)
+        if role == Qt.ItemDataRole.UserRole:
+            return entry.path
+        return None
+
+    def flags(self, index):
+        return super().flags(index) | Qt.ItemFlag.ItemIsDragEnabled
+
+    def mimeTypes(self):
+        return ["text/uri-list"]
+
+    def mimeData(self, indexes):
+        # Dropped on a pad like a file from the file manager
+        mime = QMimeData()
+        mime.setUrls([QUrl.fromLocalFile(self.entry(index).path) for index in indexes])
+        return mime
+
+
+# --- PERSISTENCE ---
+PROFILE_TABLES = ("ui", "slots", "analysis") # Settings by name, sound data by slot index, loudness by path
+
+
+def replay_record(data, record):
+    """ Applies one journaled edit to profile data in the JSON layout. """
+    op = record.get("op")
+    if op == "set":
+        data["audio_files"][record["slot"]] = record["data"]
+    elif op == "remove":
+        data["audio_files"].pop(record["slot"], None)
+    elif op == "ui":
+        data["ui_state"][record["key"]] = record["value"]
+    elif op == "analysis":
+        data["analysis"][record["path"]] = record["data"]
+
+
+def read_json_profile(data_file, journal_file=None):
+    """ Reads a JSON profile (an export, or the data file of older versions) and replays its journal, if any. """
+    with open(data_file, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise TypeError("top level is not an object")
+    data.setdefault("audio_files", {})
+    data.setdefault("ui_state", {})
+    data.setdefault("analysis", {})
+    if journal_file and os.path.exists(journal_file):
+        with open(journal_file, "rb") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    break # A write torn by a crash can only be the last line
+                replay_record(data, record)
+    return data
+
+
+class DataStore:
+    """ The profile, an SQLite file read on demand and written one edit at a time on a background thread. """
+    def __init__(self, profile_file=PROFILE_FILE):
+        self.profile_file = profile_file
+        self.closed = False
+        self.writer_db = None # The worker's own connection, opened on its thread
+        # A single worker keeps writes in submission order
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cyteboard-store", initializer=self._open_writer)
+        migrate = not os.path.exists(profile_file) and os.path.exists(DATA_FILE)
+        try:
+            self.db = self._open()
+        except sqlite3.DatabaseError as e:
+            # Keep the unreadable file around instead of overwriting it
+            print(f"Warning: Could not read {profile_file} ({e}). Moved it to {profile_file}.corrupt and starting fresh.")
+            for suffix in ("-wal", "-shm"):
+                if os.path.exists(profile_file + suffix):
+                    os.remove(profile_file + suffix)
+            os.replace(profile_file, profile_file + ".corrupt")
+            self.db = self._open()
+        if migrate:
+            self.import_legacy()
+
+    def _open(self):
+        db = sqlite3.connect(self.profile_file)
+        try:
+            version = db.execute("PRAGMA user_version").fetchone()[0]
+            if version > PROFILE_VERSION:
+                print(f"Warning: {self.profile_file} was written by a newer version of {APP_NAME}, some settings may be ignored.")
+            db.execute("PRAGMA journal_mode=WAL") # Readers never wait for the writer
+            with db:
+                for table in PROFILE_TABLES:
+                    key_type = "INTEGER" if table == "slots" else "TEXT"
+                    db.execute(f"CREATE TABLE IF NOT EXISTS {table} (key {key_type} PRIMARY KEY, value TEXT NOT NULL)")
+                if version < PROFILE_VERSION:
+                    db.execute(f"PRAGMA user_version = {PROFILE_VERSION}")
+        except sqlite3.DatabaseError:
+            db.close()
+            raise
+        return db
+
+    def _open_writer(self):
+        self.writer_db = sqlite3.connect(self.profile_file)
+        self.writer_db.execute("PRAGMA synchronous=FULL") # Every edit is on disk once its commit returns
+
+    def import_legacy(self):
+        """ Moves the JSON data file (and journal) of older versions into the profile, once. """
+        try:
+            data = read_json_profile(DATA_FILE, JOURNAL_FILE)
+        except (OSError, json.JSONDecodeError, TypeError, UnicodeDecodeError) as e:
+            print(f"Warning: Could not import {DATA_FILE} ({e}), starting fresh.")
+            return
+        self.import_data(data)
+        for path in (DATA_FILE, JOURNAL_FILE):
+            if os.path.exists(path):
+                os.replace(path, path + ".imported") # Kept as a backup, and not imported again
+
+    def import_data(self, data):
+        """ Replaces the whole profile with data in the JSON layout. """
+        with self.db:
+            for table in PROFILE_TABLES:
+                self.db.execute(f"DELETE FROM {table}")
+            self.db.executemany("INSERT INTO ui (key, value) VALUES (?, ?)",
+                                ((key, json.dumps(value)) for key, value in data.get("ui_state", {}).items()))
+            self.db.executemany("INSERT INTO slots (key, value) VALUES (?, ?)",
+                                ((int(key), json.dumps(value)) for key, value in data.get("audio_files", {}).items()))
+            self.db.executemany("INSERT INTO analysis (key, value) VALUES (?, ?)",
+                                ((key, json.dumps(value)) for key, value in data.get("analysis", {}).items()))
+
+    def export_data(self):
+        """ The whole profile in the JSON layout. """
+        return {
+            "profile_version": PROFILE_VERSION,
+            "audio_files": {str(key): value for key, value in self.rows("slots").items()},
+            "ui_state": self.rows("ui"),
+            "analysis": self.rows("analysis"),
+        }
+
+    def rows(self, table, exclude=(), first=None, last=None):
+        """ Every row of a table as a dict; slots can be limited to the range [first, last). """
+        if self.closed:
+            return {}
+        query = f"SELECT key, value FROM {table}"
+        params = []
+        if first is not None:
+            query += " WHERE key >= ? AND key < ?"
+            params = [first, last]
+        return {key: json.loads(value) for key, value in self.db.execute(query, params) if key not in exclude}
+
+    def lookup(self, table, key, default=None):
+        """ One row, read now. """
+        if self.closed:
+            return default
+        row = self.db.execute(f"SELECT value FROM {table} WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def load_slots(self, first=0, last=TOTAL_SLOTS):
+        """ Sound data of the slots in [first, last), keyed by str(slot index). """
+        return {str(key): value for key, value in self.rows("slots", first=first, last=last).items()}
+
+    def append(self, record):
+        """ Writes one edit; returns immediately. """
+        if self.closed:
+            return # A background result that arrived while the window was closing, it is recomputed next time
+        op = record.get("op")
+        # Encoded now, the data may be changed again before the write runs
+        if op == "set":
+            statement = "INSERT OR REPLACE INTO slots (key, value) VALUES (?, ?)", (int(record["slot"]), json.dumps(record["data"]))
+        elif op == "remove":
+            statement = "DELETE FROM slots WHERE key = ?", (int(record["slot"]),)
+        elif op == "ui":
+            statement = "INSERT OR REPLACE INTO ui (key, value) VALUES (?, ?)", (record["key"], json.dumps(record["value"]))
+        elif op == "analysis":
+            statement = "INSERT OR REPLACE INTO analysis (key, value) VALUES (?, ?)", (record["path"], json.dumps(record["data"]))
+        else:
+            raise ValueError(f"Unknown profile record {op!r}")
+        self.writer.submit(self._write, [statement])
+
+    def save_ui(self, ui_state):
+        """ Writes several settings in one transaction; returns a future. """
+        statements = [("INSERT OR REPLACE INTO ui (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+                      for key, value in ui_state.items()]
+        return self.writer.submit(self._write, statements)
+
+    def close(self):
+        """ Waits for every pending write. """
+        self.closed = True
+        self.writer.submit(self._close_writer)
+        self.writer.shutdown(wait=True)
+        self.db.close()
+
+    def _close_writer(self):
+        if self.writer_db is not None:
+            self.writer_db.close()
+            self.writer_db = None
+
+    @traced("profile_write")
+    def _write(self, statements):
+        try:
+            with self.writer_db:
+                for sql, params in statements:
+                    self.writer_db.execute(sql, params)
+        except sqlite3.Error as e:
+            print(f"Warning: Could not write {self.profile_file}: {e}")
+
+
+class LazyRecords:
+    """ Rows of one profile table, each read the first time it is asked for and kept. """
+    def __init__(self, store, table):
+        self.store = store
+        self.table = table
+        self.cached = {} # key -> value, None for keys known to have no row
+        self.complete = False
+
+    def get(self, key, default=None):
+        if key not in self.cached and not self.complete:
+            self.cached[key] = self.store.lookup(self.table, key)
+        value = self.cached.get(key)
+        return default if value is None else value
+
+    def __setitem__(self, key, value):
+        self.cached[key] = value # The caller journals it
+
+    def items(self):
+        if not self.complete:
+            for key, value in self.store.rows(self.table).items():
+                if self.cached.get(key) is None:
+                    self.cached[key] = value
+            self.complete = True
+        return [(key, value) for key, value in self.cached.items() if value is not None]
+
+
+def frame_interval_ms():
+    """ Milliseconds per frame of the primary display, 60 Hz if it doesn't say. """
+    screen = QGuiApplication.primaryScreen()
+    refresh_rate = screen.refreshRate() if screen and screen.refreshRate() > 0 else 60.0
+    return max(1, int(1000 / refresh_rate))
+
+
+class WaveformView(QWidget):
+    """ Waveform strip above the timeline, drawn from a peak pyramid; click or drag it to scrub. """
+    seek_requested = pyqtSignal(int) # Position in ms
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setMinimumHeight(48)
+        self.pyramid = None
+        self.duration_ms = 0
+        self.position_ms = 0
+        self.color = QColor("#00ff7f")
+        self.lines = None # Column lines for the current width, rebuilt on resize or a new pyramid
+
+    def set_color(self, color):
+        self.color = QColor(color)
+        self.update()
+
+    def set_pyramid(self, pyramid, duration_ms):
+        self.pyramid = pyramid
+        self.duration_ms = duration_ms
+        self.lines = None
+        self.update()
+
+    def set_position_ms(self, position_ms):
+        old_x = self.playhead_x()
+        self.position_ms = position_ms
+        if self.pyramid is not None and self.playhead_x() != old_x:
+            self.update()
+
+    def playhead_x(self):
+        return self.width() * self.position_ms // self.duration_ms if self.duration_ms else 0
+
+    def resizeEvent(self, event):
+        self.lines = None
+        super().resizeEvent(event)
+
+    def paintEvent(self, event):
+        if self.pyramid is None:
+            return
+        if self.lines is None:
+            self.lines = waveform_lines(self.pyramid, 0, 0, self.width(), self.height())
+        painter = QPainter(self)
+        played_x = self.playhead_x()
+        played, upcoming = QColor(self.color), QColor(self.color)
+        upcoming.setAlpha(90)
+        painter.setPen(played)
+        painter.drawLines(self.lines[:played_x])
+        painter.setPen(upcoming)
+        painter.drawLines(self.lines[played_x:])
+        painter.drawLine(played_x, 0, played_x, self.height()) # Playhead
+        painter.end()
+
+    def mousePressEvent(self, event):
+        self.scrub(event.position().x())
+
+    def mouseMoveEvent(self, event):
+        if event.buttons() & Qt.MouseButton.LeftButton:
+            self.scrub(event.position().x())
+
+    def scrub(self, x):
+        if self.pyramid is None or not self.duration_ms:
+            return
+        position = int(min(max(x / max(self.width(), 1), 0.0), 1.0) * self.duration_ms)
+        self.set_position_ms(position)
+        self.seek_requested.emit(position)
+
+
+def waveform_lines(pyramid, left, top, width, height):
+    """ One vertical QLineF per pixel column of the pyramid's peaks, centred in the given rectangle. """
+    mins, maxs = pyramid.columns(width)
+    middle = top + height / 2.0
+    half = height / 2.0
+    return [
+        QLineF(left + x + 0.5, middle - high * half, left + x + 0.5, middle - low * half)
+        for x, (low, high) in enumerate(zip(mins.tolist(), maxs.tolist()))
+    ]
+
+
+def empty_label(index):
+    return f"Empty {index % MAX_SOUNDS + 1}" # Numbered by position, every page starts at 1
+
+
+class SoundButton(QPushButton):
+    """ A custom button that can play a sound, with drag/drop and context menu. """
+    def __init__(self, label, index, parent):
+        super().__init__(label)
+        self.index = index
+        self.parent = parent
+        self.setAcceptDrops(True)
+        self.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.customContextMenuRequested.connect(self.show_context_menu)
+        self.clicked.connect(self.handle_click)
+        self.setProperty("broken", False)
+        self.icon_path = ""
+        self.shown_icon_path = "" # Icon currently displayed, prepared in the background
+        self.pressed_ns = None
+        self.pyramid = None # Peaks of the assigned sound, for the mini-waveform
+        self.waveform = None # Its lines at the current button size
+        self.update_icon() # Initialize with a potential icon
+
+        # Ensure text is visible even with an icon
+        self.setText(label)
+        self.setIconSize(QSize(32, 32)) # Smaller default icon size
+
+    @traced("update_style")
+    def update_style(self):
+        """ Forces a re-evaluation of the stylesheet for this widget, e.g. after its "broken" property changed. """
+        self.style().unpolish(self)
+        self.style().polish(self)
+
+    def update_icon(self):
+        """ Sets or clears the button's icon based on self.icon_path; images are loaded in the background. """
+        if not self.icon_path:
+            self.shown_icon_path = ""
+            self.setIcon(QIcon()) # Clear the icon
+        elif self.icon_path != self.shown_icon_path:
+            pixmap = self.parent.icon_cache.lookup(self.icon_path, self.iconSize())
+            if pixmap is not None:
+                self.set_prepared_icon(self.icon_path, pixmap)
+            else:
+                self.parent.icon_cache.request(self.icon_path, self.iconSize())
+
+    def set_prepared_icon(self, icon_path, pixmap):
+        """ Shows an icon scaled by the icon cache, unless the image was changed meanwhile. """
+        if icon_path != self.icon_path:
+            return
+        self.shown_icon_path = icon_path
+        if pixmap.isNull():
+            self.setIcon(QIcon()) # Unreadable or missing image
+        else:
+            self.setIcon(QIcon(pixmap))
+
+    def show_slot(self, index):
+        """ Shows another slot's sound on this button; the buttons on screen are reused for every page. """
+        self.index = index
+        data = self.parent.audio_files.get(str(index))
+        path = data["path"] if data else None
+        info = self.parent.media_info.get(path) if data else None
+        self.setText(data["nickname"] if data else empty_label(index))
+        self.setToolTip(self.parent.slot_tooltip(data, info) if data else "")
+        self.icon_path = data.get("icon", "") if data else ""
+        broken = info is not None and not info["exists"]
+        if self.property("broken") != broken:
+            self.setProperty("broken", broken)
+            self.update_style()
+        self.update_icon()
+        self.set_waveform(self.parent.waveform_store.lookup(path) if data else None)
+        if data and info is None:
+            # Missing files are flagged as broken once the background check reports back
+            self.parent.media_probe.probe_slot(index, path)
+
+    def set_waveform(self, pyramid):
+        self.pyramid = pyramid
+        self.waveform = None
+        self.update()
+
+    def resizeEvent(self, event):
+        self.waveform = None
+        super().resizeEvent(event)
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.pyramid is None or not self.parent.show_pad_waveforms:
+            return
+        if self.waveform is None:
+            # A faint strip along the bottom edge, inside the border
+            self.waveform = waveform_lines(self.pyramid, 6, self.height() - 18, self.width() - 12, 12)
+        color = self.palette().color(QPalette.ColorRole.ButtonText)
+        color.setAlpha(70)
+        painter = QPainter(self)
+        painter.setPen(color)
+        painter.drawLines(self.waveform)
+        painter.end()
+
+    def handle_click(self):
+        """ Plays the sound, opens a file dialog, or prompts to relocate a missing file. """
+        with TRACER.span("handle_click", slot=self.index):
+            is_broken = self.property("broken")
+
+            if self.text().startswith("Empty") or is_broken:
+                self.load_new_sound()
+            else:
+                # Missing files are flagged by the background checks, so nothing here touches the disk
+                self.parent.trigger_pad(self.index, self.pressed_ns)
+
+    def mousePressEvent(self, event):
+        self.pressed_ns = time.perf_counter_ns() # Latency is measured from the press, not the release
+        super().mousePressEvent(event)
+
+    def load_new_sound(self):
+        """ Opens a file dialog to select a new audio file. """
+        file_path, _ = QFileDialog.getOpenFileName(self, "Select Audio File", "", "Audio Files (*.mp3 *.wav *.ogg)")
+        if file_path:
+            self.assign_file(file_path)
+
+    def assign_file(self, file_path, icon_path=""):
+        """ Assigns a new audio file to this button and updates its state. """
+        filename = os.path.basename(file_path)
+        nickname = os.path.splitext(filename)[0]
+        self.setText(nickname)
+        self.icon_path = icon_path # Store icon path
+        data = {
+            "path": file_path,
+            "nickname": nickname,
+            "icon": icon_path # Save icon path in data
+        }
+        previous = self.parent.audio_files.get(str(self.index), {})
+        for binding in ("hotkey", "midi"):
+            if previous.get(binding):
+                data[binding] = previous[binding] # The pad keeps its key and MIDI trigger when its sound is replaced
+        self.parent.set_slot(self.index, data)
+        self.setProperty("broken", False)
+        self.setToolTip(f"Path: {file_path}")
+        self.update_style()
+        self.update_icon()
+        self.set_waveform(None) # Replaced once the new sound's peaks are ready
+        # Decoded ahead of the first click once the check has told whether it is short enough to keep in memory
+        self.parent.media_probe.probe_slot(self.index, file_path)
+
+    def show_context_menu(self, pos):
+        """ Shows a right-click context menu for the button. """
+        if self.text().startswith("Empty") and not self.property("broken"):
+            return # No menu for truly empty slots
+
+        menu = QMenu(self)
+        
+        load_sound_action = QAction("Load Sound", self)
+        load_sound_action.triggered.connect(self.load_new_sound)
+        menu.addAction(load_sound_action)
+
+        if not self.text().startswith("Empty") and not self.property("broken"):
+            change_nickname_action = QAction("Change Nickname", self)
+            change_nickname_action.triggered.connect(self.change_nickname)
+            menu.addAction(change_nickname_action)
+            
+            set_hotkey_action = QAction("Set Hotkey", self)
+            set_hotkey_action.triggered.connect(self.set_hotkey)
+            menu.addAction(set_hotkey_action)
+
+            if self.parent.midi_input is not None and self.parent.midi_input.available():
+                learn_midi_action = QAction("Learn MIDI Trigger", self)
+                learn_midi_action.triggered.connect(lambda: self.parent.learn_midi(self.index))
+                menu.addAction(learn_midi_action)
+                if self.parent.audio_files.get(str(self.index), {}).get("midi"):
+                    clear_midi_action = QAction("Clear MIDI Trigger", self)
+                    clear_midi_action.triggered.connect(lambda: self.parent.set_midi_binding(self.index, ""))
+                    menu.addAction(clear_midi_action)
+
+            set_image_action = QAction("Set Image", self)
+            set_image_action.triggered.connect(self.set_image)
+            menu.addAction(set_image_action)
+
+            if self.icon_path:
+                clear_image_action = QAction("Clear Image", self)
+                clear_image_action.triggered.connect(self.clear_image)
+                menu.addAction(clear_image_action)
+
+        if not self.text().startswith("Empty") or self.property("broken"):
+            menu.addSeparator()
+            remove_action = QAction("Remove Sound", self)
+            remove_action.triggered.connect(self.remove_file)
+            menu.addAction(remove_action)
+            
+        menu.exec(self.mapToGlobal(pos))
+
+    def remove_file(self):
+        """ Removes the sound and image from the button and data. """
+        self.setText(empty_label(self.index))
+        self.icon_path = "" # Clear icon path
+        self.parent.remove_slot(self.index)
+        self.setProperty("broken", False)
+        self.setToolTip("")
+        self.update_style()
+        self.update_icon()
+        self.set_waveform(None)
+
+    def change_nickname(self):
+        """ Opens a dialog to change the button's display text (nickname). """
+        current_nickname = self.parent.audio_files.get(str(self.index), {}).get("nickname", "")
+        text, ok = QInputDialog.getText(self, "Set Nickname", "Enter nickname:", text=current_nickname)
+        if ok and text:
+            self.setText(text)
+            self.parent.update_slot(self.index, nickname=text)
+
+    def set_hotkey(self):
+        """ Opens a dialog to bind a key combination to this pad; an empty one removes the binding. """
+        data = self.parent.audio_files.get(str(self.index), {})
+        dialog = HotkeyDialog(data.get("hotkey", ""), self)
+        if dialog.exec():
+            self.parent.set_hotkey(self.index, dialog.sequence())
+
+    def set_image(self):
+        """ Opens a file dialog to select an image for the button. """
+        image_path, _ = QFileDialog.getOpenFileName(self, "Select Image", "", "Image Files (*.png *.jpg *.jpeg *.gif *.bmp)")
+        if image_path:
+            self.icon_path = image_path
+            self.parent.update_slot(self.index, icon=image_path)
+            self.update_icon()
+
+    def clear_image(self):
+        """ Clears the image associated with the button. """
+        self.icon_path = ""
+        self.parent.update_slot(self.index, icon="")
+        self.update_icon()
+
+    def dragEnterEvent(self, event: QDragEnterEvent):
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+
+    def dropEvent(self, event: QDropEvent):
+        for url in event.mimeData().urls():
+            file_path = url.toLocalFile()
+            if file_path.lower().endswith(AUDIO_EXTENSIONS):
+                self.assign_file(file_path)
+                break
+            elif file_path.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp')):
+                self.icon_path = file_path
+                self.parent.update_slot(self.index, icon=file_path)
+                self.update_icon()
+                break
+
+class HotkeyDialog(QDialog):
+    """ Records a key combination for a pad. """
+    def __init__(self, sequence="", parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Set Hotkey")
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel("Press the key combination for this pad:"))
+        self.key_edit = QKeySequenceEdit(QKeySequence(sequence, QKeySequence.SequenceFormat.PortableText))
+        if hasattr(self.key_edit, "setMaximumSequenceLength"): # Qt 6.5+
+            self.key_edit.setMaximumSequenceLength(1)
+        layout.addWidget(self.key_edit)
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    def sequence(self):
+        # Only the first chord counts, pads fire on a single combination
+        sequence = self.key_edit.keySequence()
+        if sequence.isEmpty():
+            return ""
+        return QKeySequence(sequence[0]).toString(QKeySequence.SequenceFormat.PortableText)
+
+
+class LibraryPanel(QWidget):
+    """ Searchable list of the sounds in the library folders; drag one onto a pad to assign it. """
+    def __init__(self, parent_app):
+        super().__init__()
+        self.parent_app = parent_app
+        layout = QVBoxLayout(self)
+
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("Search sounds and folders")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.textChanged.connect(self.search)
+        layout.addWidget(self.search_edit)
+
+        self.model = LibraryModel(self)
+        self.list_view = QListView()
+        self.list_view.setModel(self.model)
+        self.list_view.setUniformItemSizes(True) # Rows are laid out without measuring each one
+        self.list_view.setDragEnabled(True)
+        self.list_view.setDragDropMode(QListView.DragDropMode.DragOnly)
+        layout.addWidget(self.list_view)
+
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+
+        button_layout = QHBoxLayout()
+        for text, slot in (
+            ("Add Folder", parent_app.add_library_folder),
+            ("Remove Folder", parent_app.remove_library_folder),
+            ("Rescan", parent_app.scan_library),
+        ):
+            button = QPushButton(text)
+            button.clicked.connect(slot)
+            button_layout.addWidget(button)
+        layout.addLayout(button_layout)
+        self.update_status()
+
+    def search(self, text):
+        self.model.set_query(text)
+        self.update_status()
+
+    def set_index(self, entries, trigrams):
+        self.model.set_index(entries, trigrams)
+        self.update_status()
+
+    def show_progress(self, count):
+        self.status_label.setText(f"Scanning... {count:,} files")
+
+    def update_status(self):
+        total = len(self.model.entries)
+        if not self.parent_app.library_folders:
+            text = "Add a folder to browse its sounds"
+        elif self.model.query:
+            text = f"{len(self.model.rows):,} of {total:,} sounds ({self.model.last_search_ms:.1f} ms)"
+        else:
+            text = f"{total:,} sounds"
+        if self.parent_app.library_scanner.scanning:
+            text += ", scanning..."
+        self.status_label.setText(text)
+
+
+class ThemeFactory(QWidget):
+    """ A widget for creating and customizing themes. """
+    def __init__(self, parent_app):
+        super().__init__()
+        self.parent_app = parent_app
+        self.current_custom_theme = parent_app.custom_theme.copy() if parent_app.custom_theme else self._get_default_custom_theme()
+
+        # Colour edits are coalesced into at most one preview restyle per display frame
+        self.dirty_keys = set()
+        self.preview_timer = QTimer(self)
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.setInterval(frame_interval_ms())
+        self.preview_timer.timeout.connect(self.flush_preview)
+        # Previews only restyle the affected widget types, everything else follows once the edits pause
+        self.settle_timer = QTimer(self)
+        self.settle_timer.setSingleShot(True)
+        self.settle_timer.setInterval(THEME_PREVIEW_SETTLE_MS)
+        self.settle_timer.timeout.connect(self.apply_custom_theme)
+
+        self.init_ui()
+        self.update_color_buttons()
+
+    def _get_default_custom_theme(self):
+        # A default set of colors for the custom theme
+        return {
+            "bg_color": "#202020",
+            "text_color": "#00ff7f",
+            "button_bg_gradient_stop0": "#303030",
+            "button_bg_gradient_stop1": "#202020",
+            "button_border": "#00ff7f",
+            "button_hover_bg": "#00ff7f",
+            "button_hover_text": "#202020",
+            "button_pressed_bg": "#00aa55",
+            "broken_button_border": "#ff4747",
+            "broken_button_text": "#ff4747",
+            "broken_button_bg": "#4d1a1a",
+            "broken_button_hover_bg": "#ff4747",
+            "broken_button_hover_border": "#ff8a8a",
+            "slider_groove_bg": "#303030",
+            "slider_handle_bg": "#00ff7f",
+            "slider_handle_border": "#202020",
+            "combo_bg": "#303030",
+            "combo_border": "#00ff7f",
+            "menu_bg": "#303030",
+            "menu_border": "#00ff7f",
+            "separator_border": "#00ff7f",
+            "input_bg": "#303030",
+            "input_border": "#00ff7f",
+        }
+
+    def init_ui(self):
+        layout = QGridLayout(self)
+        layout.setSpacing(10)
+        layout.setContentsMargins(20, 20, 20, 20)
+
+        color_options = [
+            ("Background Color", "bg_color"),
+            ("Text Color", "text_color"),
+            ("Button Gradient Start", "button_bg_gradient_stop0"),
+            ("Button Gradient End", "button_bg_gradient_stop1"),
+            ("Button Border", "button_border"),
+            ("Button Hover BG", "button_hover_bg"),
+            ("Button Hover Text", "button_hover_text"),
+            ("Button Pressed BG", "button_pressed_bg"),
+            ("Broken Button Border", "broken_button_border"),
+            ("Broken Button Text", "broken_button_text"),
+            ("Broken Button BG", "broken_button_bg"),
+            ("Broken Button Hover BG", "broken_button_hover_bg"),
+            ("Broken Button Hover Border", "broken_button_hover_border"),
+            ("Slider Groove BG", "slider_groove_bg"),
+            ("Slider Handle BG", "slider_handle_bg"),
+            ("Slider Handle Border", "slider_handle_border"),
+            ("Combo Box BG", "combo_bg"),
+            ("Combo Box Border", "combo_border"),
+            ("Menu BG", "menu_bg"),
+            ("Menu Border", "menu_border"),
+            ("Separator Border", "separator_border"),
+            ("Input BG", "input_bg"),
+            ("Input Border", "input_border"),
+        ]
+
+        self.color_buttons = {}
+        for i, (label_text, key) in enumerate(color_options):
+            # Corrected logic for row and column
+            row = i // 2
+            col = (i % 2) * 2 # For label
+            
+            label = QLabel(label_text)
+            label.setAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+            layout.addWidget(label, row, col)
+
+            color_button = QPushButton("")
+            color_button.setFixedSize(QSize(30, 25))
+            color_button.clicked.connect(lambda checked, k=key: self.pick_color(k))
+            layout.addWidget(color_button, row, col + 1) # For button
+            self.color_buttons[key] = color_button
+        
+        # Adjust row calculation for the buttons below
+        num_color_options_rows = (len(color_options) + 1) // 2 
+        
+        apply_button = QPushButton("Apply Custom Theme")
+        apply_button.clicked.connect(self.apply_custom_theme)
+        layout.addWidget(apply_button, num_color_options_rows, 0, 1, 2) # Span across two columns
+
+        save_button = QPushButton("Save Custom Theme")
+        save_button.clicked.connect(self.save_custom_theme)
+        layout.addWidget(save_button, num_color_options_rows + 1, 0, 1, 2)
+
+        reset_button = QPushButton("Reset to Default Custom")
+        reset_button.clicked.connect(self.reset_custom_theme)
+        layout.addWidget(reset_button, num_color_options_rows + 2, 0, 1, 2)
+
+    def pick_color(self, key):
+        initial_color = QColor(self.current_custom_theme.get(key, "#000000"))
+        color = QColorDialog.getColor(initial_color, self, f"Select {key.replace('_', ' ').title()} Color")
+        if color.isValid():
+            self.set_color(key, color.name())
+
+    def set_color(self, key, color_hex):
+        """ Changes one colour and schedules a preview; safe to call on every step of a drag. """
+        self.current_custom_theme[key] = color_hex
+        self.dirty_keys.add(key)
+        if not self.preview_timer.isActive():
+            self.preview_timer.start()
+
+    def flush_preview(self):
+        """ Applies all colour edits since the last frame in one go. """
+        keys = self.dirty_keys
+        self.dirty_keys = set()
+        for key in keys:
+            self.update_color_button(key)
+        # Skip the restyle when the edits ended up back on the colours already shown
+        applied = self.parent_app.custom_theme if self.parent_app.current_theme_name == "Custom" else None
+        if applied and all(applied.get(key) == self.current_custom_theme.get(key) for key in keys):
+            return
+        self.parent_app.preview_custom_theme(self.current_custom_theme.copy(), keys)
+        self.settle_timer.start()
+
+    def update_color_buttons(self):
+        for key in self.color_buttons:
+            self.update_color_button(key)
+
+    def update_color_button(self, key):
+        color_hex = self.current_custom_theme.get(key, "#000000")
+        button = self.color_buttons[key]
+        button.setStyleSheet(f"background-color: {color_hex}; border: 1px solid #555; border-radius: 5px;")
+        button.setToolTip(color_hex)
+
+    def apply_custom_theme(self):
+        self.settle_timer.stop()
+        self.parent_app.custom_theme = self.current_custom_theme.copy()
+        self.parent_app.apply_theme("Custom")
+
+    def save_custom_theme(self):
+        self.parent_app.custom_theme = self.current_custom_theme.copy()
+        self.parent_app.journal({"op": "ui", "key": "custom_theme", "value": self.parent_app.custom_theme})
+        QMessageBox.information(self, "Theme Saved", "Custom theme settings saved!")
+
+    def reset_custom_theme(self):
+        self.preview_timer.stop()
+        self.settle_timer.stop()
+        self.dirty_keys.clear()
+        self.current_custom_theme = self._get_default_custom_theme()
+        self.update_color_buttons()
+        self.apply_custom_theme()
+        QMessageBox.information(self, "Theme Reset", "Custom theme reset to default settings.")
+
+
+class StartupProfile:
+    """ Times the phases of startup; printed when run with --profile-startup. """
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.phases = [("imports", (time.perf_counter() - STARTUP_STARTED) * 1000.0)]
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, (time.perf_counter() - started) * 1000.0))
+
+    def report(self):
+        if not self.enabled:
+            return
+        print("Startup profile:")
+        for name, elapsed_ms in self.phases:
+            print(f"  {name:<24}{elapsed_ms:9.1f} ms")
+        print(f"  {'total (wall clock)':<24}{(time.perf_counter() - STARTUP_STARTED) * 1000.0:9.1f} ms")
+
+
+class PerformanceHud(QLabel):
+    """ Overlay in the window's corner with trigger latency, underruns, voices and sample cache use. """
+    def __init__(self, window):
+        super().__init__(window)
+        self.window = window
+        self.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        self.setStyleSheet(
+            "background-color: rgba(0, 0, 0, 190); color: #d0ffd0; border-radius: 4px;"
+            "padding: 6px; font-family: monospace; font-size: 11px;"
+        )
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(HUD_REFRESH_MS)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.hide()
+
+    def set_active(self, active):
+        if active:
+            self.refresh()
+            self.show()
+            self.raise_()
+            self.refresh_timer.start()
+        else:
+            self.refresh_timer.stop()
+            self.hide()
+
+    def refresh(self):
+        engine = self.window.audio_engine
+        if engine is None:
+            self.setText("Audio not started")
+        else:
+            latency = engine.ring.latency.stats()
+            if latency is None:
+                latency_line = "Latency   -"
+            else:
+                latency_line = (
+                    f"Latency   {latency['last_ms']:5.1f} ms  "
+                    f"p50 {latency['median_ms']:.1f}  p95 {latency['p95_ms']:.1f}"
+                )
+            underruns = sum(output.underruns for output in engine.outputs.values())
+            cache = self.window.sample_cache.stats()
+            self.setText("\n".join([
+                latency_line,
+                f"Voices    {engine.active_voices()} / {VOICE_COUNT}",
+                f"Underruns {underruns} device, {engine.ring.overruns} mix",
+                f"Cache     {cache['bytes'] / 2**20:.0f} / {cache['budget_bytes'] / 2**20:.0f} MB, "
+                f"{cache['samples']} sounds, {cache['hit_rate']:.0%} hits",
+            ]))
+        self.adjustSize()
+        self.place()
+
+    def place(self):
+        margin = 8
+        self.move(self.window.width() - self.width() - margin, margin)
+
+
+class Cyteboard(QMainWindow):
+    """ The main application window with dynamic button grid. """
+    theme_applied = pyqtSignal(str, float) # Theme name and how long switching to it took, in ms
+
+    def __init__(self, profile_startup=False, profile_latency=False):
+        super().__init__()
+        self.startup_profile = StartupProfile(profile_startup)
+        self.profile_latency = profile_latency
+        self.setWindowTitle(APP_NAME)
+        self.setGeometry(100, 100, 800, 600)
+
+        # Ensure the data directory exists
+        os.makedirs(DATA_DIR, exist_ok=True)
+
+        self.audio_files = {} # str(slot index) -> sound data, only for assigned slots
+        self.slots_complete = False # Until audio starts, only the slots of the page on screen are read
+        self.buttons = [] # Buttons of the page on screen, other pages exist only as data
+        self.num_rows = DEFAULT_ROWS
+        self.current_page = 0
+        self.current_theme_name = "Cyber Green" # Default theme
+        self.custom_theme = None # To store the user's custom theme
+        self.custom_theme_loaded = False # Read from the profile only once a custom theme is used
+        self.is_streaming_active = False # New state for the stream button
+        self.applied_stylesheet = None
+        self.preview_styled = [] # Widgets given their own stylesheet by a Theme Factory preview
+        self.last_theme_switch_ms = 0.0
+
+        # Decoded sounds are mixed from memory into one audio sink per output device.
+        # Both are created by ensure_audio() once the window is showing, or on the first click
+        self.sample_cache_mb = SAMPLE_CACHE_BUDGET_MB
+        self.voice_steal_policy = VOICE_STEAL_POLICY
+        self.sample_cache = None
+        self.audio_engine = None
+        # Devices are remembered by ID, so a dropdown's order doesn't matter and unplugged ones come back
+        self.device_manager = None
+        self.output_devices = []
+        self.virtual_devices = []
+        self.preferred_output_id = ""
+        self.preferred_virtual_id = ""
+
+        # File checks, duration probes and icon scaling run on background threads
+        self.media_info = {} # path -> {"exists", "size", "mtime", "duration_ms"} from the last probe
+        self.media_probe = MediaProbe(self)
+        self.media_probe.slot_probed.connect(self.apply_probe_result)
+        self.icon_cache_mb = ICON_CACHE_MB
+        self.icon_cache = IconCache(self.media_probe.pool, self.icon_cache_mb, self)
+        self.icon_cache.icon_ready.connect(self.apply_prepared_icon)
+
+        # Loudness is measured once per file version and kept in the profile, read per file when needed
+        self.loudness = {} # path -> {"size", "mtime", "integrated_lufs", "true_peak_dbtp"}, replaced by load_data()
+        self.normalize_loudness = True
+        self.loudness_analyzer = LoudnessAnalyzer(self.media_probe.pool, self)
+        self.loudness_analyzer.analyzed.connect(self.store_analysis)
+
+        # Waveforms are drawn from peak pyramids, never from the audio itself
+        self.show_pad_waveforms = True
+        self.waveform_store = WaveformStore(self.media_probe.pool, self)
+        self.waveform_store.pyramid_ready.connect(self.apply_waveform)
+        self.timeline_path = None # Sound shown on the timeline
+
+        # Pad hotkeys: system-wide through pynput when available, otherwise while the window is active
+        self.use_global_hotkeys = True
+        self.global_hotkeys = None # Created by bind_hotkeys() after startup, importing pynput takes a moment
+        self.hotkey_shortcuts = [] # In-window QShortcuts, used when global hotkeys are not
+
+        # MIDI pads trigger through the optional mido package, set up after startup
+        self.use_midi = True
+        self.midi_input = None
+        self.midi_learn_box = None
+
+        # Sound library: indexed in the background, its dock is built the first time it is shown
+        self.library_folders = []
+        self.show_library = False
+        self.library_dock = None
+        self.library_panel = None
+        self.library_scanner = LibraryScanner(self)
+        self.library_shortcut = QShortcut(QKeySequence("Ctrl+L"), self)
+        self.library_shortcut.activated.connect(self.toggle_library)
+        self.library_entries = [] # Last published library index, searched for moved files
+        self.library_scanner.index_ready.connect(self.library_indexed)
+
+        # The folders of assigned sounds are watched, so missing (and restored) files show right away.
+        # A moved file is found again by its fingerprint next to where it was, or in the library folders
+        self.path_watcher = PathWatcher(self)
+        self.path_watcher.paths_changed.connect(self.recheck_paths)
+        self.relocator = Relocator(self.media_probe.pool, self)
+        self.relocator.fingerprinted.connect(self.store_fingerprint)
+        self.relocator.found.connect(self.relocate_path)
+        self.relocator.not_found.connect(self.relocation_failed)
+        self.relocation_pending = set() # Missing paths searched again once the library scan is finished
+        self.relocation_rescanned = set() # Missing paths a library scan was already started for
+        self.library_scanner.scan_finished.connect(self.retry_relocations)
+
+        # Optional media store: assigned files are copied in by content hash and slots point at the copies
+        self.managed_media = False
+        self.media_store = MediaStore(self.media_probe.pool, self)
+        self.media_store.imported.connect(self.apply_imported_media)
+        self.media_store.transcoded.connect(self.apply_transcoded_media)
+
+        # Performance overlay, toggled with F12
+        self.show_hud = False
+        self.hud = PerformanceHud(self)
+        self.hud_shortcut = QShortcut(QKeySequence("F12"), self)
+        self.hud_shortcut.activated.connect(self.toggle_hud)
+
+        # Initialize timeline slider and labels
+        self.position_slider = QSlider(Qt.Orientation.Horizontal)
+        self.waveform_view = WaveformView()
+        self.waveform_view.seek_requested.connect(self.seek_to)
+        self.current_time_label = QLabel("00:00")
+        self.total_time_label = QLabel("00:00")
+        # One timer at the display's refresh rate follows the engine clock while a sound plays
+        self.position_timer = QTimer(self)
+        self.position_timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.position_timer.setInterval(frame_interval_ms())
+        self.position_timer.timeout.connect(self.update_position)
+        self.shown_second = None # What the timeline currently displays, to skip unchanged updates
+        self.shown_slider_value = None
+
+        # Use sliderReleased to prevent constant updates while dragging
+        self.position_slider.sliderReleased.connect(self.set_position_from_slider)
+
+
+        # Edits are written to the profile as they happen
+        self.data_store = DataStore()
+
+        # Only what is needed to draw the soundboard happens before the window shows
+        with self.startup_profile.phase("load data"):
+            self.load_data()
+        self.icon_cache.set_limit(self.icon_cache_mb)
+        with self.startup_profile.phase("build window"):
+            self.init_ui()
+        with self.startup_profile.phase("apply theme"):
+            self.apply_theme(self.current_theme_name) # Apply initial theme
+        with self.startup_profile.phase("build grid"):
+            self.rebuild_button_grid()
+
+        self.hud.set_active(self.show_hud)
+
+        # Audio and the Theme Factory follow as soon as the event loop is idle
+        self.startup_complete = False
+        QTimer.singleShot(0, self.finish_startup)
+
+    def finish_startup(self):
+        self.ensure_audio()
+        QTimer.singleShot(0, self.finish_deferred_ui)
+
+    def finish_deferred_ui(self):
+        self.ensure_theme_factory()
+        with self.startup_profile.phase("hotkeys"):
+            self.bind_hotkeys()
+        with self.startup_profile.phase("midi"):
+            self.start_midi()
+        self.watch_assigned_paths()
+        if self.managed_media or os.path.isdir(MEDIA_DIR): # Copies are never made without the setting
+            self.media_store.collect_garbage(
+                path for data in self.audio_files.values() for path in (data["path"], data.get("icon", "")) if path
+            )
+        self.icon_cache.collect_garbage(data["icon"] for data in self.audio_files.values() if data.get("icon"))
+        if self.show_library:
+            with self.startup_profile.phase("library"):
+                self.apply_library_visibility()
+        self.startup_profile.report()
+        self.startup_complete = True
+
+    def ensure_audio(self):
+        """ Starts the audio backend, engine and device lists on first use. """
+        if self.audio_engine is not None:
+            return
+        self.load_remaining_slots()
+        with self.startup_profile.phase("audio backend"):
+            import_multimedia()
+            self.sample_cache = SampleCache(self.sample_cache_mb, self)
+            self.audio_engine = AudioEngine(self.sample_cache, parent=self)
+            self.audio_engine.set_steal_policy(self.voice_steal_policy)
+            self.audio_engine.set_volume(self.volume_slider.value() / 100.0)
+            self.audio_engine.playback_started.connect(self.playback_started)
+            self.sample_cache.sample_ready.connect(self.analyze_sample)
+            self.sample_cache.sample_ready.connect(self.request_waveform)
+            self.sample_cache.sample_ready.connect(self.transcode_managed)
+            for key in self.audio_files:
+                self.sync_trigger_slot(int(key))
+        with self.startup_profile.phase("device enumeration"):
+            self.device_manager = AudioDeviceManager(self)
+            self.device_manager.devices_changed.connect(self.audio_devices_changed)
+            self.populate_device_lists()
+        self.preload_banks()
+
+    def ensure_theme_factory(self):
+        """ Builds the Theme Factory tab on first use. """
+        if self.theme_factory_widget is not None:
+            return
+        self.load_custom_theme()
+        with self.startup_profile.phase("theme factory"):
+            self.theme_factory_widget = ThemeFactory(self)
+            self.theme_factory_page.layout().addWidget(self.theme_factory_widget)
+            # Same as apply_theme does for a predefined theme while a custom one exists
+            if self.current_theme_name != "Custom" and self.custom_theme:
+                self.theme_factory_widget.current_custom_theme = THEMES.get(self.current_theme_name, THEMES["Cyber Green"]).copy()
+                self.theme_factory_widget.update_color_buttons()
+
+    def ensure_library(self):
+        """ Builds the library dock on first use and brings the index up to date. """
+        if self.library_dock is not None:
+            return
+        self.library_panel = LibraryPanel(self)
+        self.library_scanner.index_ready.connect(self.library_panel.set_index)
+        self.library_scanner.progress.connect(self.library_panel.show_progress)
+        self.library_scanner.scan_finished.connect(self.library_panel.update_status)
+        self.library_dock = QDockWidget("Library", self)
+        self.library_dock.setObjectName("LibraryDock")
+        # Shown and hidden with Ctrl+L, so its visibility is always what the data file says
+        self.library_dock.setFeatures(
+            QDockWidget.DockWidgetFeature.DockWidgetMovable | QDockWidget.DockWidgetFeature.DockWidgetFloatable
+        )
+        self.library_dock.setWidget(self.library_panel)
+        self.addDockWidget(Qt.DockWidgetArea.RightDockWidgetArea, self.library_dock)
+        self.scan_library()
+
+    def toggle_library(self):
+        self.show_library = not self.show_library
+        self.journal({"op": "ui", "key": "show_library", "value": self.show_library})
+        self.apply_library_visibility()
+
+    def apply_library_visibility(self):
+        if self.show_library:
+            self.ensure_library()
+            self.library_dock.show()
+        elif self.library_dock is not None:
+            self.library_dock.hide()
+
+    def scan_library(self):
+        loudness = {path: analysis["integrated_lufs"] for path, analysis in self.loudness.items()}
+        self.library_scanner.scan(self.library_folders, loudness)
+        if self.library_panel is not None:
+            self.library_panel.update_status()
+
+    def add_library_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Add Library Folder")
+        if folder and folder not in self.library_folders:
+            self.library_folders.append(folder)
+            self.journal({"op": "ui", "key": "library_folders", "value": list(self.library_folders)})
+            self.scan_library()
+
+    def remove_library_folder(self):
+        if not self.library_folders:
+            return
+        folder, ok = QInputDialog.getItem(self, "Remove Library Folder", "Folder:", self.library_folders, 0, False)
+        if ok and folder in self.library_folders:
+            self.library_folders.remove(folder)
+            self.journal({"op": "ui", "key": "library_folders", "value": list(self.library_folders)})
+            self.scan_library()
+
+    def handle_tab_change(self, index):
+        if self.tab_widget.widget(index) is self.theme_factory_page:
+            self.ensure_theme_factory()
+
+    def request_decode(self, path):
+        # Until the audio backend is up, ensure_audio() preloads every confirmed file instead
+        if self.sample_cache is not None and self.stream_duration(path) is None:
+            self.sample_cache.request(path)
+
+    def preload_banks(self):
+        """ Decodes the sounds of the current bank and the banks next to it ahead of use.
+
+        The current bank's sounds are evicted last, so switching to a neighbouring bank is instant
+        while memory stays within the sample cache budget however many banks are filled.
+        """
+        if self.sample_cache is None:
+            return
+        bank = self.current_page // PAGES_PER_BANK
+        current_paths = set()
+        for nearby in (bank, bank + 1, bank - 1):
+            if not 0 <= nearby < BANK_COUNT:
+                continue
+            for index in range(nearby * SLOTS_PER_BANK, (nearby + 1) * SLOTS_PER_BANK):
+                data = self.audio_files.get(str(index))
+                if not data:
+                    continue
+                if nearby == bank:
+                    current_paths.add(data["path"])
+                info = self.media_info.get(data["path"])
+                if info is None:
+                    if self.button_for_slot(index) is None: # Buttons on screen have already asked for theirs
+                        self.media_probe.probe_slot(index, data["path"]) # Decoded once the check reports back
+                elif info["exists"] and (nearby == bank or not info.get("mappable")):
+                    # WAV files played in place are mapped on first use outside the bank on screen, it is
+                    # instant and every mapping holds a file open
+                    self.request_decode(data["path"])
+        self.sample_cache.set_priority(current_paths)
+
+    def stream_duration(self, path):
+        """ Estimated duration in ms (0 if unknown) when path is long enough to be streamed, else None. """
+        info = self.media_info.get(path)
+        if self.sample_cache is not None and path in self.sample_cache.too_large:
+            return self.sample_cache.too_large[path] or (info or {}).get("duration_ms") or 0
+        if not info or not info["exists"] or info.get("mappable"):
+            # Unchecked files are cached like short ones until the check reports back. Mapped WAV files are
+            # read in place a piece at a time whatever their length, like a stream
+            return None
+        if info["duration_ms"] is not None:
+            return info["duration_ms"] if info["duration_ms"] >= STREAM_MIN_DURATION_S * 1000 else None
+        return 0 if info["size"] >= STREAM_MIN_FILE_MB * 1024 * 1024 else None
+
+    def init_ui(self):
+        """ Initializes the main window layout and control panel. """
+        self.tab_widget = QTabWidget()
+        self.setCentralWidget(self.tab_widget)
+
+        # Main Soundboard Tab
+        self.main_soundboard_widget = QWidget()
+        main_layout = QVBoxLayout(self.main_soundboard_widget)
+        main_layout.setSpacing(20)
+        main_layout.setContentsMargins(20, 20, 20, 20)
+        
+        # Bank and page selection above the grid
+        page_bar = QHBoxLayout()
+        page_bar.addWidget(QLabel("BANK"))
+        self.bank_combo = QComboBox()
+        self.bank_combo.addItems([f"Bank {chr(ord('A') + bank)}" for bank in range(BANK_COUNT)])
+        self.bank_combo.currentIndexChanged.connect(self.select_page)
+        page_bar.addWidget(self.bank_combo)
+        page_bar.addWidget(QLabel("PAGE"))
+        self.page_combo = QComboBox()
+        self.page_combo.addItems([f"Page {page + 1}" for page in range(PAGES_PER_BANK)])
+        self.page_combo.currentIndexChanged.connect(self.select_page)
+        page_bar.addWidget(self.page_combo)
+        page_bar.addStretch(1)
+        main_layout.addLayout(page_bar)
+        self.sync_page_selectors()
+        for key, step in ((Qt.Key.Key_PageDown, 1), (Qt.Key.Key_PageUp, -1)):
+            shortcut = QShortcut(QKeySequence(key), self)
+            shortcut.activated.connect(lambda step=step: self.set_page(self.current_page + step))
+
+        self.grid_container = QWidget()
+        self.grid_container.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.grid_container.customContextMenuRequested.connect(self.show_background_context_menu)
+        self.button_layout = QGridLayout(self.grid_container)
+        self.button_layout.setSpacing(10)
+        main_layout.addWidget(self.grid_container)
+
+        separator = QFrame()
+        separator.setFrameShape(QFrame.Shape.HLine)
+        separator.setFrameShadow(QFrame.Shadow.Sunken)
+        separator.setObjectName("SeparatorFrame")
         main_layout.addWidget(separator)
         
         # --- Controls Section ---
@@ -856,45 +4146,53 @@ class Cyteboard(QMainWindow):
         self.output_label = QLabel("OUTPUT DEVICE")
         controls_layout.addWidget(self.output_label, 1, 0, Qt.AlignmentFlag.AlignRight)
         self.output_combo = QComboBox()
+        self.output_combo.currentIndexChanged.connect(self.change_output_device)
         controls_layout.addWidget(self.output_combo, 1, 1)
 
         # Virtual input device selection
         self.virtual_label = QLabel("VIRTUAL INPUT")
         controls_layout.addWidget(self.virtual_label, 2, 0, Qt.AlignmentFlag.AlignRight)
         self.virtual_combo = QComboBox()
+        self.virtual_combo.currentIndexChanged.connect(self.change_virtual_device)
         controls_layout.addWidget(self.virtual_combo, 2, 1)
 
+        # Waveform of the playing sound, above the timeline
+        controls_layout.addWidget(self.waveform_view, 3, 1)
+
         # Timeline Slider and Labels
-        controls_layout.addWidget(QLabel("TIMELINE"), 3, 0, Qt.AlignmentFlag.AlignRight)
+        controls_layout.addWidget(QLabel("TIMELINE"), 4, 0, Qt.AlignmentFlag.AlignRight)
         timeline_layout = QHBoxLayout()
         timeline_layout.addWidget(self.current_time_label)
         timeline_layout.addWidget(self.position_slider)
         timeline_layout.addWidget(self.total_time_label)
-        controls_layout.addLayout(timeline_layout, 3, 1)
+        controls_layout.addLayout(timeline_layout, 4, 1)
 
         # Theme selection
         self.theme_label = QLabel("THEME")
-        controls_layout.addWidget(self.theme_label, 4, 0, Qt.AlignmentFlag.AlignRight) # Adjusted row index
+        controls_layout.addWidget(self.theme_label, 5, 0, Qt.AlignmentFlag.AlignRight) # Adjusted row index
         self.theme_combo = QComboBox()
         self.theme_combo.addItems(list(THEMES.keys()) + ["Custom"]) # Add "Custom" to the list
         self.theme_combo.setCurrentText(self.current_theme_name) # Set initial selection
         self.theme_combo.currentIndexChanged.connect(self.handle_theme_selection)
-        controls_layout.addWidget(self.theme_combo, 4, 1) # Adjusted row index
+        controls_layout.addWidget(self.theme_combo, 5, 1) # Adjusted row index
 
         # Add the Stream button
         self.stream_button = QPushButton("Stream")
         self.stream_button.setObjectName("StreamButton") # Set object name for specific styling
         self.stream_button.clicked.connect(self.toggle_stream_state) # Connect to the new toggle function
-        controls_layout.addWidget(self.stream_button, 5, 0, 1, 2) # Adjusted row index, span across two columns
+        controls_layout.addWidget(self.stream_button, 6, 0, 1, 2) # Adjusted row index, span across two columns
         
         main_layout.addWidget(controls_widget)
         self.tab_widget.addTab(self.main_soundboard_widget, "Soundboard")
 
-        # Theme Factory Tab
-        self.theme_factory_widget = ThemeFactory(self)
-        self.tab_widget.addTab(self.theme_factory_widget, "Theme Factory")
+        # Theme Factory Tab, filled in by ensure_theme_factory()
+        self.theme_factory_widget = None
+        self.theme_factory_page = QWidget()
+        theme_factory_layout = QVBoxLayout(self.theme_factory_page)
+        theme_factory_layout.setContentsMargins(0, 0, 0, 0)
+        self.tab_widget.addTab(self.theme_factory_page, "Theme Factory")
+        self.tab_widget.currentChanged.connect(self.handle_tab_change)
 
-        self.populate_device_lists()
         self.setAcceptDrops(True)
         self.update_stream_button_style() # Initialize stream button style
 
@@ -947,48 +4245,285 @@ class Cyteboard(QMainWindow):
 
     def handle_theme_selection(self, index):
         theme_name = self.theme_combo.currentText()
+        self.journal({"op": "ui", "key": "theme", "value": theme_name})
         if theme_name == "Custom":
             self.apply_theme("Custom")
-            self.tab_widget.setCurrentWidget(self.theme_factory_widget) # Switch to theme factory
+            self.tab_widget.setCurrentWidget(self.theme_factory_page) # Switch to theme factory
         else:
             self.apply_theme(theme_name)
             # If switching from Custom to a predefined theme, update Theme Factory's internal state
             # This is crucial so that when the user switches back to 'Custom' tab, it reflects the *current* active theme
             theme = THEMES.get(theme_name, THEMES["Cyber Green"])
-            self.theme_factory_widget.current_custom_theme = theme.copy()
-            self.theme_factory_widget.update_color_buttons()
+            if self.theme_factory_widget is not None:
+                self.theme_factory_widget.current_custom_theme = theme.copy()
+                self.theme_factory_widget.update_color_buttons()
 
 
+    @traced("rebuild_button_grid")
     def rebuild_button_grid(self):
         """ Clears and rebuilds the grid of sound buttons based on self.num_rows. """
         for button in self.buttons:
             self.button_layout.removeWidget(button)
             button.deleteLater()
         self.buttons.clear()
+        self.append_button_rows(self.num_rows)
 
-        num_buttons_to_create = self.num_rows * BUTTONS_PER_ROW
-        for i in range(num_buttons_to_create):
-            row, col = divmod(i, BUTTONS_PER_ROW)
-            btn = SoundButton(f"Empty {i+1}", i, self)
-            
-            if str(i) in self.audio_files:
-                data = self.audio_files[str(i)]
-                btn.setText(data["nickname"])
-                btn.setToolTip(f"Path: {data['path']}")
-                btn.icon_path = data.get("icon", "") # Load icon path
-                
-                if not os.path.exists(data["path"]):
-                    btn.setProperty("broken", True)
-                    btn.setToolTip(f"FILE NOT FOUND. Click to relocate.\nOriginal path: {data['path']}")
-
+    def append_button_rows(self, count):
+        """ Adds `count` rows of buttons after the existing ones, leaving those untouched. """
+        first_position = len(self.buttons)
+        for position in range(first_position, first_position + count * BUTTONS_PER_ROW):
+            row, col = divmod(position, BUTTONS_PER_ROW)
+            index = self.page_slot(position)
+            btn = SoundButton(empty_label(index), index, self)
             self.button_layout.addWidget(btn, row, col)
             self.buttons.append(btn)
-        
-        for btn in self.buttons:
-            btn.update_style() # This also calls update_icon() for each button
+            btn.update_style()
+            btn.show_slot(index)
+
+        self.updateGeometry()
+
+    def page_slot(self, position):
+        return self.current_page * MAX_SOUNDS + position
+
+    def button_for_slot(self, index):
+        """ The button showing a slot, or None when the slot is on another page. """
+        position = index - self.current_page * MAX_SOUNDS
+        return self.buttons[position] if 0 <= position < len(self.buttons) else None
+
+    @traced("set_page")
+    def set_page(self, page):
+        """ Shows another page; the buttons on screen are pointed at its slots instead of being rebuilt. """
+        page = max(0, min(page, PAGE_COUNT - 1))
+        if page == self.current_page:
+            return
+        bank_changed = page // PAGES_PER_BANK != self.current_page // PAGES_PER_BANK
+        self.current_page = page
+        self.journal({"op": "ui", "key": "page", "value": page})
+        for position, btn in enumerate(self.buttons):
+            btn.show_slot(self.page_slot(position))
+        self.sync_page_selectors()
+        self.refresh_midi_bindings() # Notes play the page on screen
+        if bank_changed:
+            self.preload_banks()
 
+    def select_page(self):
+        self.set_page(self.bank_combo.currentIndex() * PAGES_PER_BANK + self.page_combo.currentIndex())
+
+    def sync_page_selectors(self):
+        bank, page = divmod(self.current_page, PAGES_PER_BANK)
+        for combo, value in ((self.bank_combo, bank), (self.page_combo, page)):
+            combo.blockSignals(True)
+            combo.setCurrentIndex(value)
+            combo.blockSignals(False)
+
+    def remove_last_button_row(self):
+        """ Deletes only the buttons of the last row. """
+        for button in self.buttons[-BUTTONS_PER_ROW:]:
+            self.button_layout.removeWidget(button)
+            button.deleteLater()
+        del self.buttons[-BUTTONS_PER_ROW:]
         self.updateGeometry()
 
+    def apply_probe_result(self, index, path, info):
+        """ Applies a background file check to its slot and, if on screen, its button, unless the slot changed meanwhile. """
+        self.media_info[path] = info
+        data = self.audio_files.get(str(index))
+        if not data or data["path"] != path:
+            return
+        btn = self.button_for_slot(index)
+        if btn is not None:
+            btn.setToolTip(self.slot_tooltip(data, info))
+            if btn.property("broken") == info["exists"]: # Went missing, or is back
+                btn.setProperty("broken", not info["exists"])
+                btn.update_style()
+        if not info["exists"]:
+            self.find_moved_file(path)
+            return
+        fingerprint = data.get("fingerprint")
+        if not fingerprint or fingerprint["size"] != info["size"] or fingerprint["mtime"] != info["mtime"]:
+            self.relocator.fingerprint(path, info["size"], info["mtime"]) # Taken now, needed once it's gone
+        self.sync_trigger_slot(index) # Now known whether it is streamed
+        self.request_decode(path) # Decode it ahead of the first click
+        self.analyze_sample(path)
+        self.request_waveform(path)
+
+    def watch_assigned_paths(self):
+        self.path_watcher.set_paths({data["path"] for data in self.audio_files.values()})
+
+    def recheck_paths(self, paths):
+        """ Checks the assigned files in folders that changed; missing ones are flagged and searched for. """
+        paths = set(paths)
+        for key, data in self.audio_files.items():
+            if data["path"] in paths:
+                self.media_probe.probe_slot(int(key), data["path"])
+
+    def store_fingerprint(self, path, fingerprint):
+        self.relocator.in_flight.discard(("fingerprint", path))
+        if fingerprint is None:
+            return
+        for key, data in self.audio_files.items():
+            if data["path"] == path and data.get("fingerprint") != fingerprint:
+                self.update_slot(int(key), fingerprint=fingerprint)
+
+    def find_moved_file(self, path):
+        """ Looks for a missing sound by the fingerprint taken while it was still there. """
+        fingerprint = next(
+            (data["fingerprint"] for data in self.audio_files.values() if data["path"] == path and data.get("fingerprint")),
+            None,
+        )
+        if fingerprint is None:
+            return # Never seen, nothing to recognize it by; it stays broken until relocated by hand
+        candidates = [entry.path for entry in self.library_entries if entry.size == fingerprint["size"]]
+        self.relocator.find(path, fingerprint, candidates)
+
+    def relocate_path(self, path, new_path):
+        """ Points every slot that played a moved file at its new location. """
+        self.relocator.in_flight.discard(("find", path))
+        self.relocation_rescanned.discard(path)
+        for key, data in list(self.audio_files.items()):
+            if data["path"] != path:
+                continue
+            index = int(key)
+            self.set_slot(index, dict(data, path=new_path))
+            btn = self.button_for_slot(index)
+            if btn is not None:
+                btn.show_slot(index) # Also checks the new path
+            else:
+                self.media_probe.probe_slot(index, new_path)
+
+    def relocation_failed(self, path):
+        self.relocator.in_flight.discard(("find", path))
+        if path not in self.relocation_rescanned and self.library_folders:
+            # The library index may not know where it went yet
+            self.relocation_rescanned.add(path)
+            self.relocation_pending.add(path)
+            self.scan_library()
+
+    def retry_relocations(self):
+        pending, self.relocation_pending = self.relocation_pending, set()
+        for path in pending:
+            self.find_moved_file(path)
+
+    def set_managed_media(self, enabled):
+        """ Turns the media store on or off; turning it on copies in every sound and image already assigned. """
+        self.managed_media = enabled
+        self.journal({"op": "ui", "key": "managed_media", "value": enabled})
+        if enabled:
+            for key in self.audio_files:
+                self.import_slot_media(int(key))
+
+    def import_slot_media(self, index):
+        data = self.audio_files.get(str(index))
+        if self.managed_media and data:
+            self.media_store.import_file(data["path"])
+            self.media_store.import_file(data.get("icon", ""))
+
+    def apply_imported_media(self, path, managed):
+        """ Points every slot using path at its copy in the media store. """
+        self.media_store.in_flight.discard(("import", path))
+        if not managed:
+            return
+        for key, data in list(self.audio_files.items()):
+            index = int(key)
+            if data["path"] == path:
+                self.set_slot(index, dict(data, path=managed, original=data.get("original", path)))
+            elif data.get("icon") == path:
+                self.update_slot(index, icon=managed)
+            else:
+                continue
+            btn = self.button_for_slot(index)
+            if btn is not None:
+                btn.show_slot(index)
+
+    def transcode_managed(self, path):
+        """ Keeps a PCM copy of a compressed sound in the media store once it has been decoded. """
+        sample = self.sample_cache.peek(path)
+        if self.managed_media and sample is not None and sample.nbytes and self.media_store.is_managed(path):
+            self.media_store.transcode(path, sample.frames)
+
+    def apply_transcoded_media(self, path, pcm_path):
+        self.media_store.in_flight.discard(("transcode", path))
+        if not pcm_path:
+            return
+        # The compressed copy is left to collect_garbage() once nothing refers to it
+        for key, data in list(self.audio_files.items()):
+            if data["path"] == path:
+                index = int(key)
+                self.set_slot(index, dict(data, path=pcm_path))
+                btn = self.button_for_slot(index)
+                if btn is not None:
+                    btn.show_slot(index)
+
+    def library_indexed(self, entries, trigrams):
+        self.library_entries = entries
+
+    def slot_tooltip(self, data, info):
+        path = data.get("original", data["path"]) # Where a sound in the media store was copied from
+        if info is None:
+            return f"Path: {path}"
+        if not info["exists"]:
+            return f"FILE NOT FOUND. Click to relocate.\nOriginal path: {path}"
+        tooltip = f"Path: {path}"
+        if info["duration_ms"] is not None:
+            tooltip += f"\nDuration: {self.format_time(info['duration_ms'])}"
+        return tooltip
+
+    def analyze_sample(self, path):
+        """ Queues a loudness analysis of a decoded file unless one for this version of it is cached. """
+        info = self.media_info.get(path)
+        sample = self.sample_cache.peek(path) if self.sample_cache is not None else None
+        if sample is None or not info or not info["exists"]:
+            return # Runs again once both the decode and the file check are done
+        cached = self.loudness.get(path)
+        if cached and cached["size"] == info["size"] and cached["mtime"] == info["mtime"]:
+            return
+        self.loudness_analyzer.analyze(path, self.sample_opener(sample), info["size"], info["mtime"])
+
+    def request_waveform(self, path):
+        """ Loads the stored peaks of a checked file, or builds them once it is decoded. """
+        info = self.media_info.get(path)
+        if not info or not info["exists"]:
+            return
+        sample = self.sample_cache.peek(path) if self.sample_cache is not None else None
+        self.waveform_store.request(path, info["size"], info["mtime"], self.sample_opener(sample) if sample is not None else None)
+
+    def sample_opener(self, sample):
+        """ How a background job gets at a cached sample: decoded frames are shared, a file played in place
+        is mapped again by the job itself, so queued jobs hold no files open and nothing is converted here.
+        """
+        if sample.nbytes:
+            return lambda: sample
+        path = sample.path
+        return lambda: map_wav(path)
+
+    def apply_waveform(self, path, pyramid):
+        for btn in self.buttons:
+            data = self.audio_files.get(str(btn.index))
+            if data and data["path"] == path and btn.pyramid is not pyramid:
+                btn.set_waveform(pyramid)
+        if path == self.timeline_path and self.waveform_view.pyramid is not pyramid:
+            self.waveform_view.set_pyramid(pyramid, self.waveform_view.duration_ms)
+
+    def store_analysis(self, path, analysis):
+        self.loudness_analyzer.in_flight.discard(path)
+        self.loudness[path] = analysis
+        self.journal({"op": "analysis", "path": path, "data": analysis})
+        for key, data in self.audio_files.items():
+            if data["path"] == path:
+                self.sync_trigger_slot(int(key))
+
+    def pad_gain(self, path):
+        """ Per-pad gain that evens out loudness differences between files. """
+        if not self.normalize_loudness:
+            return 1.0
+        return normalization_gain(self.loudness.get(path))
+
+    def apply_prepared_icon(self, icon_path, pixmap):
+        # Every button showing this image shares the one cached pixmap
+        for btn in self.buttons:
+            if btn.icon_path == icon_path:
+                btn.set_prepared_icon(icon_path, pixmap)
+
     def show_background_context_menu(self, pos):
         """ Shows a context menu to add or remove rows of buttons. """
         menu = QMenu(self)
@@ -1003,270 +4538,321 @@ class Cyteboard(QMainWindow):
         if self.num_rows <= MIN_ROWS:
             remove_row_action.setEnabled(False)
         menu.addAction(remove_row_action)
+
+        menu.addSeparator()
+        library_action = QAction("Hide Library" if self.show_library else "Show Library", self)
+        library_action.triggered.connect(self.toggle_library)
+        menu.addAction(library_action)
+
+        managed_media_action = QAction("Keep Copies of Sounds", self)
+        managed_media_action.setCheckable(True)
+        managed_media_action.setChecked(self.managed_media)
+        managed_media_action.triggered.connect(self.set_managed_media)
+        menu.addAction(managed_media_action)
         
         menu.exec(self.grid_container.mapToGlobal(pos))
 
     def add_row(self):
         if self.num_rows < MAX_ROWS:
             self.num_rows += 1
-            self.rebuild_button_grid()
+            self.journal({"op": "ui", "key": "num_rows", "value": self.num_rows})
+            self.append_button_rows(1)
 
     def remove_row(self):
         if self.num_rows > MIN_ROWS:
-            # Check if there are active buttons in the last row
+            # Rows are the same on every page, so check the last row of all of them
             last_row_start_index = (self.num_rows - 1) * BUTTONS_PER_ROW
-            has_active_buttons = False
-            for i in range(BUTTONS_PER_ROW):
-                btn_index = last_row_start_index + i
-                if str(btn_index) in self.audio_files:
-                    has_active_buttons = True
-                    break
-            
-            if has_active_buttons:
+            last_row_slots = [
+                int(key) for key in self.audio_files if int(key) % MAX_SOUNDS >= last_row_start_index
+            ]
+
+            if last_row_slots:
                 reply = QMessageBox.question(self, 'Confirm Row Removal',
-                                             "Removing the last row will delete all sounds assigned to it. Are you sure?",
+                                             "Removing the last row will delete all sounds assigned to it on every page. Are you sure?",
                                              QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
                                              QMessageBox.StandardButton.No)
                 if reply == QMessageBox.StandardButton.No:
                     return
 
                 # If confirmed, remove data for buttons in the last row
-                for i in range(BUTTONS_PER_ROW):
-                    btn_index = last_row_start_index + i
-                    self.audio_files.pop(str(btn_index), None)
+                for btn_index in last_row_slots:
+                    self.remove_slot(btn_index)
 
             self.num_rows -= 1
-            self.rebuild_button_grid()
+            self.journal({"op": "ui", "key": "num_rows", "value": self.num_rows})
+            self.remove_last_button_row()
 
 
     def populate_device_lists(self):
-        self.output_combo.clear()
-        self.virtual_combo.clear()
-
-        all_audio_outputs = QMediaDevices.audioOutputs()
-
-        # Filter out virtual devices for the main output
-        self.output_devices = [
-            d for d in all_audio_outputs
-            if "virtual" not in d.description().lower() and "cable" not in d.description().lower()
-        ]
+        """ Fills the device dropdowns and routes each output to its preferred device, or a fallback. """
+        self.output_devices = self.device_manager.outputs(virtual=False)
+        self.virtual_devices = self.device_manager.outputs(virtual=True)
+        output_device = self.device_manager.choose(self.preferred_output_id, virtual=False)
+        virtual_device = self.device_manager.choose(self.preferred_virtual_id, virtual=True)
+        self.fill_device_combo(self.output_combo, self.output_devices, output_device, "No Non-Virtual Output Devices Found")
+        self.fill_device_combo(self.virtual_combo, self.virtual_devices, virtual_device, "No Virtual Device Found")
+        self.route_output("output", output_device)
+        self.route_output("virtual", virtual_device)
 
-        if not self.output_devices:
-            self.output_combo.addItem("No Non-Virtual Output Devices Found")
-            self.output_combo.setEnabled(False)
-        else:
-            for device in self.output_devices:
-                self.output_combo.addItem(device.description())
-            self.output_combo.currentIndexChanged.connect(self.change_output_device)
-            # Set the default output device
-            self.audio_output_device.setDevice(self.output_devices[self.output_combo.currentIndex()])
+    def fill_device_combo(self, combo, devices, selected, empty_text):
+        combo.blockSignals(True) # Refilling is not a choice by the user
+        combo.clear()
+        for device in devices:
+            combo.addItem(device.description())
+        if not devices:
+            combo.addItem(empty_text)
+        elif selected in devices:
+            combo.setCurrentIndex(devices.index(selected))
+        combo.setEnabled(bool(devices))
+        combo.blockSignals(False)
 
+    def route_output(self, name, device):
+        """ Points an output at device. Voices live in the engine's mix, so playing sounds carry on. """
+        output = self.audio_engine.outputs.get(name)
+        if device is None:
+            self.audio_engine.remove_output(name)
+        elif output is None or output.device is None or device_key(output.device) != device_key(device):
+            self.audio_engine.set_output_device(name, device)
 
-        # Identify virtual devices for the virtual input
-        self.virtual_devices = [
-            d for d in all_audio_outputs
-            if "virtual" in d.description().lower() or "cable" in d.description().lower()
-        ]
-        
-        if not self.virtual_devices:
-            self.virtual_combo.addItem("No Virtual Device Found")
-            self.virtual_combo.setEnabled(False)
-        else:
-            for device in self.virtual_devices:
-                self.virtual_combo.addItem(device.description())
-            self.virtual_combo.currentIndexChanged.connect(self.change_virtual_device)
-            if self.virtual_devices:
-                    self.audio_virtual_device.setDevice(self.virtual_devices[self.virtual_combo.currentIndex()])
+    def audio_devices_changed(self, added, removed):
+        for description in removed:
+            print(f"Warning: Audio device disconnected: {description}")
+        self.populate_device_lists()
 
+    @traced("apply_theme")
     def apply_theme(self, theme_name):
+        started = time.perf_counter()
         self.current_theme_name = theme_name
+        if theme_name == "Custom":
+            self.load_custom_theme()
         
         if theme_name == "Custom" and self.custom_theme:
             theme = self.custom_theme
         else:
             theme = THEMES.get(theme_name, THEMES["Cyber Green"]) # Fallback to default
             # If a predefined theme is selected, ensure the custom theme is not accidentally loaded
-            if theme_name != "Custom" and self.custom_theme:
+            if theme_name != "Custom" and self.custom_theme and self.theme_factory_widget is not None:
                  # Update the theme factory's current theme to match the newly applied one
                  # This is crucial so that when the user switches to 'Custom' tab, it reflects the *current* active theme
                  self.theme_factory_widget.current_custom_theme = theme.copy()
                  self.theme_factory_widget.update_color_buttons()
 
 
-        style = f"""
-            QMainWindow, QWidget {{
-                background-color: {theme["bg_color"]};
-                color: {theme["text_color"]};
-                font-family: "Lucida Console", "Courier New", monospace;
-            }}
-            QPushButton {{
-                background-color: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1, stop: 0 {theme["button_bg_gradient_stop0"]}, stop: 1 {theme["button_bg_gradient_stop1"]});
-                border: 1px solid {theme["button_border"]};
-                border-radius: 8px;
-                color: {theme["text_color"]};
-                font-size: 12px;
-                font-weight: bold;
-                padding: 5px;
-                min-width: 70px;
-                max-width: 100px;
-                min-height: 30px;
-                max-height: 50px;
-                text-align: center;
-            }}
-            QPushButton:hover {{
-                background-color: {theme["button_hover_bg"]};
-                color: {theme["button_hover_text"]};
-                border: 1px solid {theme["button_border"]};
-            }}
-            QPushButton:pressed {{
-                background-color: {theme["button_pressed_bg"]};
-                border-color: {theme["button_pressed_bg"]};
-                color: {theme["button_hover_text"]};
-            }}
-            QPushButton[broken="true"] {{
-                border: 1px solid {theme["broken_button_border"]};
-                color: {theme["broken_button_text"]};
-                background-color: {theme["broken_button_bg"]};
-            }}
-            QPushButton[broken="true"]:hover {{
-                border-color: {theme["broken_button_hover_border"]};
-                color: {theme["button_hover_text"]};
-                background-color: {theme["broken_button_hover_bg"]};
-            }}
-            QLabel {{
-                color: {theme["text_color"]};
-                font-size: 12px;
-                font-weight: bold;
-                letter-spacing: 2px;
-                text-transform: uppercase;
-            }}
-            QSlider::groove:horizontal {{ background: {theme["slider_groove_bg"]}; border: 1px solid #3a3a3a; height: 4px; border-radius: 2px; }}
-            QSlider::handle:horizontal {{ background: {theme["slider_handle_bg"]}; border: 2px solid {theme["slider_handle_border"]}; width: 16px; height: 16px; margin: -8px 0; border-radius: 8px; }}
-            QSlider::handle:horizontal:hover {{ background: {theme["button_hover_bg"]}; }}
-            QComboBox {{ background-color: {theme["combo_bg"]}; border: 1px solid {theme["combo_border"]}; border-radius: 5px; padding: 5px 10px; color: {theme["text_color"]}; font-weight: bold; }}
-            QComboBox:hover {{ border: 1px solid {theme["button_hover_bg"]}; }}
-            QComboBox::drop-down {{ subcontrol-origin: padding; subcontrol-position: top right; width: 25px; border-left-width: 1px; border-left-color: {theme["combo_border"]}; border-left-style: solid; border-top-right-radius: 5px; border-bottom-right-radius: 5px; }}
-            QComboBox QAbstractItemView {{ background-color: {theme["bg_color"]}; border: 1px solid {theme["combo_border"]}; selection-background-color: {theme["button_hover_bg"]}; selection-color: {theme["button_hover_text"]}; color: {theme["text_color"]}; outline: 0px; padding: 5px; }}
-            QMenu {{ background-color: {theme["menu_bg"]}; border: 1px solid {theme["menu_border"]}; color: {theme["text_color"]}; padding: 5px; }}
-            QMenu::item {{ padding: 8px 25px; border-radius: 4px; }}
-            QMenu::item:selected {{ background-color: {theme["button_hover_bg"]}; color: {theme["button_hover_text"]}; }}
-            QMenu::item:disabled {{ color: #555; }}
-            QMenu::separator {{ height: 1px; background: {theme["separator_border"]}; margin: 5px 5px; }}
-            #SeparatorFrame {{ border: 1px solid {theme["separator_border"]}; }}
-            QDialog, QMessageBox, QInputDialog {{ background-color: {theme["bg_color"]}; }}
-            QLineEdit {{ background-color: {theme["input_bg"]}; border: 1px solid {theme["input_border"]}; border-radius: 5px; color: {theme["text_color"]}; padding: 5px; font-size: 14px; }}
-            QLineEdit:focus {{ border: 1px solid {theme["button_hover_bg"]}; }}
-            QPushButton {{
-                /* Apply border-radius to the icon as well, if supported, otherwise it's just the button */
-                border-image: url(none); /* Prevents default image styling interfering */
-                qproperty-iconSize: 32px 32px; /* Set desired icon size to be smaller */
-            }}
-            QPushButton::hover {{
-                border-image: url(none);
-            }}
-            QPushButton::pressed {{
-                border-image: url(none);
-            }}
-            QTabWidget::pane {{ /* The tab widget frame */
-                border: 1px solid {theme["separator_border"]};
-                background-color: {theme["bg_color"]};
-            }}
-            QTabWidget::tab-bar {{
-                left: 5px; /* move to the right */
-            }}
-            QTabBar::tab {{
-                background: {theme["combo_bg"]};
-                border: 1px solid {theme["combo_border"]};
-                border-bottom-color: {theme["combo_border"]}; /* same as pane color */
-                border-top-left-radius: 4px;
-                border-top-right-radius: 4px;
-                min-width: 8ex;
-                padding: 5px 10px;
-                color: {theme["text_color"]};
-                font-weight: bold;
-            }}
-            QTabBar::tab:selected, QTabBar::tab:hover {{
-                background: {theme["button_hover_bg"]};
-                color: {theme["button_hover_text"]};
-            }}
-            QTabBar::tab:selected {{
-                border-color: {theme["button_hover_bg"]};
-                border-bottom-color: {theme["bg_color"]}; /* make selected tab appear connected to the pane */
-            }}
-            #StreamButton {{ /* Default style for the Stream button (inactive) */
-                background-color: #dc3545; /* Red color */
-                border: 1px solid #dc3545;
-                color: white;
-            }}
-            #StreamButton:hover {{
-                background-color: #c82333; /* Darker red on hover */
-                border: 1px solid #c82333;
-            }}
-            #StreamButton:pressed {{
-                background-color: #bd2130; /* Even darker red when pressed */
-                border: 1px solid #bd2130;
-            }}
-            #StreamButton[active="true"] {{ /* Style when streaming is active */
-                background-color: #28a745; /* Green color */
-                border: 1px solid #28a745;
-                color: white;
-            }}
-            #StreamButton[active="true"]:hover {{
-                background-color: #218838; /* Darker green on hover */
-                border: 1px solid #218838;
-            }}
-            #StreamButton[active="true"]:pressed {{
-                background-color: #1e7e34; /* Even darker green when pressed */
-                border: 1px solid #1e7e34;
-            }}
-        """
-        self.setStyleSheet(style)
-        # Force re-style on all buttons to ensure icon border-radius property is re-evaluated
-        for button in self.buttons:
-            button.update_style()
+        style = compile_stylesheet(tuple(sorted(theme.items())))
+        if style is not self.applied_stylesheet:
+            # Setting the top-level stylesheet re-polishes every child widget once; icons are left alone
+            self.setStyleSheet(style)
+            self.applied_stylesheet = style
+        for widget in self.preview_styled:
+            widget.setStyleSheet("")
+        self.preview_styled = []
         # Also update the stream button's style specifically
         self.update_stream_button_style()
+        self.waveform_view.set_color(theme.get("text_color", "#00ff7f"))
+
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        self.last_theme_switch_ms = elapsed_ms
+        self.theme_applied.emit(theme_name, elapsed_ms)
         
+    def preview_custom_theme(self, theme, keys):
+        """ Shows edited custom colours by restyling only the widget types that use them, when that is possible. """
+        self.custom_theme = theme
+        scopes = set().union(*(theme_key_scopes(key) for key in keys))
+        if self.current_theme_name != "Custom" or not scopes <= set(PREVIEW_SCOPES):
+            self.apply_theme("Custom") # Colours used by every widget, like the background
+            return
+        style = compile_stylesheet(tuple(sorted(theme.items())))
+        for scope in scopes:
+            rules = scoped_stylesheet(style, scope)
+            for widget in self.preview_targets(scope):
+                widget.setStyleSheet(rules)
+                if widget not in self.preview_styled:
+                    self.preview_styled.append(widget)
+
+    def preview_targets(self, scope):
+        if scope == "QPushButton":
+            return [self.grid_container] # The pads; other buttons follow with the full restyle
+        if scope == "QMenu":
+            return [] # Menus are closed while colours are picked
+        widget_type = {"QSlider": QSlider, "QComboBox": QComboBox, "QLineEdit": QLineEdit, "QTabBar": QTabBar}[scope]
+        return self.findChildren(widget_type)
+
     def set_volume(self, value):
         vol = value / 100.0
-        self.audio_output_device.setVolume(vol)
-        self.audio_virtual_device.setVolume(vol)
+        if self.audio_engine is not None:
+            self.audio_engine.set_volume(vol)
 
     def change_output_device(self, index):
         if not self.output_devices or not (0 <= index < len(self.output_devices)): return
         device = self.output_devices[index]
-        self.audio_output_device.setDevice(device)
-        self.audio_output_device.setVolume(self.volume_slider.value() / 100.0)
+        self.preferred_output_id = device_key(device)
+        self.journal({"op": "ui", "key": "output_device_id", "value": self.preferred_output_id})
+        self.route_output("output", device)
 
     def change_virtual_device(self, index):
         if not self.virtual_devices or not (0 <= index < len(self.virtual_devices)): return
         device = self.virtual_devices[index]
-        self.audio_virtual_device.setDevice(device)
-        self.audio_virtual_device.setVolume(self.volume_slider.value() / 100.0)
+        self.preferred_virtual_id = device_key(device)
+        self.journal({"op": "ui", "key": "virtual_device_id", "value": self.preferred_virtual_id})
+        self.route_output("virtual", device)
+
+    @traced("trigger_pad")
+    def trigger_pad(self, index, pressed_ns=None):
+        """ Plays a slot on all outputs; clicks and hotkeys both end up here. """
+        pressed_ns = pressed_ns or time.perf_counter_ns()
+        self.ensure_audio()
+        if not self.audio_engine.trigger_slot(index, pressed_ns):
+            # Still decoding, it starts once done. Re-check the file in case it went missing since
+            data = self.audio_files.get(str(index))
+            if data:
+                self.media_probe.probe_slot(index, data["path"])
 
-    def play_on_all_outputs(self, url: QUrl):
-        self.player_output.setSource(url)
-        self.player_virtual.setSource(url)
-        self.player_output.play()
-        self.player_virtual.play()
+    def sync_trigger_slot(self, index):
+        """ Refreshes the engine's precomputed entry for a slot after its sound or gain changed. """
+        if self.audio_engine is None or index >= TOTAL_SLOTS:
+            return
+        data = self.audio_files.get(str(index))
+        if data:
+            path = data["path"]
+            self.audio_engine.slots.set_slot(
+                index, path, self.pad_gain(path), self.sample_cache.peek(path), self.stream_duration(path)
+            )
+        else:
+            self.audio_engine.slots.clear_slot(index)
+
+    def set_hotkey(self, index, sequence):
+        """ Binds sequence to a slot, taking it away from any other slot that had it. """
+        if sequence:
+            for key, data in self.audio_files.items():
+                if data.get("hotkey") == sequence and key != str(index):
+                    self.update_slot(int(key), hotkey="")
+        self.update_slot(index, hotkey=sequence)
+        self.bind_hotkeys()
+
+    def start_midi(self):
+        if not self.use_midi or self.midi_input is not None:
+            return
+        self.ensure_audio()
+        self.midi_input = MidiInput(self.audio_engine, self)
+        if self.midi_input.available():
+            self.midi_input.learned.connect(self.set_midi_binding)
+            self.refresh_midi_bindings()
+            self.midi_input.open()
+
+    def refresh_midi_bindings(self):
+        if self.midi_input is not None:
+            self.midi_input.set_bindings({
+                int(key): data["midi"] for key, data in self.audio_files.items() if data.get("midi")
+            }, self.page_slot(0))
+
+    def learn_midi(self, index):
+        """ Binds the next note or CC received to a slot. """
+        self.midi_input.learn_slot = index
+        # Not modal, MIDI messages must still reach the window while it is shown
+        self.midi_learn_box = QMessageBox(QMessageBox.Icon.Information, "Learn MIDI Trigger",
+                                          "Press a pad or key on your MIDI controller.",
+                                          QMessageBox.StandardButton.Cancel, self)
+        self.midi_learn_box.setModal(False)
+        self.midi_learn_box.finished.connect(self.cancel_midi_learn)
+        self.midi_learn_box.show()
+
+    def cancel_midi_learn(self):
+        if self.midi_learn_box is not None: # Closed before anything was received
+            self.midi_input.learn_slot = None
+            self.midi_learn_box = None
+
+    def set_midi_binding(self, index, binding):
+        """ Binds a note or CC to a slot, taking it away from any other slot that had it. """
+        if binding:
+            for key, data in self.audio_files.items():
+                if data.get("midi") == binding and key != str(index):
+                    self.update_slot(int(key), midi="")
+        self.update_slot(index, midi=binding)
+        self.refresh_midi_bindings()
+        if self.midi_learn_box is not None:
+            box, self.midi_learn_box = self.midi_learn_box, None
+            box.done(QMessageBox.StandardButton.Ok)
+
+    def bind_hotkeys(self):
+        """ Registers every slot's hotkey, globally if possible. """
+        hotkeys = {
+            int(key): data["hotkey"] for key, data in self.audio_files.items()
+            if data.get("hotkey") and int(key) < TOTAL_SLOTS
+        }
+        for shortcut in self.hotkey_shortcuts:
+            shortcut.setEnabled(False)
+            shortcut.deleteLater()
+        self.hotkey_shortcuts = []
+        if self.use_global_hotkeys:
+            if self.global_hotkeys is None:
+                self.global_hotkeys = GlobalHotkeys(self)
+                self.global_hotkeys.activated.connect(self.trigger_pad)
+            if self.global_hotkeys.available():
+                hotkeys = self.global_hotkeys.bind(hotkeys) # What is left is bound inside the window
+        for index, sequence in hotkeys.items():
+            key_sequence = QKeySequence(sequence, QKeySequence.SequenceFormat.PortableText)
+            if key_sequence.isEmpty():
+                print(f"Warning: Could not bind the hotkey {sequence!r}, it is not a key sequence.")
+                continue
+            shortcut = QShortcut(key_sequence, self)
+            shortcut.setContext(Qt.ShortcutContext.ApplicationShortcut)
+            shortcut.setAutoRepeat(False) # Holding the key down doesn't retrigger
+            shortcut.activated.connect(lambda index=index: self.trigger_pad(index))
+            self.hotkey_shortcuts.append(shortcut)
+
+    def playback_started(self, duration, path):
+        self.timeline_path = path
+        self.waveform_view.set_pyramid(self.waveform_store.lookup(path), duration)
+        self.duration_changed(duration)
+        self.position_changed(0)
+        self.position_timer.start()
+
+    def update_position(self):
+        position = self.audio_engine.timeline_position_ms()
+        if position is None:
+            self.position_timer.stop()
+            return
+        if self.isMinimized() or not self.isVisible():
+            return # Nothing to draw; the next tick after restoring catches up
+        self.position_changed(position)
 
     def duration_changed(self, duration):
         # Duration is in milliseconds
         self.position_slider.setRange(0, duration)
         self.total_time_label.setText(self.format_time(duration))
+        self.shown_second = None
+        self.shown_slider_value = None
 
     def position_changed(self, position):
-        # Position is in milliseconds
+        # Position is in milliseconds; widgets are only touched when what they show would change
+        second = position // 1000
+        if second != self.shown_second:
+            self.shown_second = second
+            self.current_time_label.setText(self.format_time(position))
         # Only update slider value if the user is not currently dragging it
         if not self.position_slider.isSliderDown():
-            self.position_slider.setValue(position)
-        self.current_time_label.setText(self.format_time(position))
+            value = self.slider_value_for_pixel(position)
+            if value != self.shown_slider_value:
+                self.shown_slider_value = value
+                self.position_slider.setValue(value)
+        self.waveform_view.set_position_ms(position)
+
+    def slider_value_for_pixel(self, position):
+        """ Rounds position down to the first value of the slider pixel it falls on. """
+        duration = self.position_slider.maximum()
+        width = max(self.position_slider.width(), 1)
+        if duration <= 0:
+            return 0
+        pixel = position * width // duration
+        return -(-pixel * duration // width)
 
     def set_position_from_slider(self):
         # Set position in milliseconds from the slider's current value
-        position = self.position_slider.value()
-        self.player_output.setPosition(position)
-        self.player_virtual.setPosition(position)
+        self.seek_to(self.position_slider.value())
+
+    def seek_to(self, position):
+        if self.audio_engine is not None:
+            self.audio_engine.seek(position)
 
     def format_time(self, ms):
         # Helper function to format milliseconds into MM:SS
@@ -1276,52 +4862,175 @@ class Cyteboard(QMainWindow):
         return f"{minutes:02}:{seconds:02}"
 
 
+    def set_slot(self, index, data):
+        """ Stores the sound data of a slot and journals the change. """
+        previous = self.audio_files.get(str(index))
+        self.audio_files[str(index)] = data
+        self.journal({"op": "set", "slot": str(index), "data": data})
+        self.sync_trigger_slot(index)
+        if previous is not None:
+            self.release_unused_sample(previous["path"])
+        self.watch_assigned_paths()
+        self.import_slot_media(index)
+
+    def release_unused_sample(self, path):
+        """ Closes a sound played in place once no slot uses it any more. """
+        if self.sample_cache is not None and all(data["path"] != path for data in self.audio_files.values()):
+            self.sample_cache.release(path)
+
+    def update_slot(self, index, **fields):
+        """ Changes fields of an assigned slot and journals the change. """
+        data = self.audio_files.get(str(index))
+        if data is not None:
+            data.update(fields)
+            self.journal({"op": "set", "slot": str(index), "data": data})
+            if fields.get("icon"):
+                self.import_slot_media(index)
+
+    def remove_slot(self, index):
+        data = self.audio_files.pop(str(index), None)
+        if data is not None:
+            self.journal({"op": "remove", "slot": str(index)})
+            self.sync_trigger_slot(index)
+            self.release_unused_sample(data["path"])
+            self.watch_assigned_paths()
+            if data.get("hotkey"):
+                self.bind_hotkeys()
+            if data.get("midi"):
+                self.refresh_midi_bindings()
+
+    def journal(self, record):
+        self.data_store.append(record)
+
+    @traced("load_data")
     def load_data(self):
-        """ Loads sound data and UI state from the JSON file. """
-        if os.path.exists(DATA_FILE):
-            try:
-                with open(DATA_FILE, "r") as f:
-                    data = json.load(f)
-                    self.audio_files = data.get("audio_files", {})
-                    self.num_rows = data.get("ui_state", {}).get("num_rows", DEFAULT_ROWS)
-                    self.current_theme_name = data.get("ui_state", {}).get("theme", "Cyber Green")
-                    self.custom_theme = data.get("ui_state", {}).get("custom_theme", None)
-                    # Load the streaming state
-                    self.is_streaming_active = data.get("ui_state", {}).get("is_streaming_active", False)
-                    
-                    self.num_rows = max(MIN_ROWS, min(self.num_rows, MAX_ROWS))
-
-            except (json.JSONDecodeError, TypeError):
-                print(f"Warning: Could not parse {DATA_FILE}. Starting fresh.")
-                self.audio_files = {}
-                self.num_rows = DEFAULT_ROWS
-                self.current_theme_name = "Cyber Green"
-                self.custom_theme = None
-                self.is_streaming_active = False # Reset on error
-        else:
-            self.audio_files = {}
-            self.num_rows = DEFAULT_ROWS
-            self.current_theme_name = "Cyber Green"
-            self.custom_theme = None
-            self.is_streaming_active = False
+        """ Loads UI state and the sounds of the page on screen; everything else is read when it is needed. """
+        ui_state = self.data_store.rows("ui", exclude=("custom_theme",))
+        self.num_rows = ui_state.get("num_rows", DEFAULT_ROWS)
+        self.current_page = max(0, min(ui_state.get("page", 0), PAGE_COUNT - 1))
+        first_slot = self.current_page * MAX_SOUNDS
+        self.audio_files = self.data_store.load_slots(first_slot, first_slot + MAX_SOUNDS)
+        self.slots_complete = False
+        self.current_theme_name = ui_state.get("theme", "Cyber Green")
+        self.custom_theme = None
+        self.custom_theme_loaded = False
+        # Load the streaming state
+        self.is_streaming_active = ui_state.get("is_streaming_active", False)
+        self.sample_cache_mb = ui_state.get("sample_cache_mb", SAMPLE_CACHE_BUDGET_MB)
+        self.voice_steal_policy = ui_state.get("voice_steal_policy", VOICE_STEAL_POLICY)
+        self.icon_cache_mb = ui_state.get("icon_cache_mb", ICON_CACHE_MB)
+        self.normalize_loudness = ui_state.get("normalize_loudness", True)
+        self.show_pad_waveforms = ui_state.get("pad_waveforms", True)
+        self.use_global_hotkeys = ui_state.get("global_hotkeys", True)
+        self.use_midi = ui_state.get("midi_input", True)
+        self.show_hud = ui_state.get("show_hud", False)
+        self.library_folders = ui_state.get("library_folders", [])
+        self.show_library = ui_state.get("show_library", False)
+        self.managed_media = ui_state.get("managed_media", False)
+        self.preferred_output_id = ui_state.get("output_device_id", "")
+        self.preferred_virtual_id = ui_state.get("virtual_device_id", "")
+        self.loudness = LazyRecords(self.data_store, "analysis")
 
-    def closeEvent(self, event):
-        """ Saves all data to the JSON file when the application closes. """
-        data_to_save = {
-            "audio_files": self.audio_files,
-            "ui_state": {
-                "num_rows": self.num_rows,
-                "theme": self.current_theme_name,
-                "custom_theme": self.custom_theme, # Save custom theme data
-                "is_streaming_active": self.is_streaming_active # Save streaming state
-            }
+        self.num_rows = max(MIN_ROWS, min(self.num_rows, MAX_ROWS))
+
+    def load_remaining_slots(self):
+        """ Reads the sounds of the other pages, which hotkeys, MIDI and preloading need. """
+        if self.slots_complete:
+            return
+        self.slots_complete = True
+        for key, data in self.data_store.load_slots().items():
+            self.audio_files.setdefault(key, data) # Slots already read may have been edited since
+
+    def load_custom_theme(self):
+        if not self.custom_theme_loaded:
+            self.custom_theme = self.data_store.lookup("ui", "custom_theme")
+            self.custom_theme_loaded = True
+
+    def collect_ui_state(self):
+        ui_state = {
+            "num_rows": self.num_rows,
+            "page": self.current_page,
+            "theme": self.current_theme_name,
+            "is_streaming_active": self.is_streaming_active, # Save streaming state
+            "sample_cache_mb": self.sample_cache_mb,
+            "voice_steal_policy": self.voice_steal_policy,
+            "icon_cache_mb": self.icon_cache_mb,
+            "normalize_loudness": self.normalize_loudness,
+            "pad_waveforms": self.show_pad_waveforms,
+            "global_hotkeys": self.use_global_hotkeys,
+            "midi_input": self.use_midi,
+            "show_hud": self.show_hud,
+            "library_folders": self.library_folders,
+            "show_library": self.show_library,
+            "managed_media": self.managed_media,
+            "output_device_id": self.preferred_output_id,
+            "virtual_device_id": self.preferred_virtual_id
         }
-        with open(DATA_FILE, "w") as f:
-            json.dump(data_to_save, f, indent=4)
+        if self.custom_theme_loaded: # Otherwise the stored one is unchanged
+            ui_state["custom_theme"] = self.custom_theme # Save custom theme data
+        return ui_state
+
+    @traced("closeEvent")
+    def closeEvent(self, event):
+        """ Writes the settings and waits for every pending write before the application closes. """
+        if self.global_hotkeys is not None:
+            self.global_hotkeys.stop()
+        if self.midi_input is not None:
+            self.midi_input.close()
+        if self.audio_engine is not None:
+            self.audio_engine.shutdown()
+        self.data_store.save_ui(self.collect_ui_state())
+        self.data_store.close()
+        if self.profile_latency:
+            self.report_latency()
         event.accept()
 
+    def toggle_hud(self):
+        self.show_hud = not self.show_hud
+        self.hud.set_active(self.show_hud)
+        self.journal({"op": "ui", "key": "show_hud", "value": self.show_hud})
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self.hud.isVisible():
+            self.hud.place()
+
+    def report_latency(self):
+        stats = self.audio_engine.ring.latency.stats() if self.audio_engine is not None else None
+        if stats is None:
+            print("Trigger latency: no sounds were played")
+            return
+        print(
+            f"Trigger latency over {stats['count']} triggers: median {stats['median_ms']:.1f} ms, "
+            f"95th percentile {stats['p95_ms']:.1f} ms, max {stats['max_ms']:.1f} ms"
+        )
+
 if __name__ == "__main__":
+    # --trace PATH records spans while the app runs and writes them as a Chrome trace on exit
+    trace_path = sys.argv[sys.argv.index("--trace") + 1] if "--trace" in sys.argv[:-1] else None
+    TRACER.enabled = trace_path is not None
+    # --export-profile PATH / --import-profile PATH copy the profile to or from a JSON file, then exit
+    for option in ("--export-profile", "--import-profile"):
+        if option in sys.argv[:-1]:
+            os.makedirs(DATA_DIR, exist_ok=True)
+            json_path = sys.argv[sys.argv.index(option) + 1]
+            store = DataStore()
+            try:
+                if option == "--export-profile":
+                    with open(json_path, "w", encoding="utf-8") as f:
+                        json.dump(store.export_data(), f, indent=4)
+                else:
+                    store.import_data(read_json_profile(json_path))
+            except (OSError, ValueError, TypeError, UnicodeDecodeError) as e:
+                print(f"Warning: Could not {'export' if option == '--export-profile' else 'import'} {json_path}: {e}")
+                sys.exit(1)
+            finally:
+                store.close()
+            sys.exit(0)
     app = QApplication(sys.argv)
-    window = Cyteboard()
+    window = Cyteboard(profile_startup="--profile-startup" in sys.argv, profile_latency="--profile-latency" in sys.argv)
     window.show()
-    sys.exit(app.exec())
+    exit_code = app.exec()
+    if trace_path:
+        TRACER.export_chrome(trace_path)
+    sys.exit(exit_code)
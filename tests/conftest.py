@@ -0,0 +1,43 @@
+""" Shared setup: main.py is imported with its data directory in a scratch folder and Qt offscreen. """
+import os
+import sys
+import time
+import tempfile
+
+# main.py picks its data directory from these when imported
+os.environ["HOME"] = os.environ["APPDATA"] = tempfile.mkdtemp(prefix="cyteboard-tests-")
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from PyQt6.QtWidgets import QApplication
+
+import main
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    return QApplication.instance() or QApplication(sys.argv[:1])
+
+
+@pytest.fixture
+def wait_until(qapp):
+    """ Runs the event loop until condition() holds, failing the test after timeout seconds. """
+    def wait(condition, timeout=10.0):
+        deadline = time.perf_counter() + timeout
+        while not condition():
+            assert time.perf_counter() < deadline, "timed out"
+            qapp.processEvents()
+            time.sleep(0.005)
+    return wait
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """ Points every file main.py writes at tmp_path. """
+    monkeypatch.setattr(main, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "DATA_FILE", str(tmp_path / "cyteboard_data.json"))
+    monkeypatch.setattr(main, "JOURNAL_FILE", str(tmp_path / "cyteboard_data.journal"))
+    monkeypatch.setattr(main, "LIBRARY_INDEX_FILE", str(tmp_path / "library_index.json"))
+    monkeypatch.setattr(main, "MEDIA_DIR", str(tmp_path / "media"))
+    return tmp_path
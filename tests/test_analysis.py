@@ -0,0 +1,128 @@
+""" Loudness, true peak and waveform peaks. """
+import numpy as np
+import pytest
+
+import main
+
+
+def sine(amplitude, seconds, frequency=1000.0, channels=2):
+    t = np.arange(int(main.ENGINE_SAMPLE_RATE * seconds)) / main.ENGINE_SAMPLE_RATE
+    return np.repeat((amplitude * np.sin(2 * np.pi * frequency * t))[:, None], channels, axis=1).astype(np.float32)
+
+
+def test_integrated_loudness_of_reference_sine():
+    # EBU Tech 3341 case 1: a stereo 1 kHz sine at -23 dBFS reads -23 LUFS
+    frames = sine(10 ** (-23 / 20), 20)
+    assert main.integrated_loudness(frames) == pytest.approx(-23.0, abs=0.1)
+
+
+def test_true_peak_of_sine():
+    assert main.true_peak_dbtp(sine(0.5, 1)) == pytest.approx(-6.02, abs=0.1)
+
+
+def test_true_peak_finds_intersample_peaks():
+    # A quarter of the sample rate, sampled at 45 degrees: every sample is at 0.707 of the real peak
+    frames = np.repeat(np.sin(np.pi / 4 + np.pi / 2 * np.arange(4800))[:, None], 2, axis=1).astype(np.float32)
+    assert float(np.abs(frames).max()) == pytest.approx(0.707, abs=0.001)
+    assert main.true_peak_dbtp(frames) > -1.0
+
+
+@pytest.mark.parametrize("frames", [
+    np.zeros((0, 2), dtype=np.float32),
+    np.zeros((main.ENGINE_SAMPLE_RATE, 2), dtype=np.float32),
+])
+def test_silence_and_empty_input_measure_nothing(frames):
+    assert main.integrated_loudness(frames) is None
+    assert main.true_peak_dbtp(frames) is None
+    assert main.measure_loudness(lambda start, end: frames[start:end], len(frames)) == (None, None)
+
+
+def test_too_short_for_a_gating_block():
+    frames = sine(0.5, 0.3)
+    assert main.integrated_loudness(frames) is None
+    assert main.true_peak_dbtp(frames) is not None
+
+
+def test_chunked_measurement_matches_one_pass(monkeypatch):
+    frames = np.random.default_rng(1).normal(0, 0.1, (main.ENGINE_SAMPLE_RATE * 5 + 123, 2)).astype(np.float32)
+    whole = main.measure_loudness(lambda start, end: frames[start:end], len(frames))
+    monkeypatch.setattr(main, "ANALYSIS_CHUNK_FRAMES", 50000)
+    reads = []
+
+    def chunk(start, end):
+        reads.append(end - start)
+        return frames[start:end]
+
+    chunked = main.measure_loudness(chunk, len(frames))
+    assert chunked == pytest.approx(whole, abs=1e-6)
+    assert max(reads) <= 50000 + main.ANALYSIS_WARMUP_FRAMES
+
+
+def test_normalization_gain_respects_the_peak_ceiling():
+    assert main.normalization_gain(None) == 1.0
+    quiet = main.normalization_gain({"integrated_lufs": main.LOUDNESS_TARGET_LUFS - 6, "true_peak_dbtp": -20.0})
+    assert 20 * np.log10(quiet) == pytest.approx(6.0)
+    limited = main.normalization_gain({"integrated_lufs": main.LOUDNESS_TARGET_LUFS - 6, "true_peak_dbtp": -3.0})
+    assert 20 * np.log10(limited) == pytest.approx(main.TRUE_PEAK_CEILING_DBTP + 3.0)
+
+
+def test_peak_pyramid_levels():
+    frames = np.zeros((1024, 2), dtype=np.float32)
+    frames[10] = 1.0
+    frames[700] = -0.5
+    pyramid = main.PeakPyramid.build(frames, base_frames=256)
+    assert pyramid.frame_count == 1024
+    assert pyramid.levels[0].tolist() == [[0, 127], [0, 0], [-64, 0], [0, 0]]
+
+    mins, maxs = pyramid.columns(2)
+    assert mins.tolist() == pytest.approx([0.0, -64 / 127])
+    assert maxs.tolist() == pytest.approx([1.0, 0.0])
+
+
+def test_peak_pyramid_halves_down_to_the_minimum():
+    pyramid = main.PeakPyramid.build(np.zeros((256 * 1000, 2), dtype=np.float32), base_frames=256)
+    assert [len(level) for level in pyramid.levels] == [1000, 500, 250, 125, 63]
+
+
+def test_empty_peak_pyramid_draws_nothing(tmp_path):
+    pyramid = main.PeakPyramid.build(np.zeros((0, 2), dtype=np.float32))
+    assert pyramid.frame_count == 0
+    mins, maxs = pyramid.columns(100)
+    assert len(mins) == len(maxs) == 0
+    pyramid.save(str(tmp_path / "empty.peaks"))
+    assert len(main.PeakPyramid.load(str(tmp_path / "empty.peaks")).columns(100)[0]) == 0
+
+
+def test_peak_pyramid_round_trip(tmp_path):
+    frames = np.random.default_rng(2).uniform(-1, 1, (30000, 2)).astype(np.float32)
+    pyramid = main.PeakPyramid.build(frames)
+    pyramid.save(str(tmp_path / "a.peaks"))
+    loaded = main.PeakPyramid.load(str(tmp_path / "a.peaks"))
+    assert loaded.frame_count == pyramid.frame_count
+    assert all(np.array_equal(a, b) for a, b in zip(loaded.levels, pyramid.levels))
+    (tmp_path / "bad.peaks").write_bytes(b"XXXX" + bytes(12))
+    assert main.PeakPyramid.load(str(tmp_path / "bad.peaks")) is None
+    assert main.PeakPyramid.load(str(tmp_path / "missing.peaks")) is None
+
+
+def test_peak_pyramid_built_in_chunks_matches(monkeypatch):
+    frames = np.random.default_rng(3).uniform(-1, 1, (100000, 2)).astype(np.float32)
+    whole = main.PeakPyramid.build(frames)
+    monkeypatch.setattr(main, "ANALYSIS_CHUNK_FRAMES", 4096)
+    chunked = main.PeakPyramid.build_from(lambda start, end: frames[start:end], len(frames))
+    assert all(np.array_equal(a, b) for a, b in zip(whole.levels, chunked.levels))
+
+
+def test_waveform_store_forgets_a_request_it_could_not_build(qapp, wait_until, tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "WAVEFORM_DIR", str(tmp_path / "waveforms"))
+    store = main.WaveformStore(main.QThreadPool())
+    store.request("gone.wav", 100, 1.0, open_sample=lambda: None) # The sound vanished before it was read
+    wait_until(lambda: not store.in_flight)
+    assert store.lookup("gone.wav") is None
+
+    frames = np.zeros((1000, 2), dtype=np.float32)
+    ready = []
+    store.pyramid_ready.connect(lambda path, pyramid: ready.append(path))
+    store.request("a.wav", 100, 1.0, open_sample=lambda: main.DecodedSample("a.wav", frames))
+    wait_until(lambda: ready)
+    assert not store.in_flight and store.lookup("a.wav").frame_count == 1000
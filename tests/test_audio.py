@@ -0,0 +1,122 @@
+""" WAV mapping, voice stealing and mixing. """
+import struct
+
+import numpy as np
+import pytest
+
+import main
+
+
+def write_wav(path, samples, rate=48000, tag=1, bits=16, extra_chunks=b""):
+    """ Writes samples (frames x channels, already in the file's sample type) with optional chunks before the data. """
+    data = samples.tobytes()
+    channels = samples.shape[1]
+    block_align = channels * bits // 8
+    fmt = struct.pack("<HHIIHH", tag, channels, rate, rate * block_align, block_align, bits)
+    body = b"WAVE" + b"fmt " + struct.pack("<I", len(fmt)) + fmt + extra_chunks + b"data" + struct.pack("<I", len(data)) + data
+    with open(path, "wb") as f:
+        f.write(b"RIFF" + struct.pack("<I", len(body)) + body)
+    return str(path)
+
+
+def test_read_wav_layout_skips_other_chunks(tmp_path):
+    samples = np.zeros((10, 2), dtype="<i2")
+    odd_chunk = b"LIST" + struct.pack("<I", 3) + b"abc\x00" # Padded to an even size
+    path = write_wav(tmp_path / "a.wav", samples, extra_chunks=odd_chunk)
+    tag, channels, rate, bits, offset, size = main.read_wav_layout(path)
+    assert (tag, channels, rate, bits, size) == (1, 2, 48000, 16, 40)
+    with open(path, "rb") as f:
+        f.seek(offset - 8)
+        assert f.read(4) == b"data"
+
+
+def test_read_wav_layout_rejects_other_files(tmp_path):
+    path = tmp_path / "a.wav"
+    path.write_bytes(b"ID3 not a wave file at all")
+    assert main.read_wav_layout(str(path)) is None
+    assert main.map_wav(str(path)) is None
+
+
+def test_read_wav_layout_unfinalized_size(tmp_path):
+    path = write_wav(tmp_path / "a.wav", np.zeros((6, 2), dtype="<i2"))
+    with open(path, "r+b") as f:
+        f.seek(40)
+        f.write(struct.pack("<I", 0xFFFFFFFF)) # A recorder that never went back to fix the header
+    assert main.read_wav_layout(path)[5] == 24
+
+
+def test_map_wav_converts_to_engine_frames(tmp_path):
+    mono = np.array([[16384], [-32768], [0]], dtype="<i2")
+    sample = main.map_wav(write_wav(tmp_path / "a.wav", mono))
+    assert not sample.direct and sample.frame_count == 3
+    assert np.allclose(sample.chunk(0, 3), [[0.5, 0.5], [-1.0, -1.0], [0.0, 0.0]])
+
+    unsigned = np.array([[128, 255]], dtype="u1")
+    sample = main.map_wav(write_wav(tmp_path / "b.wav", unsigned, bits=8))
+    assert np.allclose(sample.chunk(0, 1), [[0.0, 127 / 128]])
+
+
+def test_map_wav_plays_float_stereo_in_place(tmp_path):
+    frames = np.random.default_rng(0).uniform(-1, 1, (100, 2)).astype("<f4")
+    sample = main.map_wav(write_wav(tmp_path / "a.wav", frames, tag=3, bits=32))
+    assert sample.direct and sample.nbytes == 0
+    assert np.array_equal(sample.chunk(10, 20), frames[10:20])
+
+
+def test_map_wav_leaves_other_rates_to_the_decoder(tmp_path):
+    path = write_wav(tmp_path / "a.wav", np.zeros((10, 2), dtype="<i2"), rate=44100)
+    assert main.map_wav(path) is None
+
+
+def decoded(value, frames=100):
+    return main.DecodedSample("", np.full((frames, main.ENGINE_CHANNELS), value, dtype=np.float32))
+
+
+def test_voice_pool_steals_the_oldest():
+    pool = main.VoicePool(2, "oldest")
+    first = pool.start(decoded(0.1), 0)
+    second = pool.start(decoded(0.1), 1)
+    assert pool.start(decoded(0.1), 2) is first
+    assert pool.start(decoded(0.1), 3) is second
+
+
+def test_voice_pool_steals_the_quietest():
+    pool = main.VoicePool(3, "quietest")
+    loud = pool.start(decoded(0.9), 0)
+    quiet = pool.start(decoded(0.9), 1, gain=0.1)
+    medium = pool.start(decoded(0.5), 2)
+    assert pool.start(decoded(0.9), 3) is quiet
+    assert {loud, medium} <= set(pool.voices)
+
+
+def test_voice_pool_retriggers_a_pads_own_voice():
+    pool = main.VoicePool(4, "retrigger")
+    voice = pool.start(decoded(0.1), 7)
+    voice.position = 50
+    assert pool.start(decoded(0.1), 7) is voice
+    assert voice.position == 0
+    assert pool.active_count() == 1
+
+
+def test_voice_pool_unknown_policy_falls_back_to_oldest():
+    assert main.VoicePool(1, "loudest").steal_policy == "oldest"
+
+
+def test_voice_pool_mix_sums_and_frees_finished_voices():
+    pool = main.VoicePool(2)
+    pool.start(decoded(0.25, frames=3), 0)
+    pool.start(decoded(0.5, frames=10), 1, gain=0.5)
+    out = np.ones((4, main.ENGINE_CHANNELS), dtype=np.float32)
+    pool.mix(out)
+    assert np.allclose(out[:, 0], [0.5, 0.5, 0.5, 0.25])
+    assert pool.active_count() == 1
+    pool.stop_all()
+    assert pool.active_count() == 0
+
+
+@pytest.mark.parametrize("policy", main.VoicePool.STEAL_POLICIES)
+def test_voice_pool_never_grows(policy):
+    pool = main.VoicePool(3, policy)
+    for slot in range(10):
+        pool.start(decoded(0.1), slot % 4)
+    assert len(pool.voices) == 3 and pool.active_count() == 3
@@ -0,0 +1,99 @@
+""" Library search and the background scanner. """
+import os
+import wave
+
+import main
+
+
+def test_trigram_index_finds_substrings():
+    index = main.TrigramIndex(["kick drum", "snare", "air horn", "drumroll long"])
+    assert list(index.search("drum")) == [0, 3]
+    assert list(index.search("rum")) == [0, 3]
+    assert list(index.search("horn")) == [2]
+    assert list(index.search("xyz")) == []
+
+
+def test_trigram_index_matches_every_word():
+    index = main.TrigramIndex(["kick drum", "snare drum", "drumroll long", "kick"])
+    assert list(index.search("drum kick")) == [0]
+    assert list(index.search("KICK")) == [0, 3]
+    assert list(index.search("drum long")) == [2]
+
+
+def test_trigram_index_short_queries_and_empty():
+    index = main.TrigramIndex(["ab", "b", "cab"])
+    assert list(index.search("b")) == [0, 1, 2]
+    assert list(index.search("ab")) == [0, 2]
+    assert list(index.search("   ")) == [0, 1, 2]
+    assert list(main.TrigramIndex([]).search("a")) == []
+
+
+def test_trigram_index_needs_the_whole_word_not_just_its_grams():
+    # Both trigrams of "abcd" occur, but never next to each other
+    index = main.TrigramIndex(["abc bcd", "xabcdx"])
+    assert list(index.search("abcd")) == [1]
+
+
+def write_sound(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(48000)
+        w.writeframes(bytes(4800 * 2))
+    return path
+
+
+def scan(scanner, wait_until, folders):
+    results = []
+    finished = []
+    scanner.index_ready.connect(lambda entries, trigrams: results.append(entries))
+    scanner.scan_finished.connect(lambda: finished.append(True))
+    scanner.scan(folders, {})
+    wait_until(lambda: finished and not scanner.scanning)
+    return results[-1] if results else None
+
+
+def test_scanner_indexes_sounds_with_folder_tags(data_dir, wait_until):
+    library = data_dir / "library"
+    write_sound(str(library / "drums" / "kick.wav"))
+    write_sound(str(library / "snare.wav"))
+    (library / "notes.txt").write_text("not a sound")
+    entries = scan(main.LibraryScanner(), wait_until, [str(library)])
+    assert [(entry.name, entry.tags, entry.duration_ms, entry.format) for entry in entries] == [
+        ("kick", ["drums"], 100, "WAV"),
+        ("snare", [], 100, "WAV"),
+    ]
+    assert os.path.exists(main.LIBRARY_INDEX_FILE)
+
+
+def test_scanner_skips_a_file_that_fails_and_finishes(data_dir, wait_until, monkeypatch):
+    library = data_dir / "library"
+    good = write_sound(str(library / "good.wav"))
+    bad = write_sound(str(library / "bad.wav"))
+    probe = main.probe_duration_ms
+
+    def failing_probe(path):
+        if path == bad:
+            raise RuntimeError("unexpected")
+        return probe(path)
+
+    monkeypatch.setattr(main, "probe_duration_ms", failing_probe)
+    scanner = main.LibraryScanner()
+    assert [entry.path for entry in scan(scanner, wait_until, [str(library)])] == [good]
+
+    # A later scan still runs instead of queuing behind the failed one forever
+    monkeypatch.setattr(main, "probe_duration_ms", probe)
+    assert sorted(entry.path for entry in scan(scanner, wait_until, [str(library)])) == [bad, good]
+
+
+def test_scanner_finishes_when_the_whole_scan_fails(data_dir, wait_until, monkeypatch):
+    write_sound(str(data_dir / "library" / "a.wav"))
+
+    def failing_save(entries):
+        raise RuntimeError("disk on fire")
+
+    scanner = main.LibraryScanner()
+    monkeypatch.setattr(scanner, "_save", failing_save)
+    assert scan(scanner, wait_until, [str(data_dir / "library")]) is None
+    assert not scanner.scanning
@@ -0,0 +1,29 @@
+""" Cleanup of the media store's copies. """
+import os
+import time
+
+import main
+
+
+def test_media_store_collects_only_old_unreferenced_copies(data_dir, qapp):
+    os.makedirs(main.MEDIA_DIR)
+    old = time.time() - main.MEDIA_GC_GRACE_S - 60
+    paths = {}
+    for name in ("kept", "garbage", "recent"):
+        paths[name] = os.path.join(main.MEDIA_DIR, name + ".wav")
+        with open(paths[name], "wb") as f:
+            f.write(b"RIFF")
+        if name != "recent":
+            os.utime(paths[name], (old, old))
+
+    pool = main.QThreadPool()
+    store = main.MediaStore(pool)
+    store.collect_garbage([paths["kept"]])
+    pool.waitForDone()
+    assert sorted(os.listdir(main.MEDIA_DIR)) == ["kept.wav", "recent.wav"]
+
+
+def test_media_store_collect_without_media_dir(data_dir, qapp):
+    pool = main.QThreadPool()
+    main.MediaStore(pool).collect_garbage([])
+    pool.waitForDone() # Nothing was ever imported, nothing to do
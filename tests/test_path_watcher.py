@@ -0,0 +1,28 @@
+""" Watching the folders of assigned sounds. """
+import shutil
+
+import main
+
+
+def test_path_watcher_follows_a_folder_that_is_deleted_and_restored(tmp_path, wait_until):
+    folder = tmp_path / "sounds" / "drums"
+    folder.mkdir(parents=True)
+    path = str(folder / "kick.wav")
+    watcher = main.PathWatcher()
+    reports = []
+    watcher.paths_changed.connect(reports.append)
+    watcher.set_paths({path})
+    assert watcher.watcher.directories() == [str(folder)]
+
+    shutil.rmtree(tmp_path / "sounds")
+    wait_until(lambda: reports)
+    assert reports[-1] == [path]
+    assert watcher.watcher.directories() == [str(tmp_path)]
+
+    reports.clear()
+    folder.mkdir(parents=True)
+    wait_until(lambda: reports and watcher.watcher.directories() == [str(folder)])
+    reports.clear()
+    (folder / "kick.wav").write_bytes(b"RIFF")
+    wait_until(lambda: reports)
+    assert reports[-1] == [path]
@@ -0,0 +1,107 @@
+""" Profile journal replay and the import of older JSON data files. """
+import os
+import json
+
+import pytest
+
+import main
+
+
+def test_replay_record_applies_every_edit():
+    data = {"audio_files": {"1": {"path": "a.wav"}}, "ui_state": {}, "analysis": {}}
+    main.replay_record(data, {"op": "set", "slot": "2", "data": {"path": "b.wav"}})
+    main.replay_record(data, {"op": "remove", "slot": "1"})
+    main.replay_record(data, {"op": "remove", "slot": "99"}) # Already gone
+    main.replay_record(data, {"op": "ui", "key": "theme", "value": "Blue Wave"})
+    main.replay_record(data, {"op": "analysis", "path": "b.wav", "data": {"integrated_lufs": -20.0}})
+    main.replay_record(data, {"op": "something newer"})
+    assert data == {
+        "audio_files": {"2": {"path": "b.wav"}},
+        "ui_state": {"theme": "Blue Wave"},
+        "analysis": {"b.wav": {"integrated_lufs": -20.0}},
+    }
+
+
+def write_journal(path, records, torn_tail=b""):
+    with open(path, "wb") as f:
+        for record in records:
+            f.write(json.dumps(record).encode("utf-8") + b"\n")
+        f.write(torn_tail)
+
+
+def test_read_json_profile_replays_the_journal_up_to_a_torn_write(tmp_path):
+    data_file = tmp_path / "data.json"
+    journal_file = tmp_path / "data.journal"
+    data_file.write_text(json.dumps({"audio_files": {"0": {"path": "a.wav"}}}))
+    write_journal(journal_file, [
+        {"op": "set", "slot": "1", "data": {"path": "b.wav"}},
+        {"op": "ui", "key": "rows", "value": 5},
+    ], torn_tail=b'{"op": "set", "slot": "2", "da')
+    data = main.read_json_profile(str(data_file), str(journal_file))
+    assert data["audio_files"] == {"0": {"path": "a.wav"}, "1": {"path": "b.wav"}}
+    assert data["ui_state"] == {"rows": 5}
+    assert data["analysis"] == {}
+
+
+def test_read_json_profile_without_journal(tmp_path):
+    data_file = tmp_path / "export.json"
+    data_file.write_text(json.dumps({"ui_state": {"theme": "Cyber Green"}}))
+    data = main.read_json_profile(str(data_file), str(tmp_path / "missing.journal"))
+    assert data == {"ui_state": {"theme": "Cyber Green"}, "audio_files": {}, "analysis": {}}
+
+
+def test_read_json_profile_rejects_other_json(tmp_path):
+    data_file = tmp_path / "data.json"
+    data_file.write_text("[1, 2, 3]")
+    with pytest.raises(TypeError):
+        main.read_json_profile(str(data_file))
+
+
+def test_data_store_imports_the_legacy_data_file_once(data_dir):
+    with open(main.DATA_FILE, "w", encoding="utf-8") as f:
+        json.dump({"audio_files": {"3": {"path": "a.wav"}}, "ui_state": {"theme": "Blue Wave"}}, f)
+    write_journal(main.JOURNAL_FILE, [{"op": "set", "slot": "120", "data": {"path": "b.wav"}}])
+    profile_file = str(data_dir / "profile.db")
+
+    store = main.DataStore(profile_file)
+    try:
+        assert store.load_slots() == {"3": {"path": "a.wav"}, "120": {"path": "b.wav"}}
+        assert store.load_slots(100, 200) == {"120": {"path": "b.wav"}}
+        assert store.lookup("ui", "theme") == "Blue Wave"
+    finally:
+        store.close()
+    assert not os.path.exists(main.DATA_FILE) and os.path.exists(main.DATA_FILE + ".imported")
+    assert not os.path.exists(main.JOURNAL_FILE) and os.path.exists(main.JOURNAL_FILE + ".imported")
+
+    # Edits made after the import survive a restart, and nothing is imported again
+    store = main.DataStore(profile_file)
+    store.append({"op": "remove", "slot": "3"})
+    store.append({"op": "analysis", "path": "b.wav", "data": {"integrated_lufs": -18.0}})
+    store.close()
+    store = main.DataStore(profile_file)
+    try:
+        assert store.export_data()["audio_files"] == {"120": {"path": "b.wav"}}
+        assert store.export_data()["analysis"] == {"b.wav": {"integrated_lufs": -18.0}}
+    finally:
+        store.close()
+
+
+def test_data_store_sets_aside_an_unreadable_legacy_file(data_dir):
+    with open(main.DATA_FILE, "w", encoding="utf-8") as f:
+        f.write("{not json")
+    store = main.DataStore(str(data_dir / "profile.db"))
+    try:
+        assert store.load_slots() == {}
+    finally:
+        store.close()
+
+
+def test_data_store_moves_a_corrupt_profile_aside(data_dir):
+    profile_file = data_dir / "profile.db"
+    profile_file.write_bytes(b"this is not an sqlite database" * 100)
+    store = main.DataStore(str(profile_file))
+    try:
+        assert store.load_slots() == {}
+    finally:
+        store.close()
+    assert (data_dir / "profile.db.corrupt").exists()
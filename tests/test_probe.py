@@ -0,0 +1,62 @@
+""" Durations read from file headers without decoding. """
+import struct
+
+import main
+
+MP3_HEADER = b"\xff\xfb\x90\x00" # MPEG-1 Layer III, 128 kbps, 44.1 kHz, stereo
+
+
+def write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_mp3_constant_bitrate(tmp_path):
+    path = write(tmp_path, "a.mp3", MP3_HEADER + bytes(16000 - 4))
+    assert main.probe_duration_ms(path) == 1000 # 16000 bytes at 128 kbps
+
+
+def test_mp3_skips_the_id3_tag(tmp_path):
+    tag = b"ID3\x03\x00\x00" + bytes([0, 0, 1, 0]) + bytes(128) # Synchsafe size 128
+    path = write(tmp_path, "a.mp3", tag + MP3_HEADER + bytes(16000 - 4))
+    assert main.probe_duration_ms(path) == 1000
+
+
+def test_mp3_xing_frame_count(tmp_path):
+    xing = b"Xing" + struct.pack(">II", 1, 100)
+    path = write(tmp_path, "a.mp3", MP3_HEADER + bytes(32) + xing + bytes(1000))
+    assert main.probe_duration_ms(path) == 100 * 1152 * 1000 // 44100
+
+
+def test_mp3_skips_sync_words_with_reserved_fields(tmp_path):
+    fake_syncs = (
+        b"\xff\xeb\x90\x00" # Reserved MPEG version
+        b"\xff\xfb\xf0\x00" # Bad bitrate index
+        b"\xff\xfb\x9c\x00" # Reserved sample rate index
+        b"\xff\xfd\x90\x00" # Layer II
+    )
+    path = write(tmp_path, "a.mp3", fake_syncs + MP3_HEADER + bytes(16000 - 4))
+    assert main.probe_duration_ms(path) == 1000 # Counted from the real frame on
+
+
+def test_mp3_without_a_valid_header(tmp_path):
+    assert main.probe_duration_ms(write(tmp_path, "a.mp3", b"\xff\xfb\xf0\x00" * 100)) is None
+    assert main.probe_duration_ms(write(tmp_path, "b.mp3", b"")) is None
+    assert main.probe_duration_ms(write(tmp_path, "c.mp3", b"ID3\x03\x00\x00\x7f\x7f\x7f\x7f")) is None
+    assert main.probe_duration_ms(write(tmp_path, "d.mp3", b"\xff\xfb\x00\x00" + bytes(100))) is None # Free format
+
+
+def test_truncated_headers_are_unknown(tmp_path):
+    assert main.probe_duration_ms(write(tmp_path, "a.ogg", b"OggS" + bytes(10))) is None
+    assert main.probe_duration_ms(write(tmp_path, "a.wav", b"RIFF\x00\x00\x00\x00WAVEfmt ")) is None
+    assert main.probe_duration_ms(str(tmp_path / "missing.mp3")) is None
+    assert main.probe_duration_ms(write(tmp_path, "a.flac", b"fLaC")) is None
+
+
+def test_wav_duration(tmp_path):
+    fmt = struct.pack("<HHIIHH", 1, 2, 48000, 192000, 4, 16)
+    data = bytes(4 * 24000)
+    wav = b"RIFF" + struct.pack("<I", 36 + len(data)) + b"WAVE" + b"fmt " + struct.pack("<I", 16) + fmt
+    wav += b"data" + struct.pack("<I", len(data)) + data
+    assert main.probe_duration_ms(write(tmp_path, "a.wav", wav)) == 500
@@ -0,0 +1,82 @@
+""" The decoded sound cache: misses, hits and least recently used eviction. """
+import wave
+
+import pytest
+
+pytest.importorskip("PyQt6.QtMultimedia", exc_type=ImportError) # Decoding needs the platform audio backend
+
+import main
+
+
+def write_sound(path, seconds=0.2, rate=44100):
+    """ A silent WAV; at the default rate, which isn't the engine's, it always goes through the decoder. """
+    with wave.open(path, "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(bytes(int(44100 * seconds) * 4))
+    return path
+
+
+@pytest.fixture
+def cache(qapp):
+    main.import_multimedia()
+    return main.SampleCache()
+
+
+def test_a_miss_decodes_and_later_lookups_hit(cache, wait_until, tmp_path):
+    path = write_sound(str(tmp_path / "a.wav"))
+    ready = []
+    cache.sample_ready.connect(ready.append)
+    assert cache.get(path) is None
+    wait_until(lambda: ready)
+    assert ready == [path]
+    sample = cache.get(path)
+    assert sample is not None and sample.duration_ms() == 200
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["samples"]) == (1, 1, 1)
+    assert stats["bytes"] == sample.nbytes
+
+
+def test_the_least_recently_used_sound_is_evicted(cache, wait_until, tmp_path):
+    paths = [write_sound(str(tmp_path / f"{name}.wav")) for name in "abc"]
+    ready = []
+    cache.sample_ready.connect(ready.append)
+    cache.request(paths[0])
+    wait_until(lambda: len(ready) == 1)
+    size = cache.samples[paths[0]].nbytes
+    cache.budget_bytes = size * 2 + size // 2 # Room for two
+    cache.request(paths[1])
+    wait_until(lambda: len(ready) == 2)
+    assert cache.get(paths[0]) is not None # Now used more recently than b
+    cache.request(paths[2])
+    wait_until(lambda: len(ready) == 3)
+    assert set(cache.samples) == {paths[0], paths[2]}
+    assert cache.stats()["bytes"] == 2 * size
+
+
+def test_a_file_that_cannot_be_decoded_is_skipped(cache, wait_until, tmp_path):
+    broken = tmp_path / "broken.wav"
+    broken.write_bytes(b"not audio at all")
+    good = write_sound(str(tmp_path / "good.wav"))
+    ready = []
+    cache.sample_ready.connect(ready.append)
+    cache.request(str(broken))
+    cache.request(good)
+    wait_until(lambda: ready)
+    assert ready == [good] and str(broken) not in cache.samples
+
+
+def test_engine_rate_wav_files_are_mapped_up_to_the_cap(cache, tmp_path):
+    cache.max_maps = 2
+    paths = [write_sound(str(tmp_path / f"{name}.wav"), rate=main.ENGINE_SAMPLE_RATE) for name in "abc"]
+    cache.set_priority([paths[0]])
+    for path in paths:
+        cache.request(path)
+    assert set(cache.samples) == {paths[0], paths[2]} # The bank on screen is closed last
+    assert cache.stats()["mapped"] == 2 and cache.stats()["bytes"] == 0
+
+    cache.set_priority([paths[2]]) # Switching banks closes the others
+    assert set(cache.samples) == {paths[2]}
+    cache.release(paths[2])
+    assert cache.stats()["mapped"] == 0